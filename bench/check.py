@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""Checks the topology reduction on small cases without Multi2Sim, so a
+change to it can be verified before it is trusted. Each check prints a
+line with the cases it tried and any that failed, and the script exits
+with status 1 if any did.
+
+Regression cases, each of which once failed:
+
+    bridges     second-pass removals that split the network in two parts
+                whose lightest links are both bridges: swapping those
+                links (tool.reconnect_subgraphs) leaves it in two parts,
+                on which both engines raised NetworkXNoPath; the link
+                must be restored and the network stay connected
+    unremoved   reductions whose maxlinks is above the link count the
+                first pass leaves (up to every pair of switches and
+                beyond), so the node degree pass takes the count below
+                maxlinks with few or no removed links to add back (the
+                networkx engine once raised IndexError); both engines
+                must give the same links
+
+Equivalence of the ways the reduction can be run, on random cases with
+many tied weights (--cases of each, from --seed). The reductions are of
+complete traffic graphs of 5 to 16 switches, with int weights or the
+float weights of a workload mix, and limits from a spanning tree to
+every pair; an exception counts as a result, which the other
+way must give too:
+
+    tracker     bridges.BridgeTracker against networkx's bridges after
+                each of a random sequence of link removals and additions
+    search      tool.reduce_graph with the bridge tracker against the
+                search from one end of each removed link to the other
+    rotation    tool.replace_edge, which rotates the links it can't add
+                back at once, against running its loop to the end: the
+                links added back and the order of those left
+    engines     the numpy engine (denseengine.py) against networkx
+    log         reductionlog.ReductionLog.reduce against reduce_graph,
+                for a random sequence of limits on one log, saved and
+                read back halfway
+"""
+import os
+import sys
+import random
+import operator
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, os.pardir))
+import networkx as nx
+import tool
+import denseengine as de
+import bridges as br
+import reductionlog as rl
+from cmdline import parse_options
+
+options = {'cases': '200', 'seed': '1'}
+
+def weighted_complete(n, weights):
+    # complete graph on n switches, weights in edge order
+    G = nx.complete_graph(n)
+    for (u, v), w in zip(G.edges(), weights):
+        G[u][v]['weight'] = w
+    return G
+
+# (switches, link weights, maxlinks, maxdegree)
+bridge_cases = [(5, [71, 20, 22, 48, 74, 2, 65, 27, 54, 30], 4, 2)]
+# a line of switches, its link weights, and the link the second pass
+# removes: the lightest links of both parts, (1, 2) and (3, 4), are
+# bridges
+bridge_line = (6, [5, 1, 9, 2, 7], (2, 3))
+
+def swapped(graph, u, v):
+    # the parts the network would be left in if link (u, v) were
+    # removed and the lightest links of the two parts swapped
+    g = graph.copy()
+    g.remove_edge(u, v)
+    parts = sorted(nx.connected_components(g), key=min)
+    tel = [tool.edges_sorted_by_weight(g.subgraph(c))[0][0] \
+           for c in parts]
+    g.remove_edges_from(tel)
+    g.add_edge(tel[0][0], tel[1][0])
+    g.add_edge(tel[0][1], tel[1][1])
+    return nx.number_connected_components(g)
+
+def check_bridges():
+    failed = []
+    for n, weights, maxlinks, maxdegree in bridge_cases:
+        G = weighted_complete(n, weights)
+        for engine in ['networkx', 'numpy']:
+            case = '%d switches, %d/%d, %s' % (n, maxlinks, maxdegree, \
+                                                engine)
+            try:
+                GN = tool.reduce_graph(G, maxlinks, maxdegree, engine)
+            except nx.NetworkXException as e:
+                failed.append('%s: %s' % (case, e))
+                continue
+            if not nx.is_connected(GN):
+                failed.append(case + ': not connected')
+    # the second pass on its own, on a line of switches
+    n, weights, (u, v) = bridge_line
+    line = nx.path_graph(n)
+    for (a, b), w in zip(line.edges(), weights):
+        line[a][b]['weight'] = w
+    if swapped(line, u, v) != 2:
+        failed.append('line: the swap no longer splits the network')
+    edge = ((u, v), line[u][v]['weight'])
+    g = line.copy()
+    dg = de.DenseGraph(line)
+    try:
+        tool.remove_edge_second_pass(g, edge, [], n + 1, 3)
+        de.remove_edge_second_pass(dg, edge, n + 1, 3)
+    except nx.NetworkXException as e:
+        failed.append('line: %s' % e)
+    else:
+        if not nx.is_connected(g) or len(de.components(dg)) != 1:
+            failed.append('line: not connected')
+    return 2 * len(bridge_cases) + 1, failed
+
+def check_unremoved():
+    failed = []
+    cases = 0
+    for n in range(5, 13):
+        G = weighted_complete(n, [(7 * i) % 11 for i in range(n * n)])
+        pairs = n * (n - 1) // 2
+        for maxlinks in range(pairs - 2, pairs + 3):
+            for maxdegree in range(2, n - 1):
+                cases += 1
+                case = '%d switches, %d/%d' % (n, maxlinks, maxdegree)
+                try:
+                    a = tool.reduce_graph(G, maxlinks, maxdegree)
+                    b = tool.reduce_graph(G, maxlinks, maxdegree, 'numpy')
+                except (IndexError, nx.NetworkXException) as e:
+                    failed.append('%s: %s' % (case, e))
+                    continue
+                if sorted(a.edges(data='weight')) != \
+                   sorted(b.edges(data='weight')):
+                    failed.append(case + ': the engines differ')
+    return cases, failed
+
+def random_case(rnd):
+    # (traffic graph, maxlinks, maxdegree)
+    n = rnd.randint(5, 16)
+    hi = rnd.choice([0, 2, 10, 1000, 1.5])
+    if hi == 1.5:
+        # a workload mix's weights are floats (workloads.py), with ties
+        weights = [rnd.randint(0, 6) * 0.25 + rnd.choice([0, 1e-3]) \
+                   for i in range(n * n)]
+    else:
+        weights = [rnd.randint(0, hi) for i in range(n * n)]
+    G = weighted_complete(n, weights)
+    if rnd.random() < 0.5:
+        maxlinks = rnd.randint(n - 1, n + 3)
+    else:
+        maxlinks = rnd.randint(n - 1, n * (n - 1) // 2)
+    return G, maxlinks, rnd.randint(2, n - 1)
+
+def result(reduce, G, maxlinks, maxdegree):
+    # the links reduce gives with their weights, or the exception
+    try:
+        GN = reduce(G, maxlinks, maxdegree)
+    except Exception as e:
+        return type(e).__name__
+    return sorted((min(u, v), max(u, v), w) \
+                  for u, v, w in GN.edges(data='weight'))
+
+def compare(name, rnd, cases, reduce, reference):
+    # the cases where reduce and reference give different results
+    failed = []
+    for i in range(cases):
+        G, maxlinks, maxdegree = random_case(rnd)
+        if result(reduce, G, maxlinks, maxdegree) != \
+           result(reference, G, maxlinks, maxdegree):
+            failed.append('%d switches, %d/%d: %s differs' % \
+                          (G.number_of_nodes(), maxlinks, maxdegree, name))
+    return cases, failed
+
+def check_tracker(rnd, cases):
+    failed = []
+    for i in range(cases):
+        n = rnd.randint(5, 16)
+        g = nx.gnp_random_graph(n, rnd.uniform(0.2, 0.8), \
+                                rnd.randint(0, 1 << 30))
+        bt = br.graph_tracker(g)
+        for step in range(3 * n):
+            links = list(g.edges())
+            absent = list(nx.non_edges(g))
+            if links and (not absent or rnd.random() < 0.6):
+                u, v = rnd.choice(links)
+                g.remove_edge(u, v)
+                bt.remove(u, v)
+            elif absent:
+                u, v = rnd.choice(absent)
+                g.add_edge(u, v, weight=rnd.randint(0, 3))
+                bt.add(u, v)
+            bridges = set(frozenset(e) for e in nx.bridges(g))
+            wrong = [e for e in g.edges() \
+                     if bt.is_bridge(*e) != (frozenset(e) in bridges)]
+            if wrong:
+                failed.append('%d switches, step %d: link %s' % \
+                              (n, step, wrong[0]))
+                break
+    return cases, failed
+
+def check_search(rnd, cases):
+    # the tool without a tracker searches instead (tool.removal_path)
+    def searching(G, maxlinks, maxdegree):
+        tracker = br.graph_tracker
+        br.graph_tracker = lambda graph: None
+        try:
+            return tool.reduce_graph(G, maxlinks, maxdegree)
+        finally:
+            br.graph_tracker = tracker
+    return compare('the tracker', rnd, cases, tool.reduce_graph, searching)
+
+def replace_edge_loop(graph, rel, maxl, maxd):
+    # tool.replace_edge without the rotation shortcut
+    added = False
+    if graph.number_of_edges() < maxl:
+        rel.sort(key=operator.itemgetter(1), reverse=True)
+        i = 0
+        while graph.number_of_edges() < maxl and i < maxl * 100 and rel:
+            (rn1, rn2), rw = rel.pop(0)
+            if graph.degree(rn1) < maxd and graph.degree(rn2) < maxd:
+                graph.add_edge(rn1, rn2, weight=0)
+                added = True
+            else:
+                rel.append(((rn1, rn2), rw))
+            i += 1
+    return added
+
+def replaced(replace, graph, rel, maxl, maxd):
+    # what replace does to copies of graph and rel, or the exception
+    graph, rel = graph.copy(), list(rel)
+    try:
+        added = replace(graph, rel, maxl, maxd)
+    except Exception as e:
+        return type(e).__name__
+    return added, sorted(graph.edges()), rel
+
+def check_rotation(rnd, cases):
+    # a random network, removed links (rel) among the pairs it lacks,
+    # and limits that leave some of them out
+    failed = []
+    for i in range(cases):
+        n = rnd.randint(5, 16)
+        g = nx.gnp_random_graph(n, rnd.uniform(0.1, 0.6), \
+                                rnd.randint(0, 1 << 30))
+        absent = list(nx.non_edges(g))
+        rnd.shuffle(absent)
+        hi = rnd.choice([0, 1, 3, 1000])
+        rel = [(e, rnd.randint(0, hi)) \
+               for e in absent[:rnd.randint(0, len(absent))]]
+        maxl = g.number_of_edges() + rnd.randint(0, len(rel) + 1)
+        maxd = rnd.randint(1, n - 1)
+        if replaced(tool.replace_edge, g, rel, maxl, maxd) != \
+           replaced(replace_edge_loop, g, rel, maxl, maxd):
+            failed.append('%d switches, %d removed, %d/%d: the rotation ' \
+                          % (n, len(rel), maxl, maxd) + 'differs')
+    return cases, failed
+
+def check_engines(rnd, cases):
+    def dense(G, maxlinks, maxdegree):
+        return tool.reduce_graph(G, maxlinks, maxdegree, 'numpy')
+    return compare('numpy', rnd, cases, dense, tool.reduce_graph)
+
+def check_log(rnd, cases):
+    failed = []
+    fd, path = tempfile.mkstemp(prefix='noc-check-', suffix='.json')
+    os.close(fd)
+    try:
+        for i in range(cases):
+            G, maxlinks, maxdegree = random_case(rnd)
+            n = G.number_of_nodes()
+            log = rl.ReductionLog(G, every=rnd.choice([None, 3]))
+            for k in range(6):
+                if k == 3:
+                    log.save(path)
+                    log = rl.read_log(path, G)
+                maxlinks = rnd.randint(n - 1, n * (n - 1) // 2)
+                maxdegree = rnd.randint(2, n - 1)
+                if result(lambda G, ml, md: log.reduce(ml, md), G, \
+                          maxlinks, maxdegree) != \
+                   result(tool.reduce_graph, G, maxlinks, maxdegree):
+                    failed.append('%d switches, %d/%d (limits %d): the ' \
+                                  % (n, maxlinks, maxdegree, k + 1) + \
+                                  'log differs')
+                    break
+    finally:
+        os.remove(path)
+    return cases, failed
+
+# (name, check, whether it takes random cases)
+checks = [('bridges', check_bridges, False), \
+          ('unremoved', check_unremoved, False), \
+          ('tracker', check_tracker, True), \
+          ('search', check_search, True), \
+          ('rotation', check_rotation, True), \
+          ('engines', check_engines, True), \
+          ('log', check_log, True)]
+
+if __name__ == "__main__":
+    argv = parse_options(sys.argv, options)
+    if len(argv) > 1 or int(options['cases']) < 1:
+        print('Usage: ' + str(argv[0]) + ' [--cases <n>] [--seed <n>]')
+        print('--cases is the number of random cases of each')
+        print('        equivalence check, default 200')
+        sys.exit(0)
+    bad = 0
+    for name, check, random_cases in checks:
+        if random_cases:
+            n, failed = check(random.Random(int(options['seed'])), \
+                              int(options['cases']))
+        else:
+            n, failed = check()
+        print('%-10s %d cases, %d failed' % (name, n, len(failed)))
+        for f in failed:
+            print('  ' + f)
+        bad += len(failed)
+    sys.exit(1 if bad else 0)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Times the steps of the tool on synthetic data for a range of switch
+counts, so performance changes can be measured without Multi2Sim:
+
+    render      writeconfigs.render_net for the fully-connected NoC
+    parse       simoutput.parse_sim_output on m2s-like stdout
+    graph       tool.build_graph on a fully-connected net report
+    prune       tool.reduce_graph down to 2 x cores links, degree 4, or
+                with --cluster-size the hierarchical synthesis of
+                hierarchy.py (tool.reduce_topology)
+
+Each step is run --repeat times and the best time kept. The table gives
+the time, the throughput (links, lines or removed links per second) and
+the scaling exponent from the previous size (time ~ switches ** k).
+"""
+import os
+import sys
+import math
+import json
+import shutil
+import tempfile
+import timeit
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, here)
+sys.path.insert(0, os.path.join(here, os.pardir))
+import synth
+import writeconfigs as wc
+import simoutput as so
+from cmdline import parse_options
+from tool import build_graph, reduce_topology
+
+options = {'sizes': '9,16,36,64,144,256,576,1024', 'traffic': 'hotspot', \
+           'engine': 'numpy', 'prune-max': '144', 'repeat': '3', \
+           'json': '', 'cluster-size': '0'}
+
+def best_time(fn, repeat):
+    # best wall time of repeat calls, and the last result
+    best = None
+    for i in range(repeat):
+        t = timeit.default_timer()
+        r = fn()
+        t = timeit.default_timer() - t
+        if best is None or t < best:
+            best = t
+    return best, r
+
+def bench_size(cores, dist, engine, prunemax, repeat, tmp, clustersize=0):
+    # {step: (seconds, items, unit)} for one switch count
+    res = {}
+    nlinks = cores * (cores - 1) // 2
+    edges = wc.fully_edges(cores)
+    t, text = best_time(lambda: wc.render_net(cores, edges, 'fully'), repeat)
+    res['render'] = (t, nlinks, 'links')
+    out = synth.render_stdout(cores, seed=cores).splitlines(True)
+    t, stats = best_time(lambda: so.parse_sim_output(out), repeat)
+    res['parse'] = (t, len(out), 'lines')
+    rpt = os.path.join(tmp, 'fully-net-report-%d.txt' % cores)
+    wc.write_file(rpt, synth.render_report(text, dist, cores))
+    t, g = best_time(lambda: build_graph(rpt), repeat)
+    res['graph'] = (t, nlinks, 'links')
+    os.remove(rpt)
+    if cores <= prunemax:
+        G = g[0]
+        t, GN = best_time(lambda: reduce_topology(G, 2 * cores, 4, engine, \
+                                                  clustersize), 1)
+        res['prune'] = (t, nlinks - GN.number_of_edges(), 'removed')
+    return res
+
+def print_results(sizes, results):
+    steps = ['render', 'parse', 'graph', 'prune']
+    hdr = ['switches']
+    for s in steps:
+        hdr += [s + ' s', s + ' /s', 'k']
+    rows = [hdr]
+    for i, n in enumerate(sizes):
+        row = [str(n)]
+        for s in steps:
+            if s not in results[i]:
+                row += ['-', '-', '-']
+                continue
+            t, items, unit = results[i][s]
+            row += ['%.4f' % t, '%.3g' % (items / t if t > 0 else 0)]
+            prev = results[i - 1].get(s) if i > 0 else None
+            if prev is not None and prev[0] > 0 and t > 0:
+                k = math.log(t / prev[0]) / math.log(float(n) / sizes[i - 1])
+                row.append('%.2f' % k)
+            else:
+                row.append('-')
+        rows.append(row)
+    widths = [max(len(r[c]) for r in rows) for c in range(len(hdr))]
+    for r in rows:
+        print('  '.join(r[c].rjust(widths[c]) for c in range(len(hdr))))
+
+if __name__ == "__main__":
+    argv = parse_options(sys.argv, options)
+    sizes = [int(s) for s in options['sizes'].split(',')]
+    if ( len(argv) > 1 or min(sizes) < 3 or
+         options['traffic'] not in synth.distributions or
+         options['engine'] not in ['networkx', 'numpy'] or
+         int(options['cluster-size']) in [1, 2, 3]
+    ):
+        print('Usage: ' + str(argv[0]) + ' [--sizes <n>,<n>,...] ' + \
+               '[--traffic <traffic>] [--engine <engine>] ' + \
+               '[--prune-max <n>] [--repeat <n>] [--json <file>] ' + \
+               '[--cluster-size <n>]')
+        print('<traffic> is "uniform", "hotspot" (default) or "neighbor"')
+        print('--prune-max is the largest size pruned, default 144')
+        print('--cluster-size prunes hierarchically, in clusters of at')
+        print('               most <n> (>= 4) switches; 0 (default) does')
+        print('               not')
+        sys.exit(0)
+    tmp = tempfile.mkdtemp(prefix='noc-bench-')
+    results = []
+    try:
+        for n in sizes:
+            results.append(bench_size(n, options['traffic'], \
+                                      options['engine'], \
+                                      int(options['prune-max']), \
+                                      int(options['repeat']), tmp, \
+                                      int(options['cluster-size'])))
+    finally:
+        shutil.rmtree(tmp)
+    print_results(sizes, results)
+    if options['json'] != '':
+        f = open(options['json'], 'w')
+        json.dump({'options': options, 'sizes': sizes, \
+                   'results': results}, f, indent=1, sort_keys=True, \
+                  separators=(',', ': '))
+        f.write('\n')
+        f.close()
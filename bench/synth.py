@@ -0,0 +1,183 @@
+"""This module generates synthetic Multi2Sim output for benchmarking: the
+statistics summary m2s prints on stdout and the --net-report file, for a
+net config written by writeconfigs. Traffic between switches follows one
+of three distributions:
+
+    uniform     every pair of switches exchanges about the same amount
+    hotspot     most traffic goes to and from the switches the L2
+                modules are attached to, as in a memory-bound app
+    neighbor    traffic falls off with distance on a 2D grid, as in a
+                stencil-like app with nearest-neighbor communication
+
+The numbers are random but seeded, so the same config and seed always
+give the same output.
+"""
+import os
+import re
+import sys
+import math
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), \
+                                os.pardir))
+import writeconfigs as wc
+
+distributions = ['uniform', 'hotspot', 'neighbor']
+
+linkre = re.compile(r'^\[Network\.net0\.Link\.[^\]]+\]\s*\n' + \
+                    r'Source = (\S+)\s*\nDest = (\S+)', re.M)
+nodere = re.compile(r'^\[Network\.net0\.Node\.(\S+)\]\s*\nType = (\w+)', re.M)
+
+def parse_net_config(text):
+    # (nodes, links) of a net config, in file order; nodes are (name,
+    # type) and links (source, dest) pairs, each link bidirectional
+    return nodere.findall(text), linkre.findall(text)
+
+def pair_weight(dist, i, j, cores, shape, hot, rng):
+    # relative traffic from switch i to switch j
+    w = rng.uniform(0.5, 1.5)
+    if dist == 'hotspot':
+        if i in hot or j in hot:
+            w *= 20.0
+    elif dist == 'neighbor':
+        rows, cols = shape
+        d = abs(i // cols - j // cols) + abs(i % cols - j % cols)
+        w *= math.exp(-1.5 * (d - 1))
+    return w
+
+def render_report(text, dist='hotspot', seed=1, cycles=200000000, \
+                  msgsize=72.0, load=0.05):
+    # net report for the net config in text; load is roughly the
+    # fraction of cycles the busiest kind of link is busy
+    rng = random.Random(seed)
+    nodes, links = parse_net_config(text)
+    switches = [n for n, t in nodes if t == 'Switch']
+    cores = len(switches)
+    shape = wc.grid_shape(cores)
+    # switches the L2 nodes (the end nodes past the cores) attach to
+    hot = set()
+    for s, d in links:
+        for a, b in ((s, d), (d, s)):
+            if a.startswith('sw') and b.startswith('n') and \
+               int(b[1:]) >= cores:
+                hot.add(int(a[2:]))
+    bandwidth = 256
+    scale = load * bandwidth * cycles / max(cores, 1)
+    s = []
+    sent = {}
+    received = {}
+    bufs = {}
+    linkstats = []
+    for src, dst in links:
+        for a, b in ((src, dst), (dst, src)):
+            if a.startswith('sw') and b.startswith('sw'):
+                w = pair_weight(dist, int(a[2:]), int(b[2:]), cores, \
+                                shape, hot, rng)
+                nbytes = int(scale * w / cores)
+            else:
+                nbytes = int(scale * rng.uniform(0.5, 1.5))
+            # m2s numbers each node's buffers in the order links are added
+            ob = bufs.get((a, 'out'), 0)
+            ib = bufs.get((b, 'in'), 0)
+            bufs[(a, 'out')] = ob + 1
+            bufs[(b, 'in')] = ib + 1
+            linkstats.append((a, ob, b, ib, nbytes))
+            sent[a] = sent.get(a, 0) + nbytes
+            received[b] = received.get(b, 0) + nbytes
+    transfers = sum(l[4] for l in linkstats) // int(msgsize) + 1
+    s.append('[ Network.net0.General ]\nTransfers = %d\n' % transfers + \
+             'AverageMessageSize = %.2f\n' % msgsize + \
+             'AverageLatency = %.4f\nCycles = %d\n\n' % \
+             (rng.uniform(8, 20), cycles))
+    for a, ob, b, ib, nbytes in linkstats:
+        busy = nbytes // bandwidth
+        s.append('[ Network.net0.Link.link_<%s.out_buf_%d>_' % (a, ob) + \
+                 '<%s.in_buf_%d> ]\n' % (b, ib) + \
+                 'Config.Bandwidth = %d\n' % bandwidth + \
+                 'TransferredMessages = %d\n' % (nbytes // int(msgsize)) + \
+                 'TransferredBytes = %d\n' % nbytes + \
+                 'BusyCycles = %d\n' % busy + \
+                 'BytesPerCycle = %.4f\n' % (float(nbytes) / cycles) + \
+                 'Utilization = %.4f\n\n' % (float(busy) / cycles))
+    for n, t in nodes:
+        s.append('[ Network.net0.Node.%s ]\n' % n + \
+                 'Config.InputBufferSize = 1024\n' + \
+                 'Config.OutputBufferSize = 1024\n' + \
+                 'SentMessages = %d\n' % (sent.get(n, 0) // int(msgsize)) + \
+                 'SentBytes = %d\n' % sent.get(n, 0) + \
+                 'SendRate = %.4f\n' % (float(sent.get(n, 0)) / cycles) + \
+                 'ReceivedMessages = %d\n' % \
+                 (received.get(n, 0) // int(msgsize)) + \
+                 'ReceivedBytes = %d\n' % received.get(n, 0) + \
+                 'ReceiveRate = %.4f\n\n' % \
+                 (float(received.get(n, 0)) / cycles))
+    return ''.join(s)
+
+def render_stdout(cores, maxinst=100000000, seed=1, noise=1000):
+    # m2s stdout: a banner, noise lines (e.g. the program's own output)
+    # and the statistics summary with its [ x86 ] section
+    rng = random.Random(seed)
+    ipc = rng.uniform(0.3, 1.2)
+    cycles = int(maxinst / ipc)
+    s = ['', '; Multi2Sim 4.2 - A Simulation Framework for CPU-GPU ' + \
+         'Heterogeneous Computing', \
+         '; Please use command \'m2s --help\' for a list of ' + \
+         'command-line options.', \
+         '; Simulation alpha-numeric ID: %05x' % rng.randrange(16 ** 5), '']
+    for i in range(noise):
+        s.append('output line %d of the target program' % i)
+    s.extend(['', ';', '; Simulation Statistics Summary', ';', '', \
+              '[ General ]', 'RealTime = %.2f [s]' % (cycles / 2.0e6), \
+              'SimEnd = x86MaxInst', '', \
+              '[ x86 ]', 'RealTime = %.2f [s]' % (cycles / 2.0e6), \
+              'Instructions = %d' % maxinst, \
+              'InstructionsPerSecond = %d' % rng.randrange(10 ** 5, 10 ** 6), \
+              'Contexts = %d' % cores, 'Memory = %d' % (9 * 2 ** 20), \
+              'SimEnd = x86MaxInst', \
+              'FastForwardInstructions = 0', \
+              'CommittedInstructions = %d' % maxinst, \
+              'CommittedInstructionsPerCycle = %.4f' % ipc, \
+              'CommittedMicroInstructions = %d' % int(maxinst * 1.3), \
+              'CommittedMicroInstructionsPerCycle = %.4f' % (ipc * 1.3), \
+              'BranchPredictionAccuracy = %.4f' % rng.uniform(0.8, 0.99), \
+              'SimTime = %.2f [ns]' % (cycles / 1.0), \
+              'Frequency = 1000 [MHz]', 'Cycles = %d' % cycles, \
+              'CyclesPerSecond = %d' % rng.randrange(10 ** 5, 10 ** 6), ''])
+    for c in range(cores):
+        s.extend(['[ x86.Core%d ]' % c, 'Dispatch.Total = %d' % \
+                  rng.randrange(10 ** 6), 'Commit.Total = %d' % \
+                  rng.randrange(10 ** 6), ''])
+    return '\n'.join(s) + '\n'
+
+def render_debug(text, seed=1, cycles=200000000, count=20000):
+    # m2s --net-debug output for the net config in text, as nettrace.py
+    # reads it: count messages between the cores and the L2 modules,
+    # each core's requests (8 bytes) answered by 72-byte replies, in
+    # bursts spread over the run; busier cores send more
+    rng = random.Random(seed)
+    nodes, links = parse_net_config(text)
+    cores = sum(1 for n, t in nodes if t == 'Switch')
+    l2 = [n for n, t in nodes if t == 'EndNode' and int(n[1:]) >= cores]
+    weight = [rng.uniform(0.2, 1.0) for c in range(cores)]
+    sends = []
+    while len(sends) < count:
+        start = rng.randrange(cycles)
+        for i in range(rng.randint(8, 64)):
+            c = rng.choices(range(cores), weight)[0]
+            t = start + rng.randint(0, 400)
+            m = rng.choice(l2)
+            sends.append((t, 'n%d' % c, m, 8))
+            sends.append((t + rng.randint(20, 120), m, 'n%d' % c, 72))
+    sends.sort()
+    s = []
+    for i, (t, src, dst, size) in enumerate(sends[:count]):
+        s.append('net: msg a="send" net="net0" msg=%d size=%d ' \
+                 'src="%s" dst="%s" cycle=%d\n' % (i, size, src, dst, t))
+    return ''.join(s)
+
+def write_fully(cores, path, dist='hotspot', seed=1):
+    # fully-connected net config for cores switches and its report;
+    # returns the config text
+    text = wc.render_net(cores, wc.fully_edges(cores), 'fully-connected NoC')
+    wc.write_file(path, render_report(text, dist, seed))
+    return text
@@ -0,0 +1,137 @@
+"""This module keeps track of which links of a graph are bridges (links
+whose removal disconnects their ends) while links are removed and added,
+so the topology reduction can tell whether removing a link would split
+the network without searching the graph (see tool.removal_path).
+
+It keeps a spanning forest of its own copy of the links, the heaviest
+ones where it can, and for each tree link the number of other links
+that cover it, i.e. whose cycle through the tree contains it. A link
+not in the tree is never a bridge, and a tree link is one iff nothing
+covers it:
+
+    removing or adding a link outside the tree   the counts along its
+                                                 path in the tree go
+                                                 down or up, O(depth)
+    removing a tree link, or adding one between  the forest is rebuilt
+    two trees                                    when it is next asked
+
+The reduction removes the lightest links first, so it removes far more
+links outside the forest than in it, and only rebuilds it a few times.
+A rebuild is O(links x depth).
+"""
+import heapq
+import instrument as ins
+
+class BridgeTracker(object):
+    # the bridges of a graph with those nodes and links, given every
+    # link removed from or added to it from now on (remove and add); it
+    # has its own copy of the links, so the graph may be changed before
+    # or after telling it; weight(u, v) is a link's current weight, or
+    # anything if the graph no longer has it, and only decides which
+    # links make up the forest
+
+    def __init__(self, nodes, links, weight):
+        self.adj = dict((u, set()) for u in nodes)
+        for u, v in links:
+            self.adj[u].add(v)
+            self.adj[v].add(u)
+        self.weight = weight
+        self.stale = True
+
+    def rebuild(self):
+        # a maximum weight spanning forest (Prim's), as the reduction
+        # removes the lightest links first: those are then mostly
+        # outside it and cheap to remove
+        weight = self.weight
+        self.parent = {}
+        self.depth = {}
+        self.tree = {}
+        order = []
+        for r in self.adj:
+            if r in self.parent:
+                continue
+            self.tree[r] = r
+            c = 0
+            heap = [(0, c, r, None)]
+            while heap:
+                w, i, v, u = heapq.heappop(heap)
+                if v in self.parent:
+                    continue
+                self.parent[v] = u
+                self.depth[v] = 0 if u is None else self.depth[u] + 1
+                self.tree[v] = r
+                order.append(v)
+                for x in self.adj[v]:
+                    if x not in self.parent:
+                        c += 1
+                        heapq.heappush(heap, (-weight(v, x), c, x, v))
+        # a link outside the tree covers the tree links from each end up
+        # to their lowest common ancestor: +1 at each end and -2 there,
+        # summed over each subtree (each link is seen from both ends)
+        cover = dict.fromkeys(self.adj, 0)
+        parent = self.parent
+        for u in self.adj:
+            for v in self.adj[u]:
+                if parent[u] != v and parent[v] != u:
+                    cover[u] += 1
+                    cover[self.ancestor(u, v)] -= 1
+        for u in reversed(order):
+            if parent[u] is not None:
+                cover[parent[u]] += cover[u]
+        # cover[c] is that of tree link (c, parent of c)
+        self.cover = cover
+        self.stale = False
+        ins.count('bridge_rebuilds')
+
+    def ancestor(self, u, v):
+        # lowest common ancestor of u and v in the same tree
+        while u != v:
+            if self.depth[u] < self.depth[v]:
+                u, v = v, u
+            u = self.parent[u]
+        return u
+
+    def walk(self, u, v, d):
+        # add d to the cover of the tree links between u and v
+        while u != v:
+            if self.depth[u] < self.depth[v]:
+                u, v = v, u
+            self.cover[u] += d
+            u = self.parent[u]
+
+    def is_bridge(self, u, v):
+        # True if link (u, v) is a bridge
+        if self.stale:
+            self.rebuild()
+        if self.parent[v] == u:
+            return self.cover[v] == 0
+        if self.parent[u] == v:
+            return self.cover[u] == 0
+        return False
+
+    def remove(self, u, v):
+        self.adj[u].discard(v)
+        self.adj[v].discard(u)
+        if self.stale:
+            return
+        if self.parent[v] == u or self.parent[u] == v:
+            self.stale = True
+        else:
+            self.walk(u, v, -1)
+
+    def add(self, u, v):
+        if v in self.adj[u]:
+            return
+        self.adj[u].add(v)
+        self.adj[v].add(u)
+        if self.stale:
+            return
+        if self.tree[u] != self.tree[v]:
+            self.stale = True
+        else:
+            self.walk(u, v, 1)
+
+def graph_tracker(graph):
+    # the tracker of a networkx graph with link weights
+    return BridgeTracker(graph.nodes(), graph.edges(), \
+                         lambda u, v: graph[u].get(v, {}).get('weight', 0))
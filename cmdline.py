@@ -0,0 +1,22 @@
+"""This module parses the command-line options of tool.py, comparisons.py
+and the bench scripts. It is kept apart from the scripts so that each
+can read its options without importing the others.
+"""
+
+def parse_options(argv, opts):
+    # remove leading "--<name> <value>" pairs from argv, storing each
+    # value in opts; options must come before the positional arguments
+    # so that a target program's own arguments are left alone
+    # an option whose default is False is a flag and takes no value
+    argv = list(argv)
+    while len(argv) > 2 and argv[1].startswith('--'):
+        name = argv[1][2:]
+        if name not in opts:
+            break
+        if opts[name] is False:
+            opts[name] = True
+            del argv[1]
+        else:
+            opts[name] = argv[2]
+            del argv[1:3]
+    return argv
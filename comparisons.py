@@ -1,129 +1,302 @@
-#!/usr/bin/python
+#!/usr/bin/python3
+import os
 import sys
-import subprocess
-import re
+import multiprocessing
 import writeconfigs as wc
+from cmdline import parse_options
+import scheduler as sj
+import netreport as nr
+import trafficprofile as tp
+import instrument as ins
+import rundir as rd
+
+# topologies that can be compared; "all" on the command line selects each
+topologies = ['novel', 'ring', 'mesh', 'torus']
+
+# options accepted before the positional arguments, with defaults
+options = {'cores': '9', 'shape': '', 'estimate': False, \
+           'profile-file': '', 'outdir': '.', 'rundir': '', \
+           'replay': False, 'trace-file': ''}
+
+def shape_ok(cores, shape):
+    # mesh and torus shape must be <rows>x<cols> with rows*cols == cores
+    if shape == '':
+        return True
+    try:
+        wc.grid_shape(cores, wc.parse_shape(shape))
+    except ValueError:
+        return False
+    return True
+
+def parse_topologies(arg):
+    # accept a single topology, a comma-separated list, or "all"
+    if arg == 'all':
+        return list(topologies)
+    tl = [t for t in arg.split(',') if t != '']
+    if len(tl) == 0:
+        return None
+    for t in tl:
+        if t not in topologies:
+            return None
+    return tl
 
 def check_args(argv = sys.argv):
     # check if target program provided on command line
-    if ( len(sys.argv) < 5 or
-         int(sys.argv[1]) < 9 or
-         int(sys.argv[2]) < 4 or
-         str(sys.argv[3]) not in ['novel', 'ring', 'mesh', 'torus']
+    # the target program is not needed for estimates and replays
+    if ( len(argv) < (4 if options['estimate'] or options['replay'] \
+                      else 5) or
+         int(options['cores']) < 3 or
+         not shape_ok(int(options['cores']), options['shape']) or
+         int(argv[1]) < int(options['cores']) or
+         int(argv[2]) < 4 or
+         not os.path.isdir(options['outdir']) or
+         parse_topologies(str(argv[3])) is None
     ):
-        print 'Usage: ' + str(sys.argv[0]) + ' ' + \
-              '<maxlinks> <maxdegree> <topology> <targetprogram> [<args>]'
-        print '<maxlinks> constrains the link count in the novel topology'
-        print '           and must be >= 9'
-        print '<maxdegree> constrains node degree in the novel topology'
-        print '            and must be >= 4'
-        print '<topology> can be "novel", "ring", "mesh", or "torus"'
+        print('Usage: ' + str(argv[0]) + ' ' + \
+               '[--cores <cores>] [--shape <rows>x<cols>] [--estimate] ' + \
+               '[--profile-file <file>] [--outdir <dir>] ' + \
+               '[--rundir <base>] [--replay] [--trace-file <trace>] ' + \
+               '<maxlinks> <maxdegree> <topology> <targetprogram> [<args>]')
+        print('<cores> is the number of cores (and switches), default 9')
+        print('<rows>x<cols> is the mesh and torus shape, by default')
+        print('              the most nearly square one for <cores>')
+        print('<maxlinks> constrains the link count in the novel topology')
+        print('           and must be >= <cores>')
+        print('<maxdegree> constrains node degree in the novel topology')
+        print('            and must be >= 4')
+        print('<topology> can be "novel", "ring", "mesh", or "torus",')
+        print('           a comma-separated list of these, or "all";')
+        print('           multiple topologies are simulated side by side')
+        print('--estimate ranks the topologies with an analytic model of')
+        print('           the traffic profile from tool.py instead of')
+        print('           simulating them; <targetprogram> is then not')
+        print('           needed')
+        print('--replay replays the messages recorded by tool.py')
+        print('         --record-trace on each topology in a simple')
+        print('         network simulation instead of running m2s, and')
+        print('         writes "<topology>-replay-net-report.txt"; the')
+        print('         topologies are replayed in parallel and')
+        print('         <targetprogram> is not needed')
+        print('<trace> is the trace to replay, by default "fully-trace.dat"')
+        print('        in <dir>')
+        print('<file> is the traffic profile saved by tool.py, by default')
+        print('       "fully-profile.dat" in <dir>')
+        print('<dir> is the existing directory the config files, reports')
+        print('      and results are written to and tool.py\'s output is')
+        print('      read from, default the current directory')
+        print('<base> makes a new, uniquely named directory under <base>')
+        print('       for this run\'s files (tool.py\'s output is still read')
+        print('       from <dir>) and removes large reports of old runs')
+        print('phase times and peak memory use are written to')
+        print('"comparisons-timing.json"')
         sys.exit(0)
 
-def parse_sim_output(o):
-    # parse stdout from simulation
-    inst = 0
-    stns = 0
-    cyc = 0
-    linespastx86 = 0
-    for line in o.splitlines():
-        if re.match(r'\[ x86 \]', line):
-            linespastx86 = 0
-        if ( re.match(r'CommittedInstructions = ', line) and
-             linespastx86 == 7
-           ):
-            inst = float(re.sub(r'^CommittedInstructions = ([0-9]+).*$', \
-                                r'\1', line))
-        if re.match(r'SimTime = ', line) and linespastx86 == 12:
-            # simulated time in nanoseconds
-            stns = float(re.sub(r'^SimTime = ([0-9]+).*$', r'\1', line))
-        if re.match(r'Cycles = ', line) and linespastx86 == 14:
-            cyc = float(re.sub(r'^Cycles = ([0-9]+).*$', r'\1', line))
-        linespastx86 += 1
-    # simulated time in seconds (divide nanoseconds by 10^9)
-    return inst, stns, cyc
-
 def read_net_report(reportfile):
     # parse "net-report.txt" from simulation to get total NoC traffic
-    totaltraffic = 0
-    trans = 0
-    avgms = 0
-    avgly = 0
-    linespastgeneral = 0
-    linespastnodename = 0
-    rpt = open(reportfile)
-    for line in rpt:
-        # find general stats section
-        if re.match(r'\[ Network.net0.General\ ]', line):
-            linespastgeneral = 0
-        # record general stats
-        if re.match(r'Transfers = ', line) and linespastgeneral == 1:
-            trans = float(re.sub(r'^Transfers = ([0-9]+)', r'\1', line))
-        if ( re.match(r'AverageMessageSize = ', line) and 
-             linespastgeneral == 2
-           ):
-            avgms = float(re.sub(r'^AverageMessageSize = ([0-9]+)', \
-                                 r'\1', line))
-        if ( re.match(r'AverageLatency = ', line) and 
-             linespastgeneral == 3
-           ):
-            avgly = float(re.sub(r'^AverageLatency = ([0-9]+)', \
-                                 r'\1', line))
-        # find report section names describing node statistics
-        if re.match(r'\[ Network.net0.Node.n', line):
-            linespastnodename = 0
-        # the second line after such a node name gives the bytes sent
-        if re.match(r'SentBytes = ', line) and linespastnodename == 2:
-            totaltraffic += float(re.sub(r'^SentBytes = ([0-9]+)', r'\1', line))
-        linespastgeneral += 1
-        linespastnodename += 1
-    rpt.close()
-    return trans, avgms, avgly, totaltraffic
+    rpt = nr.read_net_report(reportfile)
+    return rpt.transfers, rpt.avgmsgsize, rpt.avglatency, \
+           rpt.totaltraffic()
+
+def topology_job(sim, maxinst, exe, args, topology, outdir='.'):
+    # simulation of one topology; the config files and the report are
+    # in outdir
+    cfgs = [os.path.join(outdir, c) for c in \
+            ['cpu-config.txt', 'ctx-config.txt', 'mem-config.txt', \
+             topology + '-net-config.txt']]
+    return sj.Job(topology, sim, maxinst, cfgs, \
+                  os.path.join(outdir, topology + '-net-report.txt'), \
+                  exe, args)
+
+def topology_result(job):
+    # stats of a finished job; all NaN if the simulation failed
+    if job.error:
+        return (job.name,) + (float('nan'),) * 7
+    inst, simtimens, cycles = job.stats.metrics()
+    transfers, avgmsgsize, avglatency, totaltraffic = \
+        read_net_report(job.rptfile)
+    return (job.name, inst, simtimens, cycles, \
+            transfers, avgmsgsize, avglatency, totaltraffic)
+
+def run_topologies(sim, maxinst, exe, args, tl, outdir='.'):
+    # simulate the topologies side by side, as many at once as the
+    # machine allows (see scheduler.py)
+    jobs = [topology_job(sim, maxinst, exe, args, t, outdir) for t in tl]
+    return [topology_result(j) for j in sj.run_jobs(jobs)]
+
+def print_table(results):
+    # one row per topology, same stats as the single-topology output
+    hdr = ['Topology', 'Instructions', 'Nanoseconds', 'Cycles', \
+           'Transfers', 'AvgMsgSize', 'AvgLatency', 'TotalTraffic']
+    print_rows(hdr, results)
+
+def print_rows(hdr, results):
+    # right-aligned columns; numbers printed with two decimals
+    rows = [hdr]
+    for r in results:
+        rows.append([r[0]] + ['%.2f' % v for v in r[1:]])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(hdr))]
+    for row in rows:
+        print('  '.join(row[i].rjust(widths[i]) for i in range(len(hdr))))
+
+def replay_job(job):
+    # replay the trace on one topology; module-level so it can be used
+    # as a multiprocessing pool worker
+    import nettrace as nt
+    import netsim as ns
+    tracefile, topology, outdir = job
+    rptfile = os.path.join(outdir, topology + '-replay-net-report.txt')
+    trace = nt.read_trace(tracefile)
+    try:
+        ns.replay_config(os.path.join(outdir, topology + '-net-config.txt'), \
+                         trace, rptfile)
+    finally:
+        trace.close()
+    rpt = nr.read_net_report(rptfile)
+    util = rpt.link_stat('Utilization')
+    return (topology, rpt.transfers, rpt.avgmsgsize, rpt.avglatency, \
+            rpt.totaltraffic(), max(util) if len(util) else 0.0)
+
+def replay_topologies(tracefile, tl, outdir='.'):
+    # replay the message trace recorded by tool.py on each topology,
+    # side by side (see netsim.py); the reports are read like m2s's
+    # a topology without a config (novel before tool.py has run) is
+    # skipped, and its stats are all NaN like a failed simulation's
+    jobs = []
+    for t in tl:
+        path = os.path.join(outdir, t + '-net-config.txt')
+        if os.path.exists(path):
+            jobs.append((tracefile, t, outdir))
+        else:
+            sys.stderr.write('replay: %s skipped, no "%s"\n' % (t, path))
+    done = {}
+    if jobs:
+        pool = multiprocessing.Pool(min(len(jobs), \
+                                        multiprocessing.cpu_count()))
+        try:
+            for r in pool.map(replay_job, jobs):
+                done[r[0]] = r
+        finally:
+            pool.close()
+            pool.join()
+    results = [done.get(t, (t,) + (float('nan'),) * 5) for t in tl]
+    hdr = ['Topology', 'Transfers', 'AvgMsgSize', 'AvgLatency', \
+           'TotalTraffic', 'MaxLinkUtil']
+    print_rows(hdr, results)
+    return results
+
+def estimate_topologies(cores, shape, tl, proffile='fully-profile.dat', \
+                        outdir='.'):
+    # rank topologies with the analytic cost model instead of m2s,
+    # using the traffic profile saved by tool.py
+    # (the profile must be of cores switches, else ValueError)
+    import costmodel as cm
+    rpt = tp.read_profile(proffile, cores)
+    try:
+        msgsize = rpt.avgmsgsize or 72.0
+        candidates = []
+        for t in tl:
+            path = os.path.join(outdir, t + '-net-config.txt')
+            candidates.append((t, cm.topology_edges(t, cores, shape, path)))
+        ranked = cm.rank(cm.profile_matrix(rpt), candidates, \
+                         cycles=rpt.cycles(), msgsize=msgsize)
+    finally:
+        rpt.close()
+    hdr = ['Topology', 'Links', 'MaxDegree', 'AvgHops', 'HopTraffic', \
+           'MaxLinkLoad', 'MaxUtil', 'EstLatency']
+    rows = []
+    for t, m in ranked:
+        rows.append([t, m['links'], m['maxdegree'], m['avghops'], \
+                     m['hoptraffic'], m['maxload'], m['maxutil'], \
+                     m['latency']])
+    print_rows(hdr, rows)
 
 if __name__ == "__main__":
     # update path to simulator (or just 'm2s' if it's in $PATH)
     sim = '/home/csd305/Documents/Multicore/multi2sim-4.2/bin/m2s'
+    # number of detailed instructions simulated in each run
+    maxinst = '100000000'
 
-    # future work: accept these as command line args,
-    # and update writeconfigs.py so it can create files
-    # for mesh, torus, etc. for an arbitray number of cores
-    cores = 9
     # threadspercore = 1 # assumed to be 1 for this version
 
-    check_args(sys.argv)
+    argv = parse_options(sys.argv, options)
+    check_args(argv)
+    cores = int(options['cores'])
+    shape = None
+    if options['shape'] != '':
+        shape = wc.parse_shape(options['shape'])
+    # tool.py's output is read from srcdir; files are written to outdir
+    srcdir = options['outdir']
+    outdir = srcdir
+    if options['rundir'] != '':
+        # a fresh directory so concurrent runs don't share files
+        outdir = rd.make_rundir(options['rundir'], 'comparisons')
+        rd.cleanup(options['rundir'])
+        print('writing to "' + outdir + '"')
+        novel = os.path.join(srcdir, 'novel-net-config.txt')
+        if os.path.exists(novel):
+            f = open(novel)
+            wc.write_file('novel-net-config.txt', f.read(), outdir)
+            f.close()
+    proffile = options['profile-file'] or \
+               os.path.join(srcdir, 'fully-profile.dat')
+
+    if options['estimate']:
+        with ins.phase('estimate'):
+            try:
+                estimate_topologies(cores, shape, \
+                                    parse_topologies(str(argv[3])), \
+                                    proffile, outdir)
+            except ValueError as e:
+                sys.exit('--estimate: ' + str(e))
+        ins.write(os.path.join(outdir, 'comparisons-timing.json'), \
+                  argv=sys.argv)
+        sys.exit(0)
+
+    if options['replay']:
+        tracefile = options['trace-file'] or \
+                    os.path.join(srcdir, 'fully-trace.dat')
+        if not os.path.exists(tracefile):
+            sys.exit('no trace "' + tracefile + '"; record one with ' + \
+                     'tool.py --record-trace')
+        with ins.phase('write_configs'):
+            wc.write_net_ring(cores, outdir=outdir)
+            wc.write_net_mesh(cores, shape, outdir=outdir)
+            wc.write_net_torus(cores, shape, outdir=outdir)
+        with ins.phase('replay'):
+            replay_topologies(tracefile, parse_topologies(str(argv[3])), \
+                              outdir)
+        ins.write(os.path.join(outdir, 'comparisons-timing.json'), \
+                  argv=sys.argv)
+        sys.exit(0)
 
     # create config files for profiling run of simulator
-    exe = str(sys.argv[4])
+    exe = str(argv[4])
     args = ''
-    for a in sys.argv[5:]:
+    for a in argv[5:]:
         args = args + str(a) + ' '
     args = args.strip()
-    wc.write_ctx(exe, args)
-    wc.write_cpu(cores)
-    wc.write_mem(cores)
-    wc.write_net_ring(cores)
-    wc.write_net_mesh(cores)
-    wc.write_net_torus(cores)
+    with ins.phase('write_configs'):
+        wc.write_ctx(exe, args, outdir)
+        wc.write_cpu(cores, outdir)
+        wc.write_mem(cores, outdir)
+        wc.write_net_ring(cores, outdir=outdir)
+        wc.write_net_mesh(cores, shape, outdir=outdir)
+        wc.write_net_torus(cores, shape, outdir=outdir)
     
     # run simulator for novel and standard topologies
-    topology =  str(sys.argv[3])
-    cfg = topology + '-net-config.txt'
-    rpt = topology + '-net-report.txt'
-    o = subprocess.Popen([sim, '--x86-sim', 'detailed', \
-                          '--x86-max-inst', '100000000', \
-                          '--x86-config', 'cpu-config.txt', \
-                          '--ctx-config', 'ctx-config.txt', \
-                          '--mem-config', 'mem-config.txt', \
-                          '--net-config', cfg, \
-                          '--net-report', rpt], \
-                          stderr=subprocess.STDOUT, \
-                          stdout=subprocess.PIPE).communicate()[0]
-    inst, simtimens, cycles = parse_sim_output(o)
-    print 'Instructions:', inst
-    print 'Nanoseconds:', simtimens
-    print 'Cycles:', cycles
-    transfers, avgmsgsize, avglatency, totaltraffic = read_net_report(rpt)
-    print 'NoC Transfers (# Packets Sent):', transfers
-    print 'NoC Avg. Message (Packet) Size:', avgmsgsize
-    print 'NoC Average Latency (in Cycles):', avglatency
-    print 'NoC Total Traffic (bytes):', totaltraffic
+    tl = parse_topologies(str(argv[3]))
+    with ins.phase('simulate'):
+        results = run_topologies(sim, maxinst, exe, args, tl, outdir)
+    if len(results) == 1:
+        (topology, inst, simtimens, cycles, \
+         transfers, avgmsgsize, avglatency, totaltraffic) = results[0]
+        print('Instructions:', inst)
+        print('Nanoseconds:', simtimens)
+        print('Cycles:', cycles)
+        print('NoC Transfers (# Packets Sent):', transfers)
+        print('NoC Avg. Message (Packet) Size:', avgmsgsize)
+        print('NoC Average Latency (in Cycles):', avglatency)
+        print('NoC Total Traffic (bytes):', totaltraffic)
+    else:
+        print_table(results)
+    ins.write(os.path.join(outdir, 'comparisons-timing.json'), argv=sys.argv)
@@ -0,0 +1,168 @@
+"""This module estimates how a topology would carry the traffic seen in
+the profiling run, without running the simulator. The traffic graph
+from tool.build_graph (or the matrix of a saved traffic profile) gives
+the bytes exchanged by each pair of switches. Each pair's traffic is
+routed over a minimal-hop path of the candidate topology, as
+Multi2Sim's default routing does. From that the model computes the
+hop-weighted traffic, the load on every link, and an M/M/1 queueing
+estimate of the average message latency.
+
+Everything is computed on dense NumPy arrays, so a topology of a few
+dozen switches is evaluated in milliseconds.
+"""
+import numpy as np
+import writeconfigs as wc
+
+def traffic_matrix(graph, n):
+    # symmetric n x n matrix of bytes exchanged by each switch pair
+    t = np.zeros((n, n))
+    for u, v, d in graph.edges(data=True):
+        t[u, v] += d['weight']
+        if u != v:
+            t[v, u] += d['weight']
+    return t
+
+def profile_matrix(prof):
+    # same matrix from a trafficprofile.Profile, read from the mapped
+    # file rather than through a graph
+    m = prof.matrix()
+    return m + m.T
+
+def adjacency(edges, n):
+    a = np.zeros((n, n), dtype=bool)
+    for u, v in edges:
+        a[u, v] = a[v, u] = True
+    return a
+
+def hop_matrix(adj):
+    # all-pairs hop counts by breadth-first expansion of every source
+    # at once; unreachable pairs are left at infinity
+    n = adj.shape[0]
+    h = np.full((n, n), np.inf)
+    reach = np.eye(n, dtype=bool)
+    frontier = reach.copy()
+    h[reach] = 0
+    k = 0
+    # float32 so the products go through BLAS
+    a = adj.astype(np.float32)
+    while frontier.any():
+        k += 1
+        frontier = (frontier.astype(np.float32).dot(a) > 0) & ~reach
+        h[frontier] = k
+        reach |= frontier
+    return h
+
+def next_hops(adj, h):
+    # nh[s, d] is the neighbor of s on a minimal-hop path to d, the
+    # lowest numbered one if there are several; -1 if s == d
+    n = adj.shape[0]
+    nh = np.full((n, n), -1, dtype=np.int64)
+    for s in range(n):
+        nbrs = np.flatnonzero(adj[s])
+        if len(nbrs) == 0:
+            continue
+        # ok[i, d]: neighbor nbrs[i] is one hop closer to d than s
+        ok = h[nbrs, :] == h[s, :][None, :] - 1
+        first = ok.argmax(axis=0)
+        has = ok[first, np.arange(n)]
+        nh[s, has] = nbrs[first[has]]
+    return nh
+
+def link_loads(t, nh, h):
+    # route the traffic of each pair s < d along next hops and sum
+    # the bytes on each (undirected) link
+    n = t.shape[0]
+    load = np.zeros((n, n))
+    src, dst = np.nonzero(np.triu(t, 1) > 0)
+    ok = np.isfinite(h[src, dst])
+    src = src[ok]
+    dst = dst[ok]
+    amt = t[src, dst]
+    cur = src
+    while len(cur) > 0:
+        nxt = nh[cur, dst]
+        np.add.at(load, (np.minimum(cur, nxt), np.maximum(cur, nxt)), amt)
+        going = nxt != dst
+        cur = nxt[going]
+        dst = dst[going]
+        amt = amt[going]
+    return load
+
+def evaluate(graph, edges, n, cycles=None, bandwidth=256.0, \
+             msgsize=72.0, hopdelay=1.0):
+    # metrics of carrying the traffic in graph over the given links
+    # cycles is the length of the profiled run; without it the latency
+    # is the zero-load latency (no queueing)
+    return evaluate_matrix(traffic_matrix(graph, n), adjacency(edges, n), \
+                           cycles, bandwidth, msgsize, hopdelay)
+
+def evaluate_matrix(t, adj, cycles=None, bandwidth=256.0, msgsize=72.0, \
+                    hopdelay=1.0):
+    # same as evaluate, for a traffic matrix and adjacency matrix
+    n = t.shape[0]
+    h = hop_matrix(adj)
+    iu = np.triu_indices(n, 1)
+    total = t[iu].sum()
+    m = {}
+    m['links'] = int(np.triu(adj, 1).sum())
+    m['maxdegree'] = int(adj.sum(axis=1).max()) if n > 0 else 0
+    m['connected'] = bool(np.isfinite(h).all())
+    tt = t[iu]
+    hh = h[iu]
+    if not m['connected'] and (tt[~np.isfinite(hh)] > 0).any():
+        m['hoptraffic'] = np.inf
+        m['avghops'] = np.inf
+        m['maxload'] = np.inf
+        m['maxutil'] = np.inf
+        m['latency'] = np.inf
+        m['loads'] = {}
+        return m
+    reachable = np.isfinite(hh)
+    m['hoptraffic'] = float((tt[reachable] * hh[reachable]).sum())
+    m['avghops'] = m['hoptraffic'] / total if total > 0 else 0.0
+    nh = next_hops(adj, h)
+    load = link_loads(t, nh, h)
+    m['maxload'] = float(load.max()) if n > 0 else 0.0
+    m['loads'] = dict(((int(u), int(v)), float(load[u, v])) \
+                      for u, v in zip(*np.nonzero(np.triu(adj, 1))))
+    # each bidirectional link is two channels; the traffic graph only
+    # has the sum of both directions, so each channel gets half
+    service = msgsize / bandwidth
+    if cycles:
+        util = load / 2.0 / (bandwidth * cycles)
+    else:
+        util = np.zeros((n, n))
+    m['maxutil'] = float(util.max()) if n > 0 else 0.0
+    # per-link delay: hop delay, serialization and M/M/1 waiting time
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wait = np.where(util < 1.0, service * util / (1.0 - util), np.inf)
+    delay = hopdelay + service + wait
+    # traffic-weighted sum of delays = sum over links of load * delay
+    linkcost = np.where(load > 0, load * np.triu(delay, 1), 0.0).sum()
+    m['latency'] = float(linkcost / total) if total > 0 else 0.0
+    return m
+
+def topology_edges(name, cores, shape=None, path=None):
+    # switch-to-switch links of a named topology; "novel" (or any
+    # other name, with path) is read from its net config file
+    if name == 'fully':
+        return wc.fully_edges(cores)
+    if name == 'ring':
+        return wc.ring_edges(cores)
+    if name in ['mesh', 'torus']:
+        rows, cols = wc.grid_shape(cores, shape)
+        if name == 'mesh':
+            return wc.mesh_edges(rows, cols)
+        return wc.torus_edges(rows, cols)
+    if path is None:
+        path = name + '-net-config.txt'
+    return wc.read_net_edges(path)
+
+def rank(t, candidates, key='latency', **kw):
+    # evaluate (name, edges) candidates for traffic matrix t and sort
+    # them best first
+    n = t.shape[0]
+    results = [(name, evaluate_matrix(t, adjacency(edges, n), **kw)) \
+               for name, edges in candidates]
+    results.sort(key=lambda r: r[1][key])
+    return results
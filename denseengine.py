@@ -0,0 +1,293 @@
+"""This module is an alternative engine for the topology reduction in
+tool.py. It runs the same greedy algorithm (first pass, second pass,
+then the node degree pass), but keeps link weights and node degrees in
+dense NumPy arrays, sorts links with vectorized stable sorts, and keeps
+the removed-link list in a heap instead of re-sorting a Python list.
+Bridges are tracked as in tool.py (bridges.py).
+
+Ties are broken the same way as in the networkx code in tool.py (stable
+sorts in node order, and the same Dijkstra push order), so both engines
+choose the same links. The result is returned as a networkx Graph so it
+can be written with writeconfigs.write_net_novel.
+"""
+import heapq
+import numbers
+import numpy as np
+import networkx as nx
+import instrument as ins
+import bridges as br
+
+class DenseGraph(object):
+    # undirected weighted graph on nodes 0..n-1 stored as dense arrays
+
+    def __init__(self, graph):
+        # nodes are renumbered in sorted order; self.nodes maps back
+        self.nodes = sorted(graph.nodes())
+        n = len(self.nodes)
+        idx = dict((v, i) for i, v in enumerate(self.nodes))
+        self.w = np.zeros((n, n), dtype=np.float64)
+        self.adj = np.zeros((n, n), dtype=bool)
+        # the weights are given back as ints only if they were ints
+        # (bytes of one run), not the floats of a workload mix
+        self.integral = True
+        for u, v, d in graph.edges(data=True):
+            if not isinstance(d['weight'], numbers.Integral):
+                self.integral = False
+            i = idx[u]
+            j = idx[v]
+            self.w[i, j] = self.w[j, i] = d['weight']
+            self.adj[i, j] = self.adj[j, i] = True
+        self.deg = self.adj.sum(axis=1)
+        self.nedges = int(self.deg.sum()) // 2
+        # removed links: heap of (-weight, seq, n1, n2); seq keeps the
+        # order a Python list of removed links would have for ties
+        self.rel = []
+        self.seq = 0
+        # the bridge tracker, told of every change by the reduction
+        iu, ju = np.nonzero(np.triu(self.adj))
+        self.bt = br.BridgeTracker(range(n), zip(iu.tolist(), ju.tolist()), \
+                                   lambda i, j: self.w[i, j])
+
+    def add_edge(self, i, j, wt):
+        if not self.adj[i, j]:
+            self.adj[i, j] = self.adj[j, i] = True
+            self.deg[i] += 1
+            self.deg[j] += 1
+            self.nedges += 1
+        self.w[i, j] = self.w[j, i] = wt
+
+    def remove_edge(self, i, j):
+        if not self.adj[i, j]:
+            raise nx.NetworkXError('The edge %s-%s is not in the graph' \
+                                   % (self.nodes[i], self.nodes[j]))
+        self.adj[i, j] = self.adj[j, i] = False
+        self.w[i, j] = self.w[j, i] = 0
+        self.deg[i] -= 1
+        self.deg[j] -= 1
+        self.nedges -= 1
+
+    def push_removed(self, i, j, wt):
+        heapq.heappush(self.rel, (-wt, self.seq, i, j))
+        self.seq += 1
+
+    def to_graph(self):
+        g = nx.Graph()
+        g.add_nodes_from(self.nodes)
+        iu, ju = np.nonzero(np.triu(self.adj))
+        wtype = int if self.integral else float
+        for i, j in zip(iu.tolist(), ju.tolist()):
+            g.add_edge(self.nodes[i], self.nodes[j], \
+                       weight=wtype(self.w[i, j]))
+        return g
+
+def edges_sorted_by_weight(dg, mask=None):
+    # links as ((n1, n2), w) sorted by weight incr., ties in node order
+    # mask optionally restricts the result to links within those nodes
+    adj = np.triu(dg.adj)
+    if mask is not None:
+        adj = adj & mask[:, None] & mask[None, :]
+    iu, ju = np.nonzero(adj)
+    wt = dg.w[iu, ju]
+    order = np.argsort(wt, kind='mergesort')
+    return [((i, j), w) for i, j, w in \
+            zip(iu[order].tolist(), ju[order].tolist(), wt[order].tolist())]
+
+def dijkstra_path(dg, source, target):
+    # lowest weight path, or None if there is none; follows
+    # networkx's single-source Dijkstra step for step so equal-weight
+    # paths are resolved the same way
+    n = len(dg.nodes)
+    dist = np.full(n, np.inf)
+    done = np.zeros(n, dtype=bool)
+    seen = np.full(n, np.inf)
+    pred = np.full(n, -1, dtype=np.int64)
+    seen[source] = 0
+    c = 0
+    fringe = [(0.0, c, source)]
+    while fringe:
+        d, _, v = heapq.heappop(fringe)
+        if done[v]:
+            continue
+        done[v] = True
+        dist[v] = d
+        if v == target:
+            break
+        nbrs = np.flatnonzero(dg.adj[v])
+        nd = d + dg.w[v, nbrs]
+        better = (~done[nbrs]) & (nd < seen[nbrs])
+        for u, du in zip(nbrs[better].tolist(), nd[better].tolist()):
+            seen[u] = du
+            c += 1
+            heapq.heappush(fringe, (du, c, u))
+            pred[u] = v
+    if not done[target]:
+        return None
+    sp = [target]
+    while sp[-1] != source:
+        sp.append(int(pred[sp[-1]]))
+    sp.reverse()
+    return sp
+
+def replace_edge(dg, maxl, maxd):
+    # same as tool.replace_edge; returns True if any link was added
+    if dg.nedges >= maxl:
+        return False
+    added = False
+    failed = []
+    i = 0
+    while dg.nedges < maxl and i < maxl * 100 and dg.rel:
+        negw, seq, rn1, rn2 = heapq.heappop(dg.rel)
+        if dg.deg[rn1] < maxd and dg.deg[rn2] < maxd:
+            dg.add_edge(rn1, rn2, 0)
+            dg.bt.add(rn1, rn2)
+            ins.count('edges_replaced')
+            added = True
+        else:
+            failed.append((negw, rn1, rn2))
+        i += 1
+    if failed and dg.nedges < maxl and not dg.rel:
+        # the list version keeps cycling through links that cannot be
+        # added (degrees only grow) until its iteration limit, which
+        # leaves them rotated; reproduce that order without the loop
+        r = (maxl * 100 - i) % len(failed)
+        failed = failed[r:] + failed[:r]
+    for negw, rn1, rn2 in failed:
+        dg.push_removed(rn1, rn2, -negw)
+    return added
+
+def reroute_traffic(dg, rn1, rn2, rw, maxl, maxd, sp=None):
+    if replace_edge(dg, maxl, maxd):
+        sp = None
+    dg.push_removed(rn1, rn2, rw)
+    if sp is None:
+        ins.count('shortest_paths')
+        sp = dijkstra_path(dg, rn1, rn2)
+        if sp is None:
+            raise nx.NetworkXNoPath('node %s not reachable from %s' \
+                                    % (dg.nodes[rn2], dg.nodes[rn1]))
+    a = np.array(sp[:-1])
+    b = np.array(sp[1:])
+    dg.w[a, b] += rw
+    dg.w[b, a] += rw
+
+def removal_path(dg, rn1, rn2):
+    # as tool.removal_path with a bridge tracker
+    ins.count('connectivity_checks')
+    if dg.bt.is_bridge(rn1, rn2):
+        return None
+    dg.bt.remove(rn1, rn2)
+    ins.count('shortest_paths')
+    return dijkstra_path(dg, rn1, rn2)
+
+def remove_edge_first_pass(dg, edge, maxl, maxd):
+    (rn1, rn2), rw = edge
+    dg.remove_edge(rn1, rn2)
+    ins.count('edges_removed')
+    sp = removal_path(dg, rn1, rn2)
+    if sp is not None:
+        reroute_traffic(dg, rn1, rn2, rw, maxl, maxd, sp)
+    else:
+        dg.add_edge(rn1, rn2, rw)
+        ins.count('edges_restored')
+
+def components(dg):
+    # connected components as boolean masks, in order of lowest node
+    n = len(dg.nodes)
+    label = np.full(n, -1, dtype=np.int64)
+    comps = []
+    for s in range(n):
+        if label[s] >= 0:
+            continue
+        mask = np.zeros(n, dtype=bool)
+        mask[s] = True
+        frontier = mask.copy()
+        while frontier.any():
+            frontier = dg.adj[frontier].any(axis=0) & ~mask
+            mask |= frontier
+        label[mask] = len(comps)
+        comps.append(mask)
+    return comps
+
+def reconnect_subgraphs(dg, comps, maxl, maxd):
+    ins.count('reconnects')
+    tel = [edges_sorted_by_weight(dg, m)[0] for m in comps[:2]]
+    (rn1_1, rn2_1), rw_1 = tel[0]
+    (rn1_2, rn2_2), rw_2 = tel[1]
+    dg.remove_edge(rn1_1, rn2_1)
+    dg.remove_edge(rn1_2, rn2_2)
+    dg.add_edge(rn1_1, rn1_2, 0)
+    dg.add_edge(rn2_1, rn2_2, 0)
+    dg.bt.remove(rn1_1, rn2_1)
+    dg.bt.remove(rn1_2, rn2_2)
+    dg.bt.add(rn1_1, rn1_2)
+    dg.bt.add(rn2_1, rn2_2)
+    reroute_traffic(dg, rn1_1, rn2_1, rw_1, maxl, maxd)
+    reroute_traffic(dg, rn1_2, rn2_2, rw_2, maxl, maxd)
+
+def bridge(dg, rn1, rn2):
+    # True if link (rn1, rn2) is the only path between rn1 and rn2
+    w = dg.w[rn1, rn2]
+    dg.remove_edge(rn1, rn2)
+    split = dijkstra_path(dg, rn1, rn2) is None
+    dg.add_edge(rn1, rn2, w)
+    return split
+
+def remove_edge_second_pass(dg, edge, maxl, maxd):
+    (rn1, rn2), rw = edge
+    dg.remove_edge(rn1, rn2)
+    ins.count('edges_removed')
+    sp = removal_path(dg, rn1, rn2)
+    if sp is not None:
+        reroute_traffic(dg, rn1, rn2, rw, maxl, maxd, sp)
+    else:
+        comps = components(dg)
+        # as in tool.remove_edge_second_pass
+        if comps[0].sum() == 1 or comps[1].sum() == 1 or \
+           all(bridge(dg, *edges_sorted_by_weight(dg, m)[0][0]) \
+               for m in comps[:2]):
+            # can't fix subgraph w/ 1 node, so restore link
+            dg.add_edge(rn1, rn2, rw)
+            ins.count('edges_restored')
+        else:
+            dg.bt.remove(rn1, rn2)
+            reconnect_subgraphs(dg, comps, maxl, maxd)
+            reroute_traffic(dg, rn1, rn2, rw, maxl, maxd)
+
+def cat_edges_by_neighbors(dg, node, maxd):
+    # links of node to neighbors over maxd ("heavy") and to the rest
+    # ("light"), each sorted by weight incr.
+    nbrs = np.flatnonzero(dg.adj[node])
+    heavy = dg.deg[nbrs] > maxd
+    he = []
+    le = []
+    for sel, out in ((heavy, he), (~heavy, le)):
+        nb = nbrs[sel]
+        wt = dg.w[node, nb]
+        order = np.argsort(wt, kind='mergesort')
+        for n, w in zip(nb[order].tolist(), wt[order].tolist()):
+            out.append(((node, n), w))
+    return he, le
+
+def reduce_dense(graph, maxlinks, maxdegree):
+    # reduce graph until maxlinks and maxdegree are met; same steps
+    # as the networkx reduction in tool.py
+    dg = DenseGraph(graph)
+    for e in edges_sorted_by_weight(dg):
+        if dg.nedges <= maxlinks:
+            break
+        remove_edge_first_pass(dg, e, maxlinks, maxdegree)
+    for e in edges_sorted_by_weight(dg):
+        if dg.nedges <= maxlinks:
+            break
+        remove_edge_second_pass(dg, e, maxlinks, maxdegree)
+    for n in range(len(dg.nodes)):
+        if dg.deg[n] <= maxdegree:
+            continue
+        for remove in (remove_edge_first_pass, remove_edge_second_pass):
+            h, l = cat_edges_by_neighbors(dg, n, maxdegree)
+            for el in (h, l):
+                for e in el:
+                    if dg.deg[n] <= maxdegree:
+                        break
+                    remove(dg, e, maxlinks, maxdegree)
+    return dg.to_graph()
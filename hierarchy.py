@@ -0,0 +1,310 @@
+"""This module synthesizes the topology of a large chip hierarchically
+(tool.py --cluster-size). The greedy reduction starts from every pair of
+switches and reroutes traffic over shortest paths as it removes links,
+so its time grows much faster than the number of switches. Here it only
+ever runs on small graphs.
+
+1. The traffic graph is split into clusters of switches that exchange a
+   lot of traffic, by recursive spectral bisection: each part is cut in
+   two halves along the Fiedler vector (the eigenvector of the second
+   smallest eigenvalue of its Laplacian, weighted by traffic) until no
+   part has more switches than the cluster size.
+2. The link budget is split: each cluster gets enough links for a ring
+   (a tree if the budget is tight), the clusters get enough to be
+   connected, and the rest goes to the clusters and to the links
+   between them in proportion to the traffic they carry; a cluster
+   keeps enough ports free for its share of the links between them.
+3. Each cluster is reduced to its budget by itself, in parallel.
+4. The clusters are linked by reducing the graph of the traffic between
+   clusters in the same way (hierarchically too, if there are more
+   clusters than the cluster size), with a cluster's degree bounded by
+   the ports its switches have left. Each cluster pair it keeps gets
+   its share of the inter-cluster links, each between the two switches
+   of the pair that exchange the most traffic and have ports to spare;
+   links that don't fit there go to the next busiest pairs. Where a
+   kept pair has no switches with ports to spare, the clusters are
+   joined through any two switches of the parts it would join that
+   have.
+5. A switch still over maxdegree has its lightest links moved to
+   switches with ports to spare, as long as the network stays
+   connected; only if that isn't possible does it keep them, with a
+   warning.
+
+Finally the traffic is routed over minimal-hop paths of the result (see
+costmodel.py) to give each link its weight, as the reduction does.
+"""
+import sys
+import multiprocessing
+import numpy as np
+import networkx as nx
+import costmodel as cm
+import sizing as sz
+
+def fiedler_split(t, nodes):
+    # nodes split in two halves (the first one the larger) along the
+    # Fiedler vector of the traffic between them; t is the full
+    # symmetric traffic matrix
+    w = t[np.ix_(nodes, nodes)]
+    lap = np.diag(w.sum(axis=1)) - w
+    vals, vecs = np.linalg.eigh(lap)
+    f = vecs[:, 1] if len(nodes) > 1 else vecs[:, 0]
+    # ties, e.g. switches without traffic, go by node number
+    order = sorted(range(len(nodes)), key=lambda i: (f[i], nodes[i]))
+    half = (len(nodes) + 1) // 2
+    return sorted(nodes[i] for i in order[:half]), \
+           sorted(nodes[i] for i in order[half:])
+
+def partition(t, size):
+    # clusters of at most size switches, as sorted lists of switch
+    # numbers, in order of their lowest switch
+    parts = [list(range(t.shape[0]))]
+    clusters = []
+    while parts:
+        p = parts.pop()
+        if len(p) <= size:
+            clusters.append(p)
+        else:
+            parts.extend(fiedler_split(t, p))
+    return sorted(clusters, key=min)
+
+def budgets(t, clusters, maxlinks, maxdegree):
+    # links for each cluster and for the inter-cluster links, in total
+    # maxlinks (which must be at least one less than the switches)
+    k = len(clusters)
+    sizes = [len(c) for c in clusters]
+    pairs = [s * (s - 1) // 2 for s in sizes]
+    base = [min(s, p) for s, p in zip(sizes, pairs)]
+    if sum(base) + k - 1 > maxlinks:
+        base = [s - 1 for s in sizes]
+    inside = [float(t[np.ix_(c, c)].sum()) / 2 for c in clusters]
+    out = [float(t[c, :].sum()) - 2 * i for c, i in zip(clusters, inside)]
+    between = float(t.sum()) / 2 - sum(inside)
+    extra = sz.proportional(inside + [between], \
+                            maxlinks - sum(base) - (k - 1), [0] * (k + 1))
+    intra = [min(b + e, p) for b, e, p in zip(base, extra, pairs)]
+    # a cluster must keep ports for its share (by the traffic it
+    # exchanges with the others) of the ends of the inter-cluster
+    # links; what it can't use goes to them, which needs more ports
+    for r in range(k):
+        ninter = maxlinks - sum(intra)
+        if k < 2:
+            break
+        ends = sz.proportional(out, 2 * ninter, [0] * k)
+        cap = [max(b, (s * maxdegree - e) // 2) \
+               for b, s, e in zip(base, sizes, ends)]
+        if all(i <= c for i, c in zip(intra, cap)):
+            break
+        intra = [min(i, c) for i, c in zip(intra, cap)]
+    return intra, maxlinks - sum(intra)
+
+def cluster_graph_of(G, t, nodes):
+    # the part of traffic graph G between nodes, relabelled 0 .. s-1
+    # for the dense engine; built from the traffic matrix t, as a
+    # subgraph view of a large complete graph is slow to copy
+    sub = nx.Graph()
+    sub.add_nodes_from(range(len(nodes)))
+    for i, u in enumerate(nodes):
+        for j in range(i + 1, len(nodes)):
+            if G.has_edge(u, nodes[j]):
+                sub.add_edge(i, j, weight=t[u, nodes[j]])
+    return sub
+
+def cluster_job(job):
+    # reduce one cluster; module-level so it can be used as a
+    # multiprocessing pool worker
+    import tool
+    sub, nodes, maxlinks, maxdegree, engine = job
+    GN = tool.reduce_graph(sub, maxlinks, maxdegree, engine)
+    return [(nodes[u], nodes[v]) for u, v in GN.edges()]
+
+def cluster_graph(t, clusters):
+    # complete graph of the clusters, weighted by the traffic between
+    g = nx.Graph()
+    g.add_nodes_from(range(len(clusters)))
+    for a in range(len(clusters)):
+        for b in range(a + 1, len(clusters)):
+            g.add_edge(a, b, weight=float(t[np.ix_(clusters[a], \
+                                                   clusters[b])].sum()))
+    return g
+
+def inter_links(t, clusters, edges, nlinks, maxdegree, size, engine, \
+                parallel):
+    # the links between clusters, given the links inside them
+    k = len(clusters)
+    if k < 2:
+        return []
+    degree = np.zeros(t.shape[0], dtype=np.int64)
+    for u, v in edges:
+        degree[u] += 1
+        degree[v] += 1
+    # which clusters to link: the cluster graph reduced like the
+    # switches (hierarchically itself if there are many clusters), a
+    # cluster's degree bounded by the ports its switches have left
+    C = cluster_graph(t, clusters)
+    ports = min(int((maxdegree - degree[c]).clip(0).sum()) \
+                for c in clusters)
+    cml = min(nlinks, k * (k - 1) // 2)
+    CN = reduce_level(C, cml, max(ports, 2), size, engine, parallel)
+    cp = sorted((min(a, b), max(a, b), w) \
+                for a, b, w in CN.edges(data='weight'))
+    # the links left over go to the busiest cluster pairs
+    counts = sz.proportional([w for a, b, w in cp], max(nlinks, len(cp)), \
+                             [1] * len(cp))
+    links = []
+    for (a, b, w), m in zip(cp, counts):
+        cand = [(u, v) for u in clusters[a] for v in clusters[b]]
+        for i in range(m):
+            free = [(u, v) for u, v in cand \
+                    if degree[u] < maxdegree and degree[v] < maxdegree]
+            if not free:
+                break
+            u, v = min(free, key=lambda e: (-t[e[0], e[1]], \
+                                            max(degree[e[0]], \
+                                                degree[e[1]]), e))
+            cand.remove((u, v))
+            degree[u] += 1
+            degree[v] += 1
+            links.append((u, v))
+            if not cand:
+                break
+    links += connect_clusters(t, clusters, cp, links, degree, maxdegree)
+    # links the shares left unplaced go, one at a time, to the busiest
+    # cluster pairs that still have ports
+    cp.sort(key=lambda p: -p[2])
+    placed = True
+    while placed and len(links) < nlinks:
+        placed = False
+        for a, b, w in cp:
+            if len(links) >= nlinks:
+                break
+            free = [(u, v) for u in clusters[a] for v in clusters[b] \
+                    if degree[u] < maxdegree and degree[v] < maxdegree \
+                    and (u, v) not in links]
+            if free:
+                u, v = min(free, key=lambda e: (-t[e[0], e[1]], e))
+                degree[u] += 1
+                degree[v] += 1
+                links.append((u, v))
+                placed = True
+    return links
+
+def connect_clusters(t, clusters, cp, links, degree, maxdegree):
+    # links that join the clusters into one network where the kept
+    # cluster pairs cp had no switches with ports to spare: for each
+    # such pair whose clusters aren't joined yet, the busiest pair of
+    # switches with ports to spare between the two parts it would join;
+    # only if there is none does a switch get a port too many
+    part = list(range(len(clusters)))
+    where = {}
+    for c, nodes in enumerate(clusters):
+        for u in nodes:
+            where[u] = c
+
+    def find(c):
+        while part[c] != c:
+            c = part[c]
+        return c
+
+    for u, v in links:
+        part[find(where[u])] = find(where[v])
+    added = []
+    for a, b, w in cp:
+        pa = find(a)
+        pb = find(b)
+        if pa == pb:
+            continue
+        cand = [(u, v) for u in sorted(where) if find(where[u]) == pa \
+                for v in sorted(where) if find(where[v]) == pb]
+        free = [(u, v) for u, v in cand \
+                if degree[u] < maxdegree and degree[v] < maxdegree]
+        if free:
+            cand = free
+        else:
+            # the clusters must be linked even if it costs a port (which
+            # repair_degree may win back)
+            cand = [(u, v) for u in clusters[a] for v in clusters[b]]
+        u, v = min(cand, key=lambda e: (-t[e[0], e[1]], \
+                                        max(degree[e[0]], degree[e[1]]), \
+                                        e))
+        degree[u] += 1
+        degree[v] += 1
+        added.append((u, v))
+        part[pa] = pb
+    return added
+
+def repair_degree(t, edges, n, maxdegree):
+    # the links with those of switches over maxdegree (a cluster's
+    # reduction can't always meet it, e.g. on a spanning tree's budget)
+    # moved to switches with ports to spare: each switch's lightest
+    # links are dropped while it has too many, each replaced by the
+    # busiest link between switches with ports to spare (that joins
+    # the network again if dropping it split it), as long as the
+    # network stays connected
+    g = nx.Graph()
+    g.add_nodes_from(range(n))
+    g.add_edges_from(edges)
+    for u in range(n):
+        for x in sorted(g.neighbors(u), key=lambda x: (t[u, x], x)):
+            if g.degree(u) <= maxdegree:
+                break
+            g.remove_edge(u, x)
+            split = not nx.has_path(g, u, x)
+            if split:
+                side = nx.node_connected_component(g, u)
+            free = [(p, q) for p in range(n) for q in range(p + 1, n) \
+                    if u not in (p, q) and not g.has_edge(p, q) and \
+                    g.degree(p) < maxdegree and g.degree(q) < maxdegree \
+                    and (not split or (p in side) != (q in side))]
+            if free:
+                p, q = min(free, key=lambda e: (-t[e[0], e[1]], e))
+                g.add_edge(p, q)
+            elif split:
+                g.add_edge(u, x)
+    over = [u for u in range(n) if g.degree(u) > maxdegree]
+    if over:
+        sys.stderr.write('hierarchy: no ports to spare to connect ' + \
+                         'switches %s within maxdegree %d\n' \
+                         % (', '.join(str(u) for u in over), maxdegree))
+    return list(g.edges())
+
+def reduce_level(G, maxlinks, maxdegree, size, engine, parallel):
+    # G reduced directly if it is small, else hierarchically
+    import tool
+    if G.number_of_nodes() <= size:
+        return tool.reduce_graph(G, maxlinks, maxdegree, engine)
+    return reduce_hierarchical(G, maxlinks, maxdegree, size, engine, \
+                               parallel)
+
+def reduce_hierarchical(G, maxlinks, maxdegree, size, engine='networkx', \
+                        parallel=True):
+    # the topology for traffic graph G (switches 0 .. n-1) within
+    # maxlinks and maxdegree, synthesized from clusters of at most size
+    # switches; parallel reduces the clusters in a process pool
+    n = G.number_of_nodes()
+    t = cm.traffic_matrix(G, n)
+    clusters = partition(t, size)
+    intra, ninter = budgets(t, clusters, maxlinks, maxdegree)
+    # each job gets only its own part of G
+    jobs = [(cluster_graph_of(G, t, c), c, ml, maxdegree, engine) \
+            for c, ml in zip(clusters, intra)]
+    if parallel and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(len(jobs), \
+                                        multiprocessing.cpu_count()))
+        try:
+            results = pool.map(cluster_job, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [cluster_job(j) for j in jobs]
+    edges = [e for r in results for e in r]
+    edges += inter_links(t, clusters, edges, ninter, maxdegree, size, \
+                         engine, parallel)
+    edges = repair_degree(t, edges, n, maxdegree)
+    # link weights: the traffic routed over each with minimal hops
+    m = cm.evaluate_matrix(t, cm.adjacency(edges, n))
+    GN = nx.Graph()
+    GN.add_nodes_from(range(n))
+    for u, v in edges:
+        GN.add_edge(u, v, weight=m['loads'].get((min(u, v), max(u, v)), 0))
+    return GN
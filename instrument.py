@@ -0,0 +1,81 @@
+"""This module times the phases of a run of tool.py or comparisons.py and
+counts the work done by the topology reduction, so slow runs can be
+explained and regressions spotted. Each phase records its wall-clock
+time and the CPU time of this process and of its children (m2s and pool
+workers that have finished). The record, including the peak resident
+set size, is written as JSON next to the config files.
+
+State is kept at module level, like the options of the scripts, so the
+reduction code can count events without passing a recorder around.
+Counts made in pool workers stay in those processes.
+"""
+import os
+import sys
+import time
+import json
+import resource
+import contextlib
+
+phases = []
+counters = {}
+started = time.time()
+
+def cpu_times():
+    # (this process, finished children) user + system seconds
+    t = os.times()
+    return t[0] + t[1], t[2] + t[3]
+
+@contextlib.contextmanager
+def phase(name):
+    # with phase('reduce'): ... records the time spent in the block
+    wall = time.time()
+    cpu, childcpu = cpu_times()
+    try:
+        yield
+    finally:
+        c, cc = cpu_times()
+        phases.append({'name': name, 'wall': time.time() - wall, \
+                       'cpu': c - cpu, 'childcpu': cc - childcpu})
+
+def count(name, k=1):
+    counters[name] = counters.get(name, 0) + k
+
+def peak_rss():
+    # peak resident set size in kilobytes of this process and of the
+    # largest finished child; ru_maxrss is in bytes on macOS
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale, \
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale)
+
+def record(**extra):
+    rss, childrss = peak_rss()
+    cpu, childcpu = cpu_times()
+    r = {'wall': time.time() - started, 'cpu': cpu, 'childcpu': childcpu, \
+         'phases': phases, 'counters': counters, \
+         'peakrss_kb': rss, 'childpeakrss_kb': childrss}
+    r.update(extra)
+    return r
+
+def write(path, **extra):
+    # extra fields (e.g. the command line) are added to the record
+    f = open(path, 'w')
+    json.dump(record(**extra), f, indent=1, sort_keys=True, \
+              separators=(',', ': '))
+    f.write('\n')
+    f.close()
+
+@contextlib.contextmanager
+def cprofile(path):
+    # run the block under cProfile and dump its stats to path, which
+    # can be read with pstats; does nothing if path is empty
+    if path == '':
+        yield
+        return
+    import cProfile
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(path)
@@ -0,0 +1,194 @@
+"""This module reads the network report Multi2Sim writes with the
+--net-report option. The report is scanned once (through mmap, so large
+reports are not copied into memory) and every section is indexed by
+name, with its "key = value" fields stored by key. Link and node
+statistics can then be pulled out as arrays with one entry per link or
+per node.
+"""
+import os
+import re
+import mmap
+from array import array
+
+# a section header or a "key = value" line; only the first token of a
+# value is kept, e.g. "AverageLatency = 12.34"
+reportline = re.compile(br'^(?:\[ (?P<section>[^\]]+?) \]' + \
+                        br'|(?P<key>[A-Za-z][\w.]*) = (?P<value>\S*))', \
+                        re.M)
+# m2s names each direction of a link after the buffers it connects
+linkname = re.compile(r'^link_<(?P<src>[\w-]+)\.out_buf_[0-9]+>_' + \
+                      r'<(?P<dst>[\w-]+)\.in_buf_[0-9]+>$')
+switchname = re.compile(r'^sw([0-9]+)$')
+
+def parse_value(v):
+    v = v.decode('ascii')
+    try:
+        return float(v)
+    except ValueError:
+        return v
+
+class NetReport(object):
+    # index of the sections of one network's report
+
+    def __init__(self, net='net0'):
+        self.net = net
+        # section name -> {key: value}, for every section in the report
+        self.sections = {}
+        # (source node, destination node, section name) for each link
+        # direction, and (node name, section name) for each node,
+        # both in report order
+        self.links = []
+        self.nodes = []
+
+    def index(self, buf):
+        # single pass over the report contents in buf
+        prefix = 'Network.' + self.net + '.'
+        cur = None
+        for m in reportline.finditer(buf):
+            name = m.group('section')
+            if name is None:
+                if cur is not None:
+                    cur[m.group('key').decode('ascii')] = \
+                        parse_value(m.group('value'))
+                continue
+            name = name.decode('ascii')
+            cur = {}
+            self.sections[name] = cur
+            if not name.startswith(prefix):
+                continue
+            kind, dot, rest = name[len(prefix):].partition('.')
+            if kind == 'Link':
+                lm = linkname.match(rest)
+                if lm is not None:
+                    self.links.append((lm.group('src'), lm.group('dst'), \
+                                       name))
+            elif kind == 'Node':
+                self.nodes.append((rest, name))
+
+    def section(self, name):
+        # fields of "[ Network.<net>.<name> ]"
+        return self.sections.get('Network.' + self.net + '.' + name, {})
+
+    def general(self, key, default=0.0):
+        return self.section('General').get(key, default)
+
+    @property
+    def transfers(self):
+        return self.general('Transfers')
+
+    @property
+    def avgmsgsize(self):
+        return self.general('AverageMessageSize')
+
+    @property
+    def avglatency(self):
+        return self.general('AverageLatency')
+
+    def cycles(self):
+        # simulated cycles covered by the report; taken from the general
+        # section if m2s reported it, otherwise from any link's busy
+        # cycles and utilization (Utilization = BusyCycles / cycles)
+        c = self.general('Cycles')
+        if c:
+            return c
+        for src, dst, s in self.links:
+            f = self.sections[s]
+            if f.get('Utilization', 0.0) > 0:
+                return f.get('BusyCycles', 0.0) / f['Utilization']
+        return 0.0
+
+    def link_stat(self, key):
+        # one value per entry of self.links
+        return array('d', [self.sections[s].get(key, 0.0) \
+                           for src, dst, s in self.links])
+
+    def node_stat(self, key, endnodes=False):
+        # one value per entry of self.nodes, or only for end nodes
+        # (n0, n1, ...) rather than switches if endnodes is set
+        return array('d', [self.sections[s].get(key, 0.0) \
+                           for n, s in self.nodes \
+                           if not endnodes or n.startswith('n')])
+
+    def end_node_stat(self, key):
+        # one value per end node n<i>, indexed by i (0 for any missing)
+        vals = {}
+        for name, s in self.nodes:
+            if name.startswith('n') and name[1:].isdigit():
+                vals[int(name[1:])] = self.sections[s].get(key, 0.0)
+        k = max(vals) + 1 if vals else 0
+        return array('d', [vals.get(i, 0.0) for i in range(k)])
+
+    def sent(self):
+        # bytes sent by each end node, as trafficprofile.Profile.sent
+        return self.end_node_stat('SentBytes')
+
+    def received(self):
+        return self.end_node_stat('ReceivedBytes')
+
+    def totaltraffic(self):
+        # bytes sent by all end nodes
+        return sum(self.node_stat('SentBytes', endnodes=True))
+
+    def switch_links(self):
+        # switch numbers at each end of every switch-to-switch link
+        # direction, with the bytes transferred in that direction
+        src = array('l')
+        dst = array('l')
+        nbytes = array('l')
+        for s, d, name in self.links:
+            sm = switchname.match(s)
+            dm = switchname.match(d)
+            if sm is None or dm is None:
+                continue
+            src.append(int(sm.group(1)))
+            dst.append(int(dm.group(1)))
+            nbytes.append(int(self.sections[name].get('TransferredBytes', \
+                                                      0)))
+        return src, dst, nbytes
+
+# link and node counts that add up across reports
+summed = ['TransferredMessages', 'TransferredBytes', 'BusyCycles', \
+          'SentMessages', 'SentBytes', 'ReceivedMessages', 'ReceivedBytes']
+
+def merge_reports(reports, weights=None):
+    # reports of runs on the same network as one report: link and node
+    # counts and the transfers are summed, the averages are weighted by
+    # each report's transfers, and the cycles are the total of all runs
+    # with weights, each report's counts and cycles are scaled by its
+    # weight first (see workloads.py)
+    if weights is None:
+        weights = [1.0] * len(reports)
+    rpt = NetReport(reports[0].net)
+    rpt.links = list(reports[0].links)
+    rpt.nodes = list(reports[0].nodes)
+    for name, fields in reports[0].sections.items():
+        f = dict(fields)
+        for key in summed:
+            if key in f:
+                f[key] = sum(w * r.sections.get(name, {}).get(key, 0.0) \
+                             for r, w in zip(reports, weights))
+        rpt.sections[name] = f
+    transfers = sum(w * r.transfers for r, w in zip(reports, weights))
+    general = rpt.sections.setdefault('Network.' + rpt.net + '.General', {})
+    general['Transfers'] = transfers
+    for key in ['AverageMessageSize', 'AverageLatency']:
+        if transfers:
+            general[key] = sum(w * r.general(key) * r.transfers \
+                               for r, w in zip(reports, weights)) / transfers
+    general['Cycles'] = sum(w * r.cycles() for r, w in zip(reports, weights))
+    return rpt
+
+def read_net_report(path, net='net0'):
+    rpt = NetReport(net)
+    f = open(path, 'rb')
+    try:
+        # mmap refuses empty files; an empty report has no sections
+        if os.fstat(f.fileno()).st_size > 0:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                rpt.index(buf)
+            finally:
+                buf.close()
+    finally:
+        f.close()
+    return rpt
@@ -0,0 +1,197 @@
+"""This module replays a message trace (nettrace.py) on a topology in a
+small event-driven network simulation, and writes a net report in the
+format of m2s --net-report, so netreport.read_net_report and everything
+built on it read the result as they would a Multi2Sim report.
+
+The network comes from a net config as writeconfigs writes them: the
+nodes, the links with their bandwidth, and the routes if it has any,
+otherwise minimal-hop routes (as routing.route_table gives for hop
+counts). Each direction of a link is a channel that carries one message
+at a time, first come first served. A message takes ceil(size /
+bandwidth) cycles to cross a channel plus one cycle through the switch.
+Buffers are taken to be unbounded, so there is no backpressure, and
+messages are not split into packets: a replay is much cheaper than an
+m2s run but is meant for comparing topologies, not for reproducing
+Multi2Sim's latencies exactly.
+"""
+import heapq
+import configparser
+import costmodel as cm
+import routing as rt
+
+class Network(object):
+    # nodes, channels and routes of one net config
+
+    def __init__(self, text, net='net0'):
+        cp = configparser.ConfigParser(interpolation=None, strict=False)
+        cp.optionxform = str
+        cp.read_string(text)
+        prefix = 'Network.' + net + '.'
+        bandwidth = cp.getint('Network.' + net, 'DefaultBandwidth', \
+                              fallback=256)
+        self.nodes = []
+        links = []
+        for s in cp.sections():
+            if s.startswith(prefix + 'Node.'):
+                self.nodes.append(s[len(prefix + 'Node.'):])
+            elif s.startswith(prefix + 'Link.'):
+                links.append((cp.get(s, 'Source'), cp.get(s, 'Dest'), \
+                              cp.getint(s, 'Bandwidth', fallback=bandwidth)))
+        # each bidirectional link is two channels, in the order m2s
+        # creates them; buffers are numbered per node in that order
+        self.channels = []
+        self.bandwidth = []
+        self.names = []
+        bufs = {}
+        self.channel = {}
+        for src, dst, bw in links:
+            for a, b in ((src, dst), (dst, src)):
+                ob = bufs.get((a, 'out'), 0)
+                ib = bufs.get((b, 'in'), 0)
+                bufs[(a, 'out')] = ob + 1
+                bufs[(b, 'in')] = ib + 1
+                self.channel[(a, b)] = len(self.channels)
+                self.channels.append((a, b))
+                self.bandwidth.append(bw)
+                self.names.append('link_<%s.out_buf_%d>_<%s.in_buf_%d>' \
+                                  % (a, ob, b, ib))
+        self.next = {}
+        routes = prefix + 'Routes'
+        if cp.has_section(routes):
+            for key, nxt in cp.items(routes):
+                node, to, dst = key.partition('.to.')
+                self.next[(node, dst)] = nxt
+        else:
+            self.next = self.shortest_routes()
+        self.paths = {}
+
+    def shortest_routes(self):
+        # minimal-hop routes between the switches sw<i>, with end node
+        # n<i> on sw<i> and any further end nodes (the L2 modules) on
+        # the switches they are linked to
+        cores = sum(1 for n in self.nodes if n.startswith('sw'))
+        edges = []
+        l2links = {}
+        for a, b in self.channels:
+            if a.startswith('sw') and b.startswith('sw'):
+                edges.append((int(a[2:]), int(b[2:])))
+            elif a.startswith('sw') and int(b[1:]) >= cores:
+                l2links.setdefault(int(b[1:]), []).append(int(a[2:]))
+        adj = cm.adjacency(edges, cores)
+        h = cm.hop_matrix(adj)
+        nh = cm.next_hops(adj, h)
+        routes = rt.route_table(h, nh, cores, \
+                                [sorted(l2links[k]) for k in sorted(l2links)])
+        return dict(((s, d), n) for s, d, n in routes)
+
+    def path(self, src, dst):
+        # channels from end node src to end node dst
+        p = self.paths.get((src, dst))
+        if p is None:
+            p = []
+            cur = src
+            while cur != dst:
+                nxt = self.next.get((cur, dst))
+                if nxt is None or len(p) > len(self.channels):
+                    raise ValueError('no route from %s to %s' % (src, dst))
+                p.append(self.channel[(cur, nxt)])
+                cur = nxt
+            self.paths[(src, dst)] = p
+        return p
+
+def replay(network, messages, hopdelay=1):
+    # simulate the (cycle, src, dst, size) messages, end nodes given by
+    # number, in cycle order; returns the per-channel (messages, bytes,
+    # busy cycles), the messages delivered, their total latency and
+    # bytes, and the cycle the last one arrived
+    nch = len(network.channels)
+    free = [0] * nch
+    busy = [0] * nch
+    nmsgs = [0] * nch
+    nbytes = [0] * nch
+    bw = network.bandwidth
+    heap = []
+    seq = 0
+    done = [0, 0, 0, 0]
+
+    def step(ev):
+        # the message of event ev takes the next channel of its path
+        t, s, path, hop, size, t0 = ev
+        ch = path[hop]
+        ser = -(-size // bw[ch])
+        start = max(t, free[ch])
+        free[ch] = start + ser
+        busy[ch] += ser
+        nmsgs[ch] += 1
+        nbytes[ch] += size
+        arrive = start + ser + hopdelay
+        if hop + 1 < len(path):
+            heapq.heappush(heap, (arrive, s, path, hop + 1, size, t0))
+        else:
+            done[0] += 1
+            done[1] += arrive - t0
+            done[2] += size
+            done[3] = max(done[3], arrive)
+
+    for cycle, src, dst, size in messages:
+        if src == dst:
+            continue
+        # everything that happens before this message is sent
+        while heap and heap[0][0] < cycle:
+            step(heapq.heappop(heap))
+        path = network.path('n%d' % src, 'n%d' % dst)
+        heapq.heappush(heap, (cycle, seq, path, 0, size, cycle))
+        seq += 1
+    while heap:
+        step(heapq.heappop(heap))
+    return (nmsgs, nbytes, busy), done[0], done[1], done[2], done[3]
+
+def render_report(network, result, cycles, net='net0'):
+    # the net report of a replay, over at least that many cycles
+    (nmsgs, nbytes, busy), count, latency, total, last = result
+    cycles = max(int(cycles), last, 1)
+    s = []
+    s.append('[ Network.%s.General ]\n' % net + \
+             'Transfers = %d\n' % count + \
+             'AverageMessageSize = %.2f\n' % \
+             (float(total) / count if count else 0.0) + \
+             'AverageLatency = %.4f\n' % \
+             (float(latency) / count if count else 0.0) + \
+             'Cycles = %d\n\n' % cycles)
+    sent = {}
+    received = {}
+    sentmsgs = {}
+    receivedmsgs = {}
+    for i, (a, b) in enumerate(network.channels):
+        s.append('[ Network.%s.Link.%s ]\n' % (net, network.names[i]) + \
+                 'Config.Bandwidth = %d\n' % network.bandwidth[i] + \
+                 'TransferredMessages = %d\n' % nmsgs[i] + \
+                 'TransferredBytes = %d\n' % nbytes[i] + \
+                 'BusyCycles = %d\n' % busy[i] + \
+                 'BytesPerCycle = %.4f\n' % (float(nbytes[i]) / cycles) + \
+                 'Utilization = %.4f\n\n' % (float(busy[i]) / cycles))
+        sent[a] = sent.get(a, 0) + nbytes[i]
+        received[b] = received.get(b, 0) + nbytes[i]
+        sentmsgs[a] = sentmsgs.get(a, 0) + nmsgs[i]
+        receivedmsgs[b] = receivedmsgs.get(b, 0) + nmsgs[i]
+    for n in network.nodes:
+        s.append('[ Network.%s.Node.%s ]\n' % (net, n) + \
+                 'SentMessages = %d\n' % sentmsgs.get(n, 0) + \
+                 'SentBytes = %d\n' % sent.get(n, 0) + \
+                 'SendRate = %.4f\n' % (float(sent.get(n, 0)) / cycles) + \
+                 'ReceivedMessages = %d\n' % receivedmsgs.get(n, 0) + \
+                 'ReceivedBytes = %d\n' % received.get(n, 0) + \
+                 'ReceiveRate = %.4f\n\n' % \
+                 (float(received.get(n, 0)) / cycles))
+    return ''.join(s)
+
+def replay_config(configfile, trace, rptfile):
+    # replay trace (a nettrace.Trace) on the net config in configfile
+    # and write the report to rptfile
+    f = open(configfile)
+    network = Network(f.read())
+    f.close()
+    result = replay(network, trace.messages())
+    f = open(rptfile, 'w')
+    f.write(render_report(network, result, trace.cycles))
+    f.close()
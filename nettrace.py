@@ -0,0 +1,125 @@
+"""This module records the messages the end nodes send during a
+profiling run, so that other topologies can be evaluated by replaying
+them in netsim.py instead of simulating the program again.
+
+With --net-debug <file>, m2s writes a line for every network event. A
+message send reads like
+
+    net: msg a="send" net="net0" msg=1234 size=72 src="n3" dst="n16"
+
+and the cycle is given as "cycle=<cycle>" or "clk=<cycle>", on that
+line or on an earlier line of its own. Only sends on net0 from one end
+node to another are kept. If the file has no cycles at all, the sends
+are spread evenly over the run, in their order. The output is read one
+line at a time, and through gzip if its name ends in ".gz", since it
+can be much larger than the run's other files.
+
+The trace is stored like a traffic profile (trafficprofile.py): a fixed
+header followed by one fixed-size record per message, little-endian
+
+    header      magic "NOCTRACE", version, end nodes (k), messages (m),
+                whether the cycles were recorded, then the cycles the
+                run covers as a double
+    message     cycle sent (64 bits), source and destination end node
+                numbers and size in bytes (32 bits each)
+"""
+import os
+import re
+import gzip
+import mmap
+import struct
+
+magic = b'NOCTRACE'
+version = 1
+header = struct.Struct('<8s4I4xd')
+record = struct.Struct('<q3i')
+
+# "key=value" or key="value" fields of a debug line
+fieldre = re.compile(r'([A-Za-z_][\w-]*)=(?:"([^"]*)"|(\S+))')
+endnode = re.compile(r'^n([0-9]+)$')
+
+def open_debug(path, binary=False):
+    # the debug output at path as text (or bytes), uncompressed as it
+    # is read if it was gzipped
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb' if binary else 'rt')
+    return open(path, 'rb' if binary else 'r')
+
+def parse_debug(lines, net='net0'):
+    # (cycle, src, dst, size) for every send between end nodes in the
+    # m2s debug output lines; cycle is None until the output gives one
+    cycle = None
+    for line in lines:
+        # most lines are other events: skip them without the regex
+        if 'send' not in line and 'cycle=' not in line and \
+           'clk=' not in line:
+            continue
+        f = dict((k, q or v) for k, q, v in fieldre.findall(line))
+        c = f.get('cycle', f.get('clk'))
+        if c is not None and c.isdigit():
+            cycle = int(c)
+        if f.get('a') != 'send' or f.get('net', net) != net:
+            continue
+        sm = endnode.match(f.get('src', ''))
+        dm = endnode.match(f.get('dst', ''))
+        size = f.get('size', '')
+        if sm is None or dm is None or not size.isdigit():
+            continue
+        yield cycle, int(sm.group(1)), int(dm.group(1)), int(size)
+
+def record_trace(debugfile, path, cycles, net='net0'):
+    # convert the m2s debug output in debugfile into a trace at path,
+    # for a run of that many cycles; returns the number of messages
+    # written to a temporary file first, like write_profile
+    tmp = path + '.tmp'
+    out = open(tmp, 'wb')
+    out.write(header.pack(magic, version, 0, 0, 0, float(cycles)))
+    k = 0
+    m = 0
+    timed = 1
+    f = open_debug(debugfile)
+    try:
+        for cycle, src, dst, size in parse_debug(f, net):
+            if cycle is None:
+                # placed by read order; see Trace.messages
+                timed = 0
+                cycle = m
+            out.write(record.pack(cycle, src, dst, size))
+            k = max(k, src + 1, dst + 1)
+            m += 1
+    finally:
+        f.close()
+    out.seek(0)
+    out.write(header.pack(magic, version, k, m, timed, float(cycles)))
+    out.close()
+    os.rename(tmp, path)
+    return m
+
+class Trace(object):
+    # a trace file, memory-mapped
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        mg, ver, self.k, self.count, self.timed, self.cycles = \
+            header.unpack_from(self.buf, 0)
+        if mg != magic or ver != version:
+            raise ValueError(path + ' is not a message trace')
+
+    def close(self):
+        self.buf.close()
+        self.file.close()
+
+    def messages(self):
+        # (cycle, src, dst, size) of every message, in cycle order
+        spread = float(self.cycles) / self.count if self.count else 0.0
+        off = header.size
+        for i in range(self.count):
+            cycle, src, dst, size = record.unpack_from(self.buf, off)
+            off += record.size
+            if not self.timed:
+                cycle = int(i * spread)
+            yield cycle, src, dst, size
+
+def read_trace(path):
+    return Trace(path)
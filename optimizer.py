@@ -0,0 +1,130 @@
+"""This module searches for a better novel topology than the greedy
+reduction in tool.py finds on its own. Starting from the greedy result
+(or from a mesh), it runs simulated annealing over link swaps: remove
+one link and add another, or add a link while there are fewer than
+maxlinks. Every candidate stays connected and within maxlinks and
+maxdegree, and is scored by costmodel against the profiled traffic.
+
+Several independent chains (different random seeds) run in parallel,
+one process each, and the best topology found by any of them is kept.
+"""
+import math
+import random
+import multiprocessing
+import numpy as np
+import networkx as nx
+import costmodel as cm
+import writeconfigs as wc
+
+def score(t, adj, key, kw):
+    # lower is better; disconnected topologies are never accepted
+    m = cm.evaluate_matrix(t, adj, **kw)
+    if not m['connected']:
+        return np.inf
+    return m[key]
+
+def neighbor(adj, maxl, maxd, rng):
+    # random link swap (or addition) respecting maxlinks and maxdegree;
+    # returns the new adjacency matrix, or None if the move is invalid
+    n = adj.shape[0]
+    a = adj.copy()
+    iu, ju = np.nonzero(np.triu(a, 1))
+    nlinks = len(iu)
+    if nlinks > 0 and (nlinks >= maxl or rng.random() < 0.8):
+        k = rng.randrange(nlinks)
+        a[iu[k], ju[k]] = a[ju[k], iu[k]] = False
+    deg = a.sum(axis=1)
+    free = np.flatnonzero(deg < maxd)
+    if len(free) < 2:
+        return None
+    u = int(free[rng.randrange(len(free))])
+    v = int(free[rng.randrange(len(free))])
+    if u == v or a[u, v]:
+        return None
+    a[u, v] = a[v, u] = True
+    if (a != adj).sum() == 0:
+        return None
+    return a
+
+def anneal(job):
+    # one annealing chain; job is picklable so it can run in a Pool
+    t, start, maxl, maxd, iters, seed, key, kw = job
+    rng = random.Random(seed)
+    cur = start
+    cur_s = score(t, cur, key, kw)
+    best = cur
+    best_s = cur_s
+    # start hot enough to accept moves a few percent worse, and cool
+    # geometrically to 1/1000 of that by the last iteration
+    temp0 = 0.05 * cur_s if 0 < cur_s < np.inf else 1.0
+    for i in range(iters):
+        temp = temp0 * 0.001 ** (float(i) / max(iters - 1, 1))
+        a = neighbor(cur, maxl, maxd, rng)
+        if a is None:
+            continue
+        s = score(t, a, key, kw)
+        if s == np.inf:
+            continue
+        if s <= cur_s or rng.random() < math.exp((cur_s - s) / temp):
+            cur = a
+            cur_s = s
+            if s < best_s:
+                best = a
+                best_s = s
+    return best_s, seed, best
+
+def start_mesh(n, maxl, maxd, shape=None):
+    # mesh links, or None if a mesh does not meet the constraints
+    el = wc.mesh_edges(*wc.grid_shape(n, shape))
+    a = cm.adjacency(el, n)
+    if len(el) > maxl or a.sum(axis=1).max() > maxd:
+        return None
+    return a
+
+def optimize(graph, start, n, maxl, maxd, chains=4, iters=2000, \
+             starts=('greedy',), key='latency', shape=None, **kw):
+    # graph is the profiled traffic graph, start the greedy topology;
+    # the chains are split over the requested starting points (a
+    # mesh start is skipped if the mesh breaks the constraints)
+    # returns (best score, greedy score, best topology as a Graph)
+    t = cm.traffic_matrix(graph, n)
+    greedy = cm.adjacency(start.edges(), n)
+    points = []
+    for s in starts:
+        if s == 'greedy':
+            points.append(greedy)
+        elif s == 'mesh':
+            a = start_mesh(n, maxl, maxd, shape)
+            if a is not None:
+                points.append(a)
+    if not points:
+        points.append(greedy)
+    jobs = [(t, points[c % len(points)], maxl, maxd, iters, c, key, kw) \
+            for c in range(chains)]
+    nproc = min(chains, multiprocessing.cpu_count())
+    if nproc > 1:
+        pool = multiprocessing.Pool(nproc)
+        try:
+            results = pool.map(anneal, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [anneal(j) for j in jobs]
+    greedy_s = score(t, greedy, key, kw)
+    best_s, seed, best = min(results, key=lambda r: (r[0], r[1]))
+    if best_s >= greedy_s:
+        best_s = greedy_s
+        best = greedy
+    return best_s, greedy_s, to_graph(t, best)
+
+def to_graph(t, adj):
+    # topology as a Graph, each link weighted by the traffic it carries
+    h = cm.hop_matrix(adj)
+    load = cm.link_loads(t, cm.next_hops(adj, h), h)
+    g = nx.Graph()
+    g.add_nodes_from(range(adj.shape[0]))
+    iu, ju = np.nonzero(np.triu(adj, 1))
+    for i, j in zip(iu.tolist(), ju.tolist()):
+        g.add_edge(i, j, weight=int(load[i, j]))
+    return g
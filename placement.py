@@ -0,0 +1,132 @@
+"""This module places the L2 cache modules in the network. Each L2 module
+has an end node of its own (n<cores>, n<cores + 1>, ...) linked to a
+few switches, by default L2-0 to sw0 and sw1 and L2-1 to sw1 and sw2
+(writeconfigs.default_l2links), wherever the traffic comes from.
+
+In the memory hierarchy writeconfigs sets up, the L1 caches only talk to
+the L2 modules, so all traffic on net0 is between the cores' end nodes
+and the L2 nodes. The profile gives the bytes each end node sent and
+received. Each core's traffic is split over the L2 modules in
+proportion to what each L2 node received and sent, which gives the
+demand between every core and every L2 module. That demand doesn't
+depend on where the modules are attached, so a placement determines a
+switch-to-switch traffic matrix for the synthesis.
+
+For a given topology, the attachments are improved by local search:
+move one attachment at a time to whichever unused switch lowers the
+hop-weighted L2 traffic most (each core's traffic going to the nearest
+switch its L2 module is linked to), until no move helps. tool.py
+alternates synthesis and placement, see tool.synthesize_placed.
+"""
+import numpy as np
+import networkx as nx
+
+def shares(x):
+    # x normalized to sum to 1, or equal shares if it is all zeros
+    x = np.asarray(x, dtype=np.float64)
+    if x.sum() > 0:
+        return x / x.sum()
+    return np.full(len(x), 1.0 / len(x))
+
+def demand(rpt, cores, nl2):
+    # (up, down): up[i, k] is the bytes core i sent to L2 module k, and
+    # down[i, k] the bytes it received from it, from the end node stats
+    # of the profile rpt
+    k = cores + nl2
+    sent = np.zeros(k)
+    received = np.zeros(k)
+    s = list(rpt.sent())[:k]
+    r = list(rpt.received())[:k]
+    sent[:len(s)] = s
+    received[:len(r)] = r
+    up = np.outer(sent[:cores], shares(received[cores:]))
+    down = np.outer(received[:cores], shares(sent[cores:]))
+    return up, down
+
+def traffic(dem, l2links, cores):
+    # directed switch-to-switch traffic t[s, d] for a placement; each
+    # module's traffic is split evenly over the switches it is linked
+    # to, and traffic that stays within a switch is left out
+    up, down = dem
+    t = np.zeros((cores, cores))
+    for k, sws in enumerate(l2links):
+        for a in sws:
+            t[:, a] += up[:, k] / len(sws)
+            t[a, :] += down[:, k] / len(sws)
+    np.fill_diagonal(t, 0.0)
+    return t
+
+def cost(h, w, l2links):
+    # hop-weighted L2 traffic on a topology with hop matrix h; w[i, k]
+    # is the bytes between core i and L2 module k
+    c = 0.0
+    for k, sws in enumerate(l2links):
+        c += float(w[:, k].dot(h[:, list(sws)].min(axis=1)))
+    return c
+
+def greedy(h, w, sizes):
+    # attachments chosen one at a time, each where it lowers the cost
+    # most given the ones already chosen; sizes is the number of
+    # switches of each module
+    n = h.shape[0]
+    l2links = [[] for s in sizes]
+    used = set()
+    for j in range(max(sizes)):
+        for k in range(len(sizes)):
+            if j >= sizes[k]:
+                continue
+            best = None
+            for a in range(n):
+                if a in used:
+                    continue
+                sws = l2links[k] + [a]
+                c = float(w[:, k].dot(h[:, sws].min(axis=1)))
+                if best is None or c < best[0]:
+                    best = (c, a)
+            l2links[k].append(best[1])
+            used.add(best[1])
+    return l2links
+
+def improve(h, w, l2links):
+    # steepest-descent local search over single attachment moves
+    n = h.shape[0]
+    cur = [list(s) for s in l2links]
+    cur_c = cost(h, w, cur)
+    while True:
+        used = set(a for s in cur for a in s)
+        best = None
+        for k in range(len(cur)):
+            for j in range(len(cur[k])):
+                for a in range(n):
+                    if a in used:
+                        continue
+                    cand = [list(s) for s in cur]
+                    cand[k][j] = a
+                    c = cost(h, w, cand)
+                    if c < cur_c and (best is None or c < best[0]):
+                        best = (c, cand)
+        if best is None:
+            return cur
+        cur_c, cur = best
+
+def place(h, w, l2links):
+    # the better of local search from the given placement and from a
+    # greedy one, with each module linked to as many switches as now
+    # (as long as there are enough switches for the greedy start)
+    starts = [l2links]
+    if sum(len(s) for s in l2links) <= h.shape[0]:
+        starts.append(greedy(h, w, [len(s) for s in l2links]))
+    results = [improve(h, w, s) for s in starts]
+    return min(results, key=lambda p: cost(h, w, p))
+
+def traffic_graph(t):
+    # the traffic graph the synthesis starts from: every switch pair
+    # linked (as in the fully-connected profile), weighted by the
+    # bytes they exchange
+    n = t.shape[0]
+    g = nx.Graph()
+    g.add_nodes_from(range(n))
+    for i in range(n):
+        for j in range(i + 1, n):
+            g.add_edge(i, j, weight=int(t[i, j] + t[j, i]))
+    return g
@@ -0,0 +1,150 @@
+"""This module runs the profiling step of tool.py: the target app on the
+fully-connected NoC, whose net report gives the traffic between every
+pair of switches.
+
+Instead of one long run, the profile can be sampled: several short runs
+in parallel, each fast-forwarding (functional simulation only) to a
+different point of the program and simulating a window of instructions
+in detail. Their net reports are merged into one, and each sample's
+traffic is compared with the sum of the other samples, which shows
+whether the windows are long enough to agree on the traffic pattern.
+
+For a workload mix, each app gets a run of its own, again in parallel.
+
+A single run can also be made on a cheaper topology than the
+fully-connected one, whose profile is then rebuilt from the messages
+(see traceprofile.py).
+"""
+import os
+import math
+import writeconfigs as wc
+import simoutput as so
+import netreport as nr
+import scheduler as sj
+
+def profile_job(sim, maxinst, cpucfg, rptfile, exe, args, outdir='.', \
+                ctxcfg='ctx-config.txt', netcfg='fully-net-config.txt'):
+    # a run on the fully-connected NoC, or the one in netcfg; the config
+    # files and the report are in outdir
+    cfgs = [os.path.join(outdir, c) for c in \
+            [cpucfg, ctxcfg, 'mem-config.txt', netcfg]]
+    return sj.Job(rptfile.replace('-net-report.txt', ''), sim, maxinst, \
+                  cfgs, os.path.join(outdir, rptfile), exe, args)
+
+def check_jobs(jobs):
+    # the profile is useless if any of its runs failed
+    for j in jobs:
+        if j.error:
+            raise RuntimeError('profiling run ' + j.name + ' ' + j.error)
+
+def profile_run(sim, maxinst, cpucfg, rptfile, exe, args, outdir='.', \
+                netdebug=None, netcfg='fully-net-config.txt'):
+    # one run; returns the x86 stats fields
+    # with netdebug, m2s also writes its network debug output there,
+    # from which nettrace.py records the messages (and traceprofile.py
+    # the profile, for a run on another topology than fully-connected)
+    job = profile_job(sim, maxinst, cpucfg, rptfile, exe, args, outdir, \
+                      netcfg=netcfg)
+    job.netdebug = netdebug
+    check_jobs(sj.run_jobs([job]))
+    return job.stats.fields
+
+def sample_offsets(maxinst, window, samples):
+    # instructions to fast-forward before each sample's window; the
+    # windows are spread evenly over the first maxinst instructions
+    if samples == 1:
+        return [0]
+    span = max(maxinst - window, 0)
+    return [span * i // (samples - 1) for i in range(samples)]
+
+def profile_sampled(sim, maxinst, window, samples, cores, exe, args, \
+                    outdir='.'):
+    # run the samples side by side (see scheduler.py); the config
+    # files other than the cpu config must already be written
+    # returns the merged x86 stats and net report, and the report of
+    # each sample
+    jobs = []
+    for i, ff in enumerate(sample_offsets(maxinst, window, samples)):
+        cpucfg = 'sample%d-cpu-config.txt' % i
+        wc.write_file(cpucfg, wc.render_cpu(cores, ff), outdir)
+        # the instruction limit includes the fast-forwarded ones
+        jobs.append(profile_job(sim, str(ff + window), cpucfg, \
+                                'fully-sample%d-net-report.txt' % i, \
+                                exe, args, outdir))
+    check_jobs(sj.run_jobs(jobs))
+    stats = so.merge_stats([j.stats for j in jobs])
+    reports = [nr.read_net_report(j.rptfile) for j in jobs]
+    return stats, nr.merge_reports(reports), reports
+
+def profile_apps(sim, maxinst, apps, outdir='.'):
+    # one run per app of a workload mix (see workloads.py), side by
+    # side, each with a ctx config of its own; apps is [(exe, args)]
+    # and the cpu, mem and net config files must already be written
+    # returns the x86 stats and the net report of each app
+    jobs = []
+    for i, (exe, args) in enumerate(apps):
+        ctxcfg = 'app%d-ctx-config.txt' % i
+        wc.write_file(ctxcfg, wc.render_ctx(exe, args), outdir)
+        jobs.append(profile_job(sim, maxinst, 'cpu-config.txt', \
+                                'fully-app%d-net-report.txt' % i, exe, \
+                                args, outdir, ctxcfg))
+    check_jobs(sj.run_jobs(jobs))
+    return [j.stats for j in jobs], \
+           [nr.read_net_report(j.rptfile) for j in jobs]
+
+def cosine(x, y):
+    xy = sum(a * b for a, b in zip(x, y))
+    xx = sum(a * a for a in x)
+    yy = sum(b * b for b in y)
+    if xx == 0 or yy == 0:
+        return 0.0
+    return xy / math.sqrt(xx * yy)
+
+def ranks(x):
+    # rank of each value (0 = smallest), ties get their average rank
+    order = sorted(range(len(x)), key=lambda i: x[i])
+    r = [0.0] * len(x)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and x[order[j + 1]] == x[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            r[order[k]] = (i + j) / 2.0
+        i = j + 1
+    return r
+
+def rank_correlation(x, y):
+    # Spearman's: Pearson's correlation of the ranks
+    rx = ranks(x)
+    ry = ranks(y)
+    n = len(x)
+    if n == 0:
+        return 0.0
+    mx = sum(rx) / n
+    my = sum(ry) / n
+    cov = sum((a - mx) * (b - my) for a, b in zip(rx, ry))
+    vx = sum((a - mx) ** 2 for a in rx)
+    vy = sum((b - my) ** 2 for b in ry)
+    if vx == 0 or vy == 0:
+        return 0.0
+    return cov / math.sqrt(vx * vy)
+
+def agreement(graphs):
+    # (cosine similarity, rank correlation) of each sample's link
+    # traffic against the sum of the other samples' traffic
+    pairs = set()
+    for g in graphs:
+        for u, v in g.edges():
+            pairs.add((min(u, v), max(u, v)))
+    pairs = sorted(pairs)
+    vecs = []
+    for g in graphs:
+        vecs.append([g[u][v]['weight'] if g.has_edge(u, v) else 0 \
+                     for u, v in pairs])
+    total = [sum(c) for c in zip(*vecs)]
+    result = []
+    for x in vecs:
+        rest = [t - a for t, a in zip(total, x)]
+        result.append((cosine(x, rest), rank_correlation(x, rest)))
+    return result
@@ -0,0 +1,179 @@
+"""This module keeps the work of the topology reduction in tool.py so
+that other constraints can be tried without starting over from the
+fully-connected graph (tool.py --reduction-log).
+
+The first and second passes of the reduction (tool.reduce_graph) remove
+the links in the same order whatever maxlinks and maxdegree are: they
+just stop as soon as there are no more than maxlinks links, and no
+removed link is ever put back in them (replace_edge only does that when
+there are fewer). So for every maxlinks the two passes end somewhere on
+one sequence of removal steps:
+
+    step i      link el[i] of the first pass, links sorted by weight,
+                for i < len(el), then link el2[i - len(el)] of the
+                second pass, sorted by weight after the first pass
+
+The log holds that sequence (el and el2), the link count before each
+step taken so far, and checkpoints: the graph and the removed-link list
+(rel) after every so many steps. The reduction for (maxlinks, maxdegree)
+then moves to the first step with no more than maxlinks links before it
+- forward from the current position for tighter limits, from the
+nearest checkpoint before it for looser ones - and runs only the node
+degree pass (tool.reduce_degree) on a copy. The result is the same as
+tool.reduce_graph's.
+
+The log is saved as JSON. A checkpoint's links are written in an order
+that, added back one by one, gives every switch its neighbors in the
+same order as in the reduction, so Dijkstra breaks ties the same way.
+"""
+import os
+import json
+import graphlib
+import networkx as nx
+import tool
+import bridges as br
+
+version = 1
+
+def ordered_edges(graph):
+    # (u, v, weight) of every link, in an order in which adding them
+    # to an empty graph gives each node its neighbors in graph's order
+    ts = graphlib.TopologicalSorter()
+    for u in graph.nodes():
+        prev = None
+        for v in graph.neighbors(u):
+            e = (min(u, v), max(u, v))
+            if prev is None:
+                ts.add(e)
+            else:
+                ts.add(e, prev)
+            prev = e
+    return [(u, v, graph[u][v]['weight']) for u, v in ts.static_order()]
+
+class ReductionLog(object):
+    # the removal steps of the reduction of traffic graph G, with
+    # checkpoints every so many steps (by default about 32 over the
+    # first pass)
+
+    def __init__(self, G, every=None):
+        self.G = G
+        self.el = tool.edges_sorted_by_weight(G)
+        self.el2 = None
+        self.counts = []
+        self.every = every or max(16, len(self.el) // 32)
+        # position -> (graph, rel) after that many steps
+        self.checkpoints = {}
+        self.pos = 0
+        self.GN = G.copy()
+        self.rel = []
+        self.bt = br.graph_tracker(self.GN)
+
+    def length(self):
+        # the number of steps, None while the first pass isn't done
+        if self.el2 is None:
+            return None
+        return len(self.el) + len(self.el2)
+
+    def restore(self, pos):
+        # the current state becomes the checkpoint at pos
+        if pos == 0:
+            self.GN = self.G.copy()
+            self.rel = []
+        else:
+            g, rel = self.checkpoints[pos]
+            self.GN = g.copy()
+            self.rel = list(rel)
+        self.bt = br.graph_tracker(self.GN)
+        self.pos = pos
+
+    def step(self):
+        # take step self.pos, with limits under which the passes never
+        # put a link back (see the module docstring)
+        if self.pos == len(self.counts):
+            self.counts.append(self.GN.number_of_edges())
+        if self.pos < len(self.el):
+            tool.remove_edge_first_pass(self.GN, self.el[self.pos], \
+                                        self.rel, 0, 0, self.bt)
+        else:
+            tool.remove_edge_second_pass(self.GN, \
+                                         self.el2[self.pos - len(self.el)], \
+                                         self.rel, 0, 0, self.bt)
+        self.pos += 1
+        if self.pos == len(self.el) and self.el2 is None:
+            self.el2 = tool.edges_sorted_by_weight(self.GN)
+        if self.pos % self.every == 0 or self.pos == len(self.el):
+            self.checkpoints.setdefault(self.pos, \
+                                        (self.GN.copy(), list(self.rel)))
+
+    def seek(self, maxlinks):
+        # move to where the first two passes end for maxlinks
+        target = None
+        for i, c in enumerate(self.counts):
+            if c <= maxlinks:
+                target = i
+                break
+        if target is None:
+            # past what the log has: continue from its end
+            target = len(self.counts)
+        start = max([p for p in self.checkpoints if p <= target] + [0])
+        if self.pos > target or self.pos < start:
+            self.restore(start)
+        while self.pos < target:
+            self.step()
+        if target == len(self.counts):
+            while self.pos != self.length() and \
+                  self.GN.number_of_edges() > maxlinks:
+                self.step()
+
+    def reduce(self, maxlinks, maxdegree):
+        # the topology tool.reduce_graph(G, maxlinks, maxdegree) gives
+        self.seek(maxlinks)
+        GN = self.GN.copy()
+        tool.reduce_degree(GN, list(self.rel), maxlinks, maxdegree, \
+                           br.graph_tracker(GN))
+        return GN
+
+    def save(self, path):
+        # written to a temporary file first, like write_profile
+        data = {'version': version, 'every': self.every, \
+                'nodes': list(self.G.nodes()), \
+                'el': [[u, v, w] for (u, v), w in self.el], \
+                'el2': None if self.el2 is None else \
+                       [[u, v, w] for (u, v), w in self.el2], \
+                'counts': self.counts, \
+                'checkpoints': [[p, ordered_edges(g), \
+                                 [[u, v, w] for (u, v), w in rel]] \
+                                for p, (g, rel) in \
+                                sorted(self.checkpoints.items())]}
+        tmp = path + '.tmp'
+        f = open(tmp, 'w')
+        json.dump(data, f, separators=(',', ':'))
+        f.close()
+        os.rename(tmp, path)
+
+def read_log(path, G):
+    # the log saved at path, or a new one if there is none or it was
+    # made for another traffic graph
+    log = ReductionLog(G)
+    if not os.path.exists(path):
+        return log
+    f = open(path)
+    data = json.load(f)
+    f.close()
+    el = [((u, v), w) for u, v, w in data['el']]
+    if data.get('version') != version or el != log.el:
+        return log
+    log.every = data['every']
+    if data['el2'] is not None:
+        log.el2 = [((u, v), w) for u, v, w in data['el2']]
+    log.counts = data['counts']
+    for p, edges, rel in data['checkpoints']:
+        g = nx.Graph()
+        g.add_nodes_from(data['nodes'])
+        for u, v, w in edges:
+            g.add_edge(u, v, weight=w)
+        log.checkpoints[p] = (g, [((u, v), w) for u, v, w in rel])
+    # start from the furthest checkpoint
+    if log.checkpoints:
+        log.restore(max(log.checkpoints))
+    return log
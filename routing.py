@@ -0,0 +1,154 @@
+"""This module computes routing tables for a topology from the profiled
+traffic. Without them Multi2Sim routes every message over a shortest
+path, so heavy flows can pile onto the same links even when other
+paths have spare capacity.
+
+Multi2Sim routes by destination: each node has one next hop for each
+destination (the [Network.net0.Routes] section of the net config), so
+the routes towards any one switch form a tree that all traffic to it
+follows. The trees are chosen by iterative reweighting. Each round
+builds every destination's tree as a shortest-path tree under the
+current channel costs, routes the traffic over the trees, and raises
+the cost of each channel in proportion to its load, which steers the
+next round away from the busiest channels. The first round uses hop
+counts as costs, i.e. minimal-hop routing, and the round with the
+lowest maximum channel load is kept, so the result never loads a
+channel more than minimal-hop routing does.
+
+Each direction of a link is a channel of its own, so the traffic matrix
+here is directed: t[s, d] is the bytes switch s sent to switch d.
+"""
+import heapq
+import numpy as np
+import costmodel as cm
+import writeconfigs as wc
+
+def directed_matrix(rpt, n):
+    # n x n directed traffic matrix of a fully-connected profile (a
+    # NetReport or a trafficprofile.Profile)
+    t = np.zeros((n, n))
+    src, dst, nbytes = rpt.switch_links()
+    for i in range(len(nbytes)):
+        t[src[i], dst[i]] += nbytes[i]
+    return t
+
+def shortest_trees(adj, cost):
+    # dist[u, d], the cost of the cheapest path from u to d, and
+    # nh[u, d], the next hop of u on it (the lowest numbered one if
+    # there are several; -1 if u == d or d can't be reached)
+    n = adj.shape[0]
+    dist = np.full((n, n), np.inf)
+    for d in range(n):
+        # Dijkstra from d over the reversed channels
+        dd = dist[:, d]
+        dd[d] = 0.0
+        done = np.zeros(n, dtype=bool)
+        fringe = [(0.0, d)]
+        while fringe:
+            du, u = heapq.heappop(fringe)
+            if done[u]:
+                continue
+            done[u] = True
+            for v in np.flatnonzero(adj[:, u] & ~done).tolist():
+                dv = du + cost[v, u]
+                if dv < dd[v]:
+                    dd[v] = dv
+                    heapq.heappush(fringe, (dv, v))
+    nh = np.full((n, n), -1, dtype=np.int64)
+    for u in range(n):
+        nbrs = np.flatnonzero(adj[u])
+        if len(nbrs) == 0:
+            continue
+        # via[i, d]: cost of reaching d through neighbor nbrs[i]
+        via = cost[u, nbrs][:, None] + dist[nbrs, :]
+        best = via.argmin(axis=0)
+        ok = np.isfinite(dist[u]) & (np.arange(n) != u)
+        nh[u, ok] = nbrs[best[ok]]
+    return dist, nh
+
+def channel_loads(t, nh):
+    # bytes on each channel u -> v when the traffic of every pair is
+    # routed along the next hops
+    n = t.shape[0]
+    load = np.zeros((n, n))
+    src, dst = np.nonzero(t > 0)
+    ok = (src != dst) & (nh[src, dst] >= 0)
+    cur = src[ok]
+    dst = dst[ok]
+    amt = t[cur, dst]
+    while len(cur) > 0:
+        nxt = nh[cur, dst]
+        np.add.at(load, (cur, nxt), amt)
+        going = nxt != dst
+        cur = nxt[going]
+        dst = dst[going]
+        amt = amt[going]
+    return load
+
+def balanced_routes(t, edges, n, rounds=30, step=0.5):
+    # routing for the directed traffic matrix t over the given links;
+    # returns (dist, nh, maxload of minimal-hop routing, maxload of the
+    # routing chosen), dist and nh as from shortest_trees
+    adj = cm.adjacency(edges, n)
+    cost = adj.astype(np.float64)
+    best = None
+    first = None
+    for r in range(rounds):
+        dist, nh = shortest_trees(adj, np.where(adj, cost, np.inf))
+        load = channel_loads(t, nh)
+        # ties go to less traffic in total, i.e. shorter routes
+        top = load.max()
+        key = (top, load.sum())
+        if first is None:
+            first = top
+        if best is None or key < best[0]:
+            best = (key, dist, nh)
+        if top <= 0:
+            break
+        cost = cost * (1.0 + step * load / top)
+    key, dist, nh = best
+    return dist, nh, first, key[0]
+
+def route_table(dist, nh, cores, l2links=None):
+    # Multi2Sim routes, as (node, destination, next node) names, from
+    # every node to every end node of the net config writeconfigs
+    # renders: end node n<i> on switch sw<i>, and L2 node n<cores + k>
+    # on the switches in l2links[k]
+    if l2links is None:
+        l2links = wc.default_l2links
+    # switches each end node is attached to
+    ends = [('n%d' % i, [i]) for i in range(cores)]
+    ends += [('n%d' % (cores + k), list(l2links[k])) \
+             for k in range(len(l2links))]
+    routes = []
+    for dname, dsw in ends:
+        for u in range(cores):
+            if u in dsw:
+                routes.append(('sw%d' % u, dname, dname))
+                continue
+            # towards the nearest of the switches dname hangs off; the
+            # distance to the nearest one shrinks with every hop, so
+            # the routes can't loop
+            a = min(dsw, key=lambda s: (dist[u, s], s))
+            routes.append(('sw%d' % u, dname, 'sw%d' % nh[u, a]))
+        for sname, ssw in ends:
+            if sname == dname:
+                continue
+            # an end node on several switches enters through the one
+            # nearest the destination
+            s = min(ssw, key=lambda s: (min(dist[s, a] for a in dsw), s))
+            routes.append((sname, dname, 'sw%d' % s))
+    return routes
+
+def check_routes(routes):
+    # follow the routes from every node to every destination; raises
+    # ValueError on a missing route or a loop
+    nxt = dict(((s, d), h) for s, d, h in routes)
+    for s, d in nxt:
+        seen = set()
+        cur = s
+        while cur != d:
+            if cur in seen or (cur, d) not in nxt:
+                raise ValueError('no route from %s to %s' % (s, d))
+            seen.add(cur)
+            cur = nxt[(cur, d)]
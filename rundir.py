@@ -0,0 +1,105 @@
+"""This module manages the directories tool.py and comparisons.py write
+their config files, reports and results to, so that several runs can
+work side by side on one host without overwriting each other's files.
+
+Each run can get its own uniquely named directory under a common base
+directory. Files are rendered in memory and written atomically (to a
+temporary file that is then renamed), and only if their content has
+changed, so an unchanged config keeps its timestamp and readers never
+see a partial file. Old runs are cleaned up by a retention policy: the
+newest runs are kept whole, while the large net reports (and message
+traces) of older runs are removed, and so are old run directories left
+empty. Only directories named as make_rundir names them are taken for
+runs, so a base shared with other files (even ".") is safe to use.
+
+NOC_RUN_KEEP sets how many runs are kept whole (default 10), and
+NOC_RUN_BIG the size in bytes from which a report counts as large
+(default 1 MiB).
+"""
+import os
+import re
+import time
+import fnmatch
+import tempfile
+
+keep = int(os.environ.get('NOC_RUN_KEEP', '10'))
+bigbytes = int(os.environ.get('NOC_RUN_BIG', str(2 ** 20)))
+# files the retention policy removes from old runs
+large = ['*-net-report.txt', '*-net-report.txt.gz', '*-net-debug.txt', \
+         '*-trace.dat']
+# names of the run directories make_rundir makes for tool.py,
+# comparisons.py and by default: <name>-<date>-<time>-<random>
+rundir_name = re.compile(r'(tool|comparisons|run)-\d{8}-\d{6}-\w+$')
+
+def make_rundir(base, name='run'):
+    # new directory under base, e.g. runs/tool-20261018-071500-xxxxxx
+    try:
+        os.makedirs(base)
+    except OSError:
+        if not os.path.isdir(base):
+            raise
+    prefix = name + time.strftime('-%Y%m%d-%H%M%S-')
+    return tempfile.mkdtemp(prefix=prefix, dir=base)
+
+def umask():
+    m = os.umask(0)
+    os.umask(m)
+    return m
+
+def write_if_changed(path, text):
+    # returns True if the file was (re)written
+    try:
+        f = open(path)
+        try:
+            if f.read() == text:
+                return False
+        finally:
+            f.close()
+    except IOError:
+        pass
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', \
+                               prefix='.' + os.path.basename(path) + '.')
+    f = os.fdopen(fd, 'w')
+    try:
+        f.write(text)
+    finally:
+        f.close()
+    # mkstemp creates the file readable by its owner only
+    os.chmod(tmp, 0o666 & ~umask())
+    os.rename(tmp, path)
+    return True
+
+def run_dirs(base):
+    # run directories under base, newest first; other directories
+    # there are left alone
+    dirs = []
+    for d in os.listdir(base):
+        p = os.path.join(base, d)
+        if rundir_name.match(d) and os.path.isdir(p):
+            dirs.append((os.path.getmtime(p), p))
+    dirs.sort(reverse=True)
+    return [p for t, p in dirs]
+
+def cleanup(base, keep=keep, bigbytes=bigbytes):
+    # apply the retention policy to the runs under base; returns the
+    # number of bytes freed
+    freed = 0
+    if not os.path.isdir(base):
+        return freed
+    for d in run_dirs(base)[keep:]:
+        for f in os.listdir(d):
+            p = os.path.join(d, f)
+            if not os.path.isfile(p):
+                continue
+            if not [pat for pat in large if fnmatch.fnmatch(f, pat)]:
+                continue
+            size = os.path.getsize(p)
+            if size >= bigbytes:
+                os.remove(p)
+                freed += size
+        try:
+            # only succeeds if nothing is left
+            os.rmdir(d)
+        except OSError:
+            pass
+    return freed
@@ -0,0 +1,246 @@
+"""This module runs m2s simulations as a queue of jobs on asyncio. At
+most a fixed number of jobs run at once (a semaphore), limited by the
+machine's cores and by its available memory. Each job's output is read
+from its pipe and parsed line by line as m2s produces it; a job that
+exceeds its time limit is killed, and a watchdog task reports progress
+and kills jobs that stall (no output and no CPU time used for a while).
+Finished jobs are handed back as they complete, in whatever order that
+is.
+
+schedule(jobs) is the asyncio API, an asynchronous generator of the
+finished jobs; run_jobs(jobs) runs it in an event loop of its own for
+callers that aren't asynchronous. Results are looked up in and saved to
+the simulation cache (simcache.py) as before.
+
+The limits are set with environment variables, like the cache:
+
+    NOC_SIM_JOBS        most jobs at once (default: number of cores)
+    NOC_SIM_JOB_MEM     memory to allow per job in MiB (default 1024)
+    NOC_SIM_TIMEOUT     seconds a job may run, 0 for no limit (default)
+    NOC_SIM_STALL       seconds without output or CPU use after which a
+                        job counts as hung, 0 to never (default 600)
+    NOC_SIM_PROGRESS    seconds between progress reports (default 30)
+"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import multiprocessing
+import simcache as sc
+import simoutput as so
+
+maxjobs = int(os.environ.get('NOC_SIM_JOBS', '0'))
+jobmem = int(os.environ.get('NOC_SIM_JOB_MEM', '1024'))
+timeout = float(os.environ.get('NOC_SIM_TIMEOUT', '0'))
+stall = float(os.environ.get('NOC_SIM_STALL', '600'))
+progress = float(os.environ.get('NOC_SIM_PROGRESS', '30'))
+
+class Job(object):
+    # one m2s run; cfgs are the cpu, ctx, mem and net config paths
+
+    def __init__(self, name, sim, maxinst, cfgs, rptfile, exe, args):
+        self.name = name
+        self.sim = sim
+        self.maxinst = maxinst
+        self.cfgs = cfgs
+        self.rptfile = rptfile
+        self.exe = exe
+        self.args = args
+        # file for m2s's --net-debug output, if wanted (see nettrace.py)
+        self.netdebug = None
+        # filled in while the job runs
+        self.state = 'queued'
+        self.cached = False
+        self.proc = None
+        self.started = None
+        self.finished = None
+        self.lines = 0
+        self.last = ''
+        self.lastoutput = None
+        self.cpu = 0.0
+        self.lastcpu = None
+        self.error = None
+        self.stats = None
+
+    def command(self):
+        cpucfg, ctxcfg, memcfg, netcfg = self.cfgs
+        return [self.sim, '--x86-sim', 'detailed', \
+                '--x86-max-inst', self.maxinst, \
+                '--x86-config', cpucfg, \
+                '--ctx-config', ctxcfg, \
+                '--mem-config', memcfg, \
+                '--net-config', netcfg, \
+                '--net-report', self.rptfile] + \
+               (['--net-debug', self.netdebug] if self.netdebug else [])
+
+    async def output(self, parser):
+        # feed the lines of m2s's output to parser as they arrive,
+        # noting progress for the watchdog
+        while True:
+            line = await self.proc.stdout.readline()
+            if not line:
+                break
+            line = line.decode('utf-8', 'replace')
+            self.lines += 1
+            self.last = line.strip() or self.last
+            self.lastoutput = time.time()
+            parser.feed(line)
+
+    def elapsed(self):
+        end = self.finished or time.time()
+        return end - self.started if self.started else 0.0
+
+def kill(job, why):
+    # the whole process group, in case m2s was started by a wrapper
+    # whose children would keep its output open
+    job.error = why
+    try:
+        os.killpg(job.proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+async def run_job(job):
+    # run one job to completion; sets job.stats, or job.error
+    job.started = time.time()
+    job.lastoutput = job.started
+    job.state = 'running'
+    key = sc.sim_key(job.sim, job.maxinst, list(job.cfgs), job.exe, job.args)
+    # the cache only has the report, so a run for its debug output is
+    # always made (and still cached for runs without it)
+    metrics = None
+    if job.netdebug is None:
+        metrics = sc.load(key, job.rptfile)
+    if metrics is not None:
+        job.stats = so.X86Stats(metrics)
+        job.cached = True
+    else:
+        # a session of its own, so the process group can be killed;
+        # lines of the program's output may be long
+        job.proc = await asyncio.create_subprocess_exec( \
+            *job.command(), stdout=asyncio.subprocess.PIPE, \
+            stderr=asyncio.subprocess.STDOUT, start_new_session=True, \
+            limit=1 << 24)
+        parser = so.StatsParser()
+        try:
+            await asyncio.wait_for(job.output(parser), timeout or None)
+        except asyncio.TimeoutError:
+            kill(job, 'timed out after %ds' % timeout)
+        except BaseException:
+            kill(job, 'cancelled')
+            raise
+        finally:
+            await job.proc.wait()
+        if job.error is None and not parser.fields:
+            job.error = 'm2s exited with status %d and no statistics' \
+                        % job.proc.returncode
+        if job.error is None:
+            job.stats = parser.stats()
+            sc.save(key, job.stats.fields, job.rptfile)
+    job.finished = time.time()
+    job.state = 'failed' if job.error else 'done'
+
+def available_memory():
+    # bytes of memory available for new processes, or None if unknown
+    try:
+        f = open('/proc/meminfo')
+        try:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+        finally:
+            f.close()
+    except IOError:
+        pass
+    return None
+
+def process_cpu(pid):
+    # CPU seconds used so far by process pid, or None if unknown
+    try:
+        f = open('/proc/%d/stat' % pid)
+        try:
+            fields = f.read().rsplit(')', 1)[1].split()
+        finally:
+            f.close()
+        return (int(fields[11]) + int(fields[12])) / \
+               float(os.sysconf('SC_CLK_TCK'))
+    except (IOError, IndexError, ValueError, OSError):
+        return None
+
+def slots(njobs):
+    # how many jobs to run at once
+    n = maxjobs or multiprocessing.cpu_count()
+    mem = available_memory()
+    if mem is not None and jobmem > 0:
+        n = min(n, mem // (jobmem * 2 ** 20))
+    return max(1, min(n, njobs))
+
+def log(msg):
+    sys.stderr.write('m2s: ' + msg + '\n')
+    sys.stderr.flush()
+
+async def slot_job(job, sem):
+    # run job once a slot is free; a failure is the job's, not the
+    # scheduler's
+    async with sem:
+        try:
+            await run_job(job)
+        except Exception as e:
+            job.error = str(e)
+            job.state = 'failed'
+            job.finished = time.time()
+    return job
+
+async def watchdog(jobs):
+    # kill stalled jobs and report progress, until cancelled
+    nextreport = time.time() + progress
+    while True:
+        await asyncio.sleep(1.0)
+        now = time.time()
+        running = [j for j in jobs \
+                   if j.state == 'running' and j.proc is not None \
+                   and j.error is None]
+        for j in running:
+            cpu = process_cpu(j.proc.pid)
+            if cpu is not None and cpu != j.cpu:
+                j.cpu = cpu
+                j.lastcpu = now
+            busy = max(j.lastoutput, j.lastcpu or j.started)
+            if stall > 0 and now - busy > stall:
+                kill(j, 'stalled for %ds' % (now - busy))
+        if progress > 0 and now >= nextreport and running:
+            nextreport = now + progress
+            for j in running:
+                log('%s running %ds, %d lines: %s' % \
+                    (j.name, j.elapsed(), j.lines, j.last[:60]))
+
+async def schedule(jobs):
+    # asynchronous generator: each job once it has finished; the jobs
+    # still running are killed if it is closed early
+    jobs = list(jobs)
+    sem = asyncio.Semaphore(slots(len(jobs)))
+    dog = asyncio.ensure_future(watchdog(jobs))
+    tasks = [asyncio.ensure_future(slot_job(j, sem)) for j in jobs]
+    try:
+        for done in asyncio.as_completed(tasks):
+            job = await done
+            if job.error:
+                log('%s failed after %ds: %s' % \
+                    (job.name, job.elapsed(), job.error))
+            elif not job.cached:
+                log('%s done in %ds' % (job.name, job.elapsed()))
+            yield job
+    finally:
+        dog.cancel()
+        for t in tasks:
+            t.cancel()
+        # each cancelled job kills its process and waits for it
+        await asyncio.gather(dog, *tasks, return_exceptions=True)
+
+def run_jobs(jobs):
+    # run jobs and return them in their original order once all are done
+    async def wait_all():
+        async for job in schedule(jobs):
+            pass
+    asyncio.run(wait_all())
+    return list(jobs)
@@ -0,0 +1,146 @@
+"""This module keeps an on-disk cache of Multi2Sim results (the parsed
+stdout metrics and the net report) so identical simulations are not
+re-run. An entry is keyed by a hash of the m2s binary, the instruction
+limit, the rendered config files, and the target program and its args.
+
+The cache lives in ~/.noc-sim-cache unless NOC_SIM_CACHE is set, and is
+trimmed to NOC_SIM_CACHE_SIZE bytes (default 1 GiB) by discarding the
+least recently used entries. A size of 0 disables the cache.
+"""
+import os
+import shutil
+import hashlib
+import json
+import time
+
+cachedir = os.environ.get('NOC_SIM_CACHE',
+                          os.path.join(os.path.expanduser('~'),
+                                       '.noc-sim-cache'))
+maxbytes = int(os.environ.get('NOC_SIM_CACHE_SIZE', 2**30))
+# bumped whenever the format of the stored metrics changes
+version = 2
+
+def find_executable(prog):
+    # resolve a program name the way the shell would, using $PATH
+    if os.path.dirname(prog) != '':
+        return prog
+    for d in os.environ.get('PATH', '').split(os.pathsep):
+        p = os.path.join(d, prog)
+        if os.path.isfile(p) and os.access(p, os.X_OK):
+            return p
+    return prog
+
+def update_with_file(h, path):
+    # feed a file's contents into hash h; missing files hash their name
+    h.update(('<' + path + '>').encode('utf-8'))
+    if not os.path.isfile(path):
+        return
+    f = open(path, 'rb')
+    while True:
+        b = f.read(1 << 20)
+        if not b:
+            break
+        h.update(b)
+    f.close()
+
+def sim_key(sim, maxinst, cfgfiles, exe, args):
+    # hash everything that determines the outcome of a simulation
+    # cfgfiles are the config paths given to m2s, in a fixed order
+    h = hashlib.sha1()
+    h.update(('version=' + str(version) + '\n').encode('utf-8'))
+    update_with_file(h, find_executable(sim))
+    h.update(('maxinst=' + str(maxinst) + '\n').encode('utf-8'))
+    for c in cfgfiles:
+        update_with_file(h, c)
+    update_with_file(h, find_executable(exe))
+    h.update(('args=' + args + '\n').encode('utf-8'))
+    return h.hexdigest()
+
+def entry_dir(key):
+    return os.path.join(cachedir, key[:2], key)
+
+def load(key, rptfile):
+    # return the cached metrics for key and restore the cached net
+    # report to rptfile, or return None if there is no such entry
+    if maxbytes == 0:
+        return None
+    d = entry_dir(key)
+    try:
+        f = open(os.path.join(d, 'metrics.json'))
+        metrics = json.load(f)
+        f.close()
+        shutil.copyfile(os.path.join(d, 'net-report.txt'), rptfile)
+    except (IOError, OSError, ValueError):
+        return None
+    # mark entry as recently used for eviction
+    os.utime(d, None)
+    return metrics
+
+def save(key, metrics, rptfile):
+    # store metrics and a copy of the net report under key
+    # nothing is stored if the simulation did not produce a report
+    if maxbytes == 0 or not os.path.isfile(rptfile):
+        return
+    d = entry_dir(key)
+    if os.path.isdir(d):
+        return
+    parent = os.path.dirname(d)
+    if not os.path.isdir(parent):
+        try:
+            os.makedirs(parent)
+        except OSError:
+            # another run may have created it at the same time
+            pass
+    # build the entry under a temporary name and rename it into place
+    # so that concurrent runs never see a partially written entry
+    tmp = d + '.tmp.' + str(os.getpid())
+    os.mkdir(tmp)
+    f = open(os.path.join(tmp, 'metrics.json'), 'w')
+    json.dump(metrics, f)
+    f.close()
+    shutil.copyfile(rptfile, os.path.join(tmp, 'net-report.txt'))
+    try:
+        os.rename(tmp, d)
+    except OSError:
+        # an identical entry was stored by another run
+        shutil.rmtree(tmp, ignore_errors=True)
+    evict()
+
+def entry_size(d):
+    size = 0
+    for name in os.listdir(d):
+        size += os.path.getsize(os.path.join(d, name))
+    return size
+
+def evict(limit=None):
+    # discard least recently used entries until cache fits in limit
+    if limit is None:
+        limit = maxbytes
+    if not os.path.isdir(cachedir):
+        return
+    entries = []
+    total = 0
+    now = time.time()
+    for sub in os.listdir(cachedir):
+        sd = os.path.join(cachedir, sub)
+        if not os.path.isdir(sd):
+            continue
+        for name in os.listdir(sd):
+            d = os.path.join(sd, name)
+            if '.tmp.' in name:
+                # leftover from an interrupted save
+                if now - os.path.getmtime(d) > 24 * 60 * 60:
+                    shutil.rmtree(d, ignore_errors=True)
+                continue
+            try:
+                size = entry_size(d)
+                entries.append((os.path.getmtime(d), size, d))
+            except OSError:
+                continue
+            total += size
+    entries.sort()
+    for mtime, size, d in entries:
+        if total <= limit:
+            break
+        shutil.rmtree(d, ignore_errors=True)
+        total -= size
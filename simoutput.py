@@ -0,0 +1,100 @@
+"""This module parses the statistics summary Multi2Sim prints when a
+simulation ends. The output is consumed one line at a time, so it can
+be read straight from the m2s pipe while the simulator runs, and only
+the fields of the [ x86 ] section are kept.
+"""
+import re
+
+# matches both section headers ("[ x86 ]") and "Key = value" lines
+statline = re.compile(r'^(?:\[ *(?P<section>[^\]]*?) *\]' + \
+                      r'|(?P<key>[A-Za-z][\w.]*) = (?P<value>.*?))\s*$')
+
+def parse_value(v):
+    # numeric stats are stored as floats with any unit (e.g. "[ns]")
+    # dropped; anything else (e.g. SimEnd) is kept as a string
+    t = v.split(' ', 1)[0]
+    try:
+        return float(t)
+    except ValueError:
+        return v
+
+class X86Stats(object):
+    # all statistics from the [ x86 ] section of the m2s summary
+
+    def __init__(self, fields=None):
+        self.fields = dict(fields or {})
+
+    def get(self, key, default=0.0):
+        return self.fields.get(key, default)
+
+    @property
+    def inst(self):
+        return self.get('CommittedInstructions')
+
+    @property
+    def simtime(self):
+        # simulated time in nanoseconds
+        return self.get('SimTime')
+
+    @property
+    def cycles(self):
+        return self.get('Cycles')
+
+    def metrics(self):
+        # the three values the tool has always reported
+        return self.inst, self.simtime, self.cycles
+
+# counts that add up across runs, e.g. the samples of a sampled profile
+summed = ['Instructions', 'CommittedInstructions', \
+          'CommittedMicroInstructions', 'SimTime', 'Cycles']
+
+def merge_stats(statslist, weights=None):
+    # stats of several runs as one: counts are summed (each scaled by
+    # its weight, if given), other fields are those of the first run
+    if weights is None:
+        weights = [1.0] * len(statslist)
+    fields = dict(statslist[0].fields)
+    for key in summed:
+        if key in fields:
+            fields[key] = sum(w * s.get(key) \
+                              for s, w in zip(statslist, weights))
+    if fields.get('Cycles'):
+        fields['CommittedInstructionsPerCycle'] = \
+            fields.get('CommittedInstructions', 0.0) / fields['Cycles']
+    return X86Stats(fields)
+
+class StatsParser(object):
+    # the parse of simulator output fed to it one line at a time, for
+    # output that isn't a plain iterable, e.g. an asyncio stream
+
+    def __init__(self):
+        self.fields = {}
+        self.inx86 = False
+
+    def feed(self, line):
+        if self.inx86:
+            m = statline.match(line)
+            if m is None:
+                return
+            if m.group('section') is not None:
+                self.inx86 = m.group('section') == 'x86'
+            else:
+                self.fields[m.group('key')] = parse_value(m.group('value'))
+        elif line[:1] == '[':
+            m = statline.match(line)
+            if m is not None and m.group('section') == 'x86':
+                # a later summary replaces an earlier one
+                self.inx86 = True
+                self.fields = {}
+
+    def stats(self):
+        return X86Stats(self.fields)
+
+def parse_sim_output(lines):
+    # parse simulator output from any iterable of lines, e.g. the
+    # stdout pipe of a running m2s, an open file, or o.splitlines()
+    p = StatsParser()
+    feed = p.feed
+    for line in lines:
+        feed(line)
+    return p.stats()
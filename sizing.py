@@ -0,0 +1,113 @@
+"""This module sizes the links and buffers of a topology by the traffic
+they carry, instead of giving every link the same bandwidth and every
+buffer the same size.
+
+A total link bandwidth (bytes per cycle, summed over the switch-to-switch
+links) is split over the links in proportion to their load, with a
+minimum for every link. Multi2Sim sets buffer sizes per node rather
+than per link, so the buffer budget (bytes, summed over every input and
+output buffer of the switches) is split over the switches in proportion
+to the traffic through them, again with a minimum per buffer. By
+default both budgets are what the uniform design uses (DefaultBandwidth
+on every link, DefaultInputBufferSize and DefaultOutputBufferSize on
+every buffer), so the sized design has the same total area.
+
+Bandwidths and sizes are whole bytes; the rounding never exceeds the
+budget.
+"""
+import writeconfigs as wc
+
+# the uniform design, as in writeconfigs.render_net_common
+bandwidth = 256
+buffersize = 1024
+# smallest link bandwidth and buffer size handed out; a buffer must
+# hold the largest message (72 bytes with 64-byte cache blocks)
+minbandwidth = 32
+minbuffer = 128
+
+def proportional(weights, budget, minimums):
+    # split budget into whole shares proportional to weights, each at
+    # least its minimum; raises ValueError if the minimums don't fit
+    n = len(weights)
+    if sum(minimums) > budget:
+        raise ValueError('budget %d is less than the minimum %d' \
+                         % (budget, sum(minimums)))
+    share = [float(m) for m in minimums]
+    free = list(range(n))
+    while free:
+        # everything not pinned at its minimum shares what is left
+        left = budget - sum(minimums[i] for i in range(n) if i not in free)
+        total = sum(weights[i] for i in free)
+        for i in free:
+            if total > 0:
+                share[i] = left * float(weights[i]) / total
+            else:
+                share[i] = float(left) / len(free)
+        low = [i for i in free if share[i] < minimums[i]]
+        if not low:
+            break
+        for i in low:
+            share[i] = float(minimums[i])
+            free.remove(i)
+    # round down, then hand out the rest by largest remainder
+    whole = [int(s) for s in share]
+    rest = int(budget - sum(whole))
+    order = sorted(range(n), key=lambda i: (whole[i] - share[i], i))
+    for i in order[:rest]:
+        whole[i] += 1
+    return whole
+
+def switch_ports(edges, cores, l2links=None):
+    # ports of each switch: its links to other switches and to end nodes
+    if l2links is None:
+        l2links = wc.default_l2links
+    ports = [1] * cores
+    for u, v in edges:
+        ports[u] += 1
+        ports[v] += 1
+    for sws in l2links:
+        for s in sws:
+            ports[s] += 1
+    return ports
+
+def size_links(loads, budget=None):
+    # {(u, v): bandwidth} for links with the given {(u, v): load}; the
+    # budget defaults to the uniform design's total
+    links = sorted(loads)
+    if budget is None:
+        budget = bandwidth * len(links)
+    bw = proportional([loads[l] for l in links], budget, \
+                      [minbandwidth] * len(links))
+    return dict(zip(links, bw))
+
+def size_buffers(loads, cores, budget=None, l2links=None):
+    # {switch: buffer size} from the link loads; each switch's share
+    # of the budget follows the traffic through it (every link's load
+    # counts at both ends) and is spread over its input and output
+    # buffers
+    ports = switch_ports(loads.keys(), cores, l2links)
+    if budget is None:
+        budget = buffersize * 2 * sum(ports)
+    through = [0.0] * cores
+    for (u, v), w in loads.items():
+        through[u] += w
+        through[v] += w
+    area = proportional(through, budget, \
+                        [minbuffer * 2 * p for p in ports])
+    return dict((s, area[s] // (2 * ports[s])) for s in range(cores))
+
+def graph_loads(graph):
+    # link loads of a topology from tool.reduce_graph or the optimizer,
+    # whose link weights are the traffic routed over each link
+    return dict(((min(u, v), max(u, v)), w) \
+                for u, v, w in graph.edges(data='weight'))
+
+def max_utilization(loads, cycles, sizes=None):
+    # utilization of the busiest link over a run of that many cycles,
+    # with the given bandwidths or else uniform ones; each link is a
+    # channel each way, and each gets half the link's load
+    if not loads or not cycles:
+        return 0.0
+    return max(loads[l] / 2.0 / \
+               ((sizes[l] if sizes else bandwidth) * cycles) \
+               for l in loads)
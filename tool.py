@@ -1,124 +1,222 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
+import os
 import sys
-import subprocess
-import re
 import operator
+import csv
+import json
+import multiprocessing
 import networkx as nx
 import writeconfigs as wc
+import profiling as pf
+import trafficprofile as tp
+import instrument as ins
+import bridges as br
+import rundir as rd
+import simoutput as so
+import netreport as nr
+import workloads as wl
+from cmdline import parse_options
+
+# options accepted before the positional arguments, with defaults
+options = {'engine': 'networkx', 'cores': '9', 'optimize': '0', \
+           'start': 'greedy', 'iterations': '2000', 'simulate': False, \
+           'samples': '0', 'window': '10000000', 'profile-file': '', \
+           'cprofile': '', 'outdir': '.', 'rundir': '', 'routes': False, \
+           'size': False, 'bandwidth-budget': '0', 'buffer-budget': '0', \
+           'place-l2': False, 'manifest': '', 'record-trace': False, \
+           'cluster-size': '0', 'reduction-log': '', \
+           'profile-net': 'fully'}
 
 def check_args(argv = sys.argv):
     # check if target program provided on command line
-    if ( len(sys.argv) < 4 or
-         int(sys.argv[1]) < 9 or
-         int(sys.argv[2]) < 4
+    # with a manifest the apps come from it instead of the command line
+    if ( len(argv) < (3 if options['manifest'] else 4) or
+         int(options['cores']) < 3 or
+         len(parse_range(argv[1])) == 0 or
+         len(parse_range(argv[2])) == 0 or
+         min(parse_range(argv[1])) < int(options['cores']) or
+         min(parse_range(argv[2])) < 4 or
+         options['engine'] not in ['networkx', 'numpy'] or
+         int(options['optimize']) < 0 or
+         int(options['iterations']) < 1 or
+         options['start'] not in ['greedy', 'mesh', 'both'] or
+         int(options['samples']) < 0 or
+         int(options['window']) < 1 or
+         int(options['bandwidth-budget']) < 0 or
+         int(options['buffer-budget']) < 0 or
+         (options['rundir'] == '' and
+          not os.path.isdir(options['outdir'])) or
+         (int(options['cluster-size']) != 0 and
+          int(options['cluster-size']) < 4) or
+         (options['reduction-log'] != '' and
+          (options['place-l2'] or int(options['cluster-size']) > 0 or
+           options['engine'] != 'networkx')) or
+         options['profile-net'] not in ['fully', 'ring', 'mesh', 'torus'] or
+         (options['profile-net'] != 'fully' and
+          (options['manifest'] != '' or int(options['samples']) > 0)) or
+         (options['manifest'] != '' and
+          (options['simulate'] or int(options['samples']) > 0)) or
+         (options['record-trace'] and
+          (options['manifest'] != '' or int(options['samples']) > 0))
     ):
-        print 'Usage: ' + str(sys.argv[0]) + ' ' + \
-              '<maxlinks> <maxdegree> <targetprogram> [<args>]'
-        print '<maxlinks> constrains the link count in the novel topology'
-        print '           and must be >= 9'
-        print '<maxdegree> constrains node degree in the novel topology'
-        print '            and must be >= 4'
+        print('Usage: ' + str(argv[0]) + ' ' + \
+               '[--cores <cores>] [--engine <engine>] ' + \
+               '[--optimize <chains>] [--start <start>] ' + \
+               '[--iterations <iterations>] [--simulate] ' + \
+               '[--samples <samples>] [--window <window>] ' + \
+               '[--profile-file <file>] [--cprofile <statsfile>] ' + \
+               '[--outdir <dir>] [--rundir <base>] [--routes] ' + \
+               '[--size] [--bandwidth-budget <bytes>] ' + \
+               '[--buffer-budget <bytes>] [--place-l2] ' + \
+               '[--manifest <manifest>] [--record-trace] ' + \
+               '[--cluster-size <switches>] ' + \
+               '[--reduction-log <logfile>] ' + \
+               '[--profile-net <profilenet>] ' + \
+               '<maxlinks> <maxdegree> <targetprogram> [<args>]')
+        print('<cores> is the number of cores (and switches), default 9')
+        print('<maxlinks> constrains the link count in the novel topology')
+        print('           and must be >= <cores>')
+        print('<maxdegree> constrains node degree in the novel topology')
+        print('            and must be >= 4')
+        print('<maxlinks> and <maxdegree> may also be ranges or lists,')
+        print('           e.g. "12-18" or "4,6"; every pair is then')
+        print('           reduced in parallel (a sweep) and written to')
+        print('           "novel-<maxlinks>-<maxdegree>-net-config.txt",')
+        print('           with a summary in "sweep-summary.csv"/".json"')
+        print('--simulate also runs m2s on every topology of a sweep, in')
+        print('           parallel, and adds the results to the summary')
+        print('<samples> short profiling runs are made in parallel instead')
+        print('          of one long run, each simulating <window>')
+        print('          instructions (default 10000000) at a different')
+        print('          point of the program, and their traffic is summed;')
+        print('          0 (default) makes one long run')
+        print('<file> is where the traffic profile is saved, by default')
+        print('       "fully-profile.dat" in <dir>; if this option is given')
+        print('       and the file exists, it is loaded and the profiling')
+        print('       run is skipped')
+        print('<statsfile> receives cProfile stats of the synthesis phase')
+        print('phase times, reduction counters and peak memory use are')
+        print('written to "tool-timing.json"')
+        print('<dir> is the existing directory the config files, reports')
+        print('      and results are written to, default the current')
+        print('      directory')
+        print('<base> makes a new, uniquely named <dir> under <base> for')
+        print('       this run and removes large reports of old runs there')
+        print('<engine> runs the topology reduction on "networkx" graphs')
+        print('         (default) or on dense "numpy" arrays')
+        print('<chains> independent simulated annealing chains search')
+        print('         for a better topology than the greedy reduction,')
+        print('         in parallel; 0 (default) skips the search')
+        print('<start> is where the chains start: "greedy" (default),')
+        print('        "mesh", or "both" (half of the chains each)')
+        print('<iterations> is the number of link swaps tried per chain,')
+        print('             default 2000')
+        print('--routes adds routes that spread the profiled traffic over')
+        print('         the links to the novel topology\'s config, instead')
+        print('         of leaving Multi2Sim to use shortest paths')
+        print('--size gives each link of the novel topology a bandwidth,')
+        print('       and each switch a buffer size, in proportion to the')
+        print('       traffic they carry; the total bandwidth (bytes per')
+        print('       cycle) and buffer space (bytes) are set with')
+        print('       --bandwidth-budget and --buffer-budget, by default')
+        print('       (0) what uniform links and buffers would use')
+        print('--place-l2 also chooses the switches the L2 modules are')
+        print('           linked to, from the profiled traffic, instead')
+        print('           of sw0/sw1 and sw1/sw2')
+        print('<manifest> lists several target programs, one per line as')
+        print('           "<weight> <targetprogram> [<args>]", instead of')
+        print('           <targetprogram>; each is profiled (in parallel),')
+        print('           their traffic is combined by weight, and the')
+        print('           predicted cost of each on the result is written')
+        print('           to "apps-summary.csv"/".json"; not with')
+        print('           --simulate or --samples, and the profile is')
+        print('           always made (from the simulation cache if run')
+        print('           before)')
+        print('--record-trace also records the messages of the profiling')
+        print('               run in "fully-trace.dat", which')
+        print('               comparisons.py --replay replays on other')
+        print('               topologies; this always runs m2s, and not')
+        print('               with --samples or --manifest')
+        print('<switches> synthesizes the topology hierarchically, see')
+        print('           hierarchy.py: the switches are split into')
+        print('           clusters of at most this many (>= 4) that')
+        print('           exchange much traffic, each is reduced by')
+        print('           itself in parallel, and the clusters are then')
+        print('           linked; for large core counts, where the')
+        print('           reduction of all switches at once is too slow;')
+        print('           0 (default) reduces all switches at once')
+        print('<logfile> keeps the reduction\'s removal steps and')
+        print('          checkpoints, see reductionlog.py: if it exists')
+        print('          and was made from the same traffic, the')
+        print('          reduction goes on from it (or back to its nearest')
+        print('          checkpoint for looser limits) instead of starting')
+        print('          over, and it is saved again after; the result is')
+        print('          the same; not with --place-l2 or --cluster-size,')
+        print('          and only with the networkx engine, whose')
+        print('          removal steps it keeps')
+        print('<profilenet> is the topology the profiling run simulates:')
+        print('             "fully" (default), whose links give the')
+        print('             traffic between every pair of switches, or')
+        print('             "ring", "mesh" or "torus", which have far')
+        print('             fewer links; the traffic between each pair')
+        print('             is then summed from m2s\'s network debug')
+        print('             output (see traceprofile.py); this always')
+        print('             runs m2s, and not with --samples or --manifest')
         sys.exit(0)
 
-def parse_sim_output(o):
-    # parse stdout from simulation
-    inst = 0
-    stns = 0
-    cyc = 0
-    linespastx86 = 0
-    for line in o.splitlines():
-        if re.match(r'\[ x86 \]', line):
-            linespastx86 = 0
-        if ( re.match(r'CommittedInstructions = ', line) and
-             linespastx86 == 7
-           ):
-            inst = float(re.sub(r'^CommittedInstructions = ([0-9]+).*$', \
-                                r'\1', line))
-        if re.match(r'SimTime = ', line) and linespastx86 == 12:
-            # simulated time in nanoseconds
-            stns = float(re.sub(r'^SimTime = ([0-9]+).*$', r'\1', line))
-        if re.match(r'Cycles = ', line) and linespastx86 == 14:
-            cyc = float(re.sub(r'^Cycles = ([0-9]+).*$', r'\1', line))
-        linespastx86 += 1
-    return inst, stns, cyc
-
-def build_graph():
-    # build graph from "net-report.txt" created in profiling step
+def graph_from_report(rpt):
     # edge weight represents bytes transferred across that link
-    # each link listed twice in "net-report.txt" for traffic in each direction
+    # each link listed twice in the report for traffic in each direction
     G=nx.Graph()
-    linkname = re.compile(r'\[ Network\.net0\.Link\.link_' + \
-                          r'<sw[0-9]+\.out_buf_[0-9]+>_' + \
-                          r'<sw[0-9]+\.in_buf_[0-9]+> \]')
-    node1 = -1
-    node2 = -1
-    trans = 0
-    avgms = 0
-    avgly = 0
-    totaltraffic = 0
-    linespastgeneral = 0
-    linespastlinkname = 0
-    linespastnodename = 0
-    rpt = open('fully-net-report.txt')
-    for line in rpt:
-        # find general stats section
-        if re.match(r'\[ Network.net0.General\ ]', line):
-            linespastgeneral = 0
-        # record general stats
-        if re.match(r'Transfers = ', line) and linespastgeneral == 1:
-            trans = float(re.sub(r'^Transfers = ([0-9]+)', r'\1', line))
-        if ( re.match(r'AverageMessageSize = ', line) and 
-             linespastgeneral == 2
-           ):
-            avgms = float(re.sub(r'^AverageMessageSize = ([0-9]+)', \
-                                 r'\1', line))
-        if ( re.match(r'AverageLatency = ', line) and 
-             linespastgeneral == 3
-           ):
-            avgly = float(re.sub(r'^AverageLatency = ([0-9]+)', \
-                                 r'\1', line))
-        # find report section names describing switch-to-switch links
-        if re.match(linkname, line):
-            node1 = int(re.sub(r'^.*link_<sw([0-9]+)\.out.*$', r'\1', line))
-            node2 = int(re.sub(r'^.*>_<sw([0-9]+)\.in.*$', r'\1', line))
-            linespastlinkname = 0
-        # the third line after such a link name gives the weight
-        if re.match(r'TransferredBytes = ', line) and linespastlinkname == 3:
-            wt = int(re.sub(r'^TransferredBytes = ([0-9]+)', r'\1', line))
-            if G.has_edge(node1, node2):
-                oldwt = G.edge[node1][node2]['weight']
-                wt = wt + oldwt
-                G.edge[node1][node2]['weight'] = wt
-            else:
-                G.add_edge(node1, node2, weight=wt)
-        # find report section names describing node statistics
-        if re.match(r'\[ Network.net0.Node.n', line):
-            linespastnodename = 0
-        # the second line after such a node name gives the bytes sent
-        if re.match(r'SentBytes = ', line) and linespastnodename == 2:
-            totaltraffic += float(re.sub(r'^SentBytes = ([0-9]+)', r'\1', line))
-        linespastgeneral += 1
-        linespastlinkname += 1
-        linespastnodename += 1
-    rpt.close()
-    return G, trans, avgms, avgly, totaltraffic
+    src, dst, nbytes = rpt.switch_links()
+    for i in range(len(nbytes)):
+        node1 = src[i]
+        node2 = dst[i]
+        if G.has_edge(node1, node2):
+            G[node1][node2]['weight'] += nbytes[i]
+        else:
+            G.add_edge(node1, node2, weight=nbytes[i])
+    return G
+
+def build_graph(rptfile='fully-net-report.txt'):
+    # build graph from "net-report.txt" created in profiling step
+    rpt = nr.read_net_report(rptfile)
+    G = graph_from_report(rpt)
+    return G, rpt.transfers, rpt.avgmsgsize, rpt.avglatency, \
+           rpt.totaltraffic()
 
 def edges_sorted_by_weight(graph):
     # get a list of edges sorted by weight incr. ((n1, n2), w)
+    # ties are kept in node order, (n1, n2) with n1 < n2, so the result
+    # doesn't depend on the order the links were added in
     el = []
-    for e in graph.edges_iter():
-        el.append( ( (e[0], e[1]), graph[e[0]][e[1]]['weight'] ) )
+    for n1, n2, w in graph.edges(data='weight'):
+        el.append( ( (min(n1, n2), max(n1, n2)), w ) )
+    el.sort()
     el.sort(key=operator.itemgetter(1))
     return el
 
-def replace_edge(graph, rel, maxl, maxd):
+def replace_edge(graph, rel, maxl, maxd, bt=None):
+    # returns True if any removed edge was added back to graph
+    # (and tells the bridge tracker bt, if given)
+    added = False
     if graph.number_of_edges() < maxl:
         # sort by weight descending (consider heaviest first)
         rel.sort(key=operator.itemgetter(1), reverse=True)
+        tried = len(rel)
         i = 0
-        while ( graph.number_of_edges() < maxlinks and
-                i < maxl * 100
+        # nothing to add back once every removed link is (e.g. when
+        # the node degree pass drops below maxl before any was removed)
+        while ( graph.number_of_edges() < maxl and
+                i < maxl * 100 and rel
               ):
+            if i == tried:
+                # every link left has been tried, and degrees only grow,
+                # so the rest of the loop would just rotate the list
+                # (see denseengine.replace_edge); rotate it at once
+                r = (maxl * 100 - i) % len(rel)
+                rel[:] = rel[r:] + rel[:r]
+                break
             re = rel.pop(0)
             rn1 = re[0][0]
             rn2 = re[0][1]
@@ -130,37 +228,74 @@ def replace_edge(graph, rel, maxl, maxd):
                 # add edge back in w/ weight zero
                 # traffic may then be rerouted over the added link
                 graph.add_edge(rn1, rn2, weight=0)
+                if bt is not None:
+                    bt.add(rn1, rn2)
+                ins.count('edges_replaced')
+                added = True
             else:
                 # if node degrees won't allow this edge to be
                 # replaced, put it back in the removed edge list
                 rel.append( ((rn1, rn2), rw) )
             # make sure this while loop doesn't go forever
             i += 1
+    return added
 
-def reroute_traffic(graph, rn1, rn2, rw, rel, maxl, maxd): 
+def reroute_traffic(graph, rn1, rn2, rw, rel, maxl, maxd, sp=None, \
+                    bt=None):
     # replace links, if needed, prior to rerouting traffic
     # link count may drop below maxlinks when working with maxdegree
-    replace_edge(graph, rel, maxl, maxd)
+    # sp is the lowest weight path found by removal_path, if any;
+    # it is still the path to use unless replace_edge added links
+    if replace_edge(graph, rel, maxl, maxd, bt):
+        sp = None
     # record removed link info in rel
     rel.append( ((rn1, rn2), rw) )
     # find lowest weight path between the newly disconnected nodes
-    sp = nx.shortest_path(graph, rn1, rn2, 'weight')
+    if sp is None:
+        ins.count('shortest_paths')
+        sp = nx.dijkstra_path(graph, rn1, rn2, 'weight')
     # add weight (traffic) from removed link to links in new path
     for n in range(0, len(sp) - 1):
         graph[sp[n]][sp[n+1]]['weight'] += rw
 
-def remove_edge_first_pass(graph, edge, rel, maxl, maxd):
+def removal_path(graph, rn1, rn2, bt=None):
+    # called right after removing link (rn1, rn2) from a connected
+    # graph; the graph is still connected iff the link was not a bridge
+    # returns the lowest weight path from rn1 to rn2 that
+    # reroute_traffic needs, or None if the link was a bridge
+    # with a bridge tracker bt (bridges.py) that still has the link,
+    # a bridge is known without any search, and bt is told of the
+    # removal otherwise; without one, the search from rn1 that stops
+    # at rn2 finds out
+    ins.count('connectivity_checks')
+    if bt is not None:
+        if bt.is_bridge(rn1, rn2):
+            return None
+        bt.remove(rn1, rn2)
+    elif graph.degree(rn1) == 0 or graph.degree(rn2) == 0:
+        return None
+    ins.count('shortest_paths')
+    try:
+        return nx.dijkstra_path(graph, rn1, rn2, 'weight')
+    except nx.NetworkXNoPath:
+        return None
+
+def remove_edge_first_pass(graph, edge, rel, maxl, maxd, bt=None):
     rn1 = edge[0][0]
     rn2 = edge[0][1]
     rw = edge[1]
     graph.remove_edge(rn1, rn2)
-    if nx.is_connected(graph):
-        reroute_traffic(graph, rn1, rn2, rw, rel, maxl, maxd)
+    ins.count('edges_removed')
+    sp = removal_path(graph, rn1, rn2, bt)
+    if sp is not None:
+        reroute_traffic(graph, rn1, rn2, rw, rel, maxl, maxd, sp, bt)
     else:
         # if graph disconnected, restore edge
         graph.add_edge(rn1, rn2, weight=rw)
+        ins.count('edges_restored')
 
-def reconnect_subgraphs(graph, subgraphs, rel, maxl, maxd):
+def reconnect_subgraphs(graph, subgraphs, rel, maxl, maxd, bt=None):
+    ins.count('reconnects')
     tel = []
     for gr in subgraphs:
         el = []
@@ -176,35 +311,68 @@ def reconnect_subgraphs(graph, subgraphs, rel, maxl, maxd):
     graph.remove_edge(rn1_2, rn2_2)
     graph.add_edge(rn1_1, rn1_2, weight=0)
     graph.add_edge(rn2_1, rn2_2, weight=0)
-    reroute_traffic(graph, rn1_1, rn2_1, rw_1, rel, maxl, maxd)
-    reroute_traffic(graph, rn1_2, rn2_2, rw_2, rel, maxl, maxd)
+    if bt is not None:
+        bt.remove(rn1_1, rn2_1)
+        bt.remove(rn1_2, rn2_2)
+        bt.add(rn1_1, rn1_2)
+        bt.add(rn2_1, rn2_2)
+    reroute_traffic(graph, rn1_1, rn2_1, rw_1, rel, maxl, maxd, bt=bt)
+    reroute_traffic(graph, rn1_2, rn2_2, rw_2, rel, maxl, maxd, bt=bt)
+
+def bridge(graph, n1, n2):
+    # True if link (n1, n2) is the only path between n1 and n2
+    seen = set([n1])
+    stack = [n1]
+    while stack:
+        u = stack.pop()
+        for v in graph.neighbors(u):
+            if (u, v) == (n1, n2) or (u, v) == (n2, n1):
+                continue
+            if v == n2:
+                return False
+            if v not in seen:
+                seen.add(v)
+                stack.append(v)
+    return True
 
-def remove_edge_second_pass(graph, edge, rel, maxl, maxd):
+def remove_edge_second_pass(graph, edge, rel, maxl, maxd, bt=None):
     rn1 = edge[0][0]
     rn2 = edge[0][1]
     rw = edge[1]
     graph.remove_edge(rn1, rn2)
-    if nx.is_connected(graph):
-        reroute_traffic(graph, rn1, rn2, rw, rel, maxl, maxd)
+    ins.count('edges_removed')
+    sp = removal_path(graph, rn1, rn2, bt)
+    if sp is not None:
+        reroute_traffic(graph, rn1, rn2, rw, rel, maxl, maxd, sp, bt)
     else:
         # if graph disconnected, remove anyway then reconnect
-        sgl = nx.connected_component_subgraphs(graph)
-        # but not if either subgraph has only one node
-        if ( sgl[0].number_of_nodes == 1 or
-             sgl[1].number_of_nodes == 1
+        # (the two parts, in order of their lowest node)
+        sgl = [graph.subgraph(c) for c in \
+               sorted(nx.connected_components(graph), key=min)]
+        # but not if either subgraph has only one node, or if the
+        # lightest links of both, which reconnect_subgraphs swaps, are
+        # bridges: each part would then be split in two, and the links
+        # it adds would join them into two parts again, not one
+        if ( sgl[0].number_of_nodes() == 1 or
+             sgl[1].number_of_nodes() == 1 or
+             all(bridge(graph, *edges_sorted_by_weight(g)[0][0]) \
+                 for g in sgl[:2])
            ):
             # can't fix subgraph w/ 1 node, so restore link
             graph.add_edge(rn1, rn2, weight=rw)
+            ins.count('edges_restored')
         else:
-            reconnect_subgraphs(graph, sgl, rel, maxl, maxd)
-            reroute_traffic(graph, rn1, rn2, rw, rel, maxl, maxd)
+            if bt is not None:
+                bt.remove(rn1, rn2)
+            reconnect_subgraphs(graph, sgl, rel, maxl, maxd, bt)
+            reroute_traffic(graph, rn1, rn2, rw, rel, maxl, maxd, bt=bt)
 
 def cat_edges_by_neighbors(graph, node, maxd):
     hn = []
     ln = []
     he = []
     le = []
-    for n in graph.neighbors_iter(node):
+    for n in sorted(graph.neighbors(node)):
         d = graph.degree(n)
         # categorize neighbors as heavy or light
         if d > maxd:
@@ -220,55 +388,13 @@ def cat_edges_by_neighbors(graph, node, maxd):
     le.sort(key=operator.itemgetter(1))
     return he, le
 
-if __name__ == "__main__":
-    # update path to simulator (or just 'm2s' if it's in $PATH)
-    sim = '/home/csd305/Documents/Multicore/multi2sim-4.2/bin/m2s'
-
-    # future work: accept these as command line args,
-    # and update writeconfigs.py so it can create files
-    # for mesh, torus, etc. for an arbitray number of cores
-    cores = 9
-    # threadspercore = 1 # assumed to be 1 for this version
-
-    check_args(sys.argv)
-
-    # create config files for profiling run of simulator
-    exe = str(sys.argv[3])
-    args = ''
-    for a in sys.argv[4:]:
-        args = args + str(a) + ' '
-    args = args.strip()
-    wc.write_ctx(exe, args)
-    wc.write_cpu(cores)
-    wc.write_mem(cores)
-    wc.write_net_fully(cores)
-
-    # run simulator with fully-connected NoC as profiling step
-    o = subprocess.Popen([sim, '--x86-sim', 'detailed', \
-                          '--x86-max-inst', '100000000', \
-                          '--x86-config', 'cpu-config.txt', \
-                          '--ctx-config', 'ctx-config.txt', \
-                          '--mem-config', 'mem-config.txt', \
-                          '--net-config', 'fully-net-config.txt', \
-                          '--net-report', 'fully-net-report.txt'], \
-                          stderr=subprocess.STDOUT, \
-                          stdout=subprocess.PIPE).communicate()[0]
-
-    inst, simtimens, cycles = parse_sim_output(o)
-    print 'Instructions:', inst
-    print 'Nanoseconds:', simtimens
-    print 'Cycles:', cycles
-
-    G, transfers, avgmsgsize, avglatency, totaltraffic = build_graph()
-    print 'NoC Transfers (# Packets Sent):', transfers
-    print 'NoC Avg. Message (Packet) Size:', avgmsgsize
-    print 'NoC Average Latency (in Cycles):', avglatency
-    print 'NoC Total Traffic (bytes):', totaltraffic
-
+def reduce_graph(G, maxlinks, maxdegree, engine='networkx'):
     # modify graph until constraints are met
     # (total link count and links per node)
-    maxlinks = int(sys.argv[1])
-    maxdegree = int(sys.argv[2])
+    if engine == 'numpy':
+        # same reduction on dense NumPy arrays, see denseengine.py
+        import denseengine as de
+        return de.reduce_dense(G, maxlinks, maxdegree)
 
     # preserve original graph
     # also don't use GN=G; that just creates a reference, not a copy
@@ -279,11 +405,13 @@ if __name__ == "__main__":
 
     # iterate in incr. weight order; remove edge if maxlinks
     # constraint not satisfied and if graph will stay connected
+    # (which the bridge tracker knows without searching the graph)
     rel = []
+    bt = br.graph_tracker(GN)
     for e in el:
         if GN.number_of_edges() <= maxlinks:
             break
-        remove_edge_first_pass(GN, e, rel, maxlinks, maxdegree)
+        remove_edge_first_pass(GN, e, rel, maxlinks, maxdegree, bt)
     
     # get an updated  list of edges sorted by weight incr.
     el = edges_sorted_by_weight(GN)
@@ -293,13 +421,17 @@ if __name__ == "__main__":
     for e in el:
         if GN.number_of_edges() <= maxlinks:
             break
-        remove_edge_second_pass(GN, e, rel, maxlinks, maxdegree)
+        remove_edge_second_pass(GN, e, rel, maxlinks, maxdegree, bt)
+
+    reduce_degree(GN, rel, maxlinks, maxdegree, bt)
+    return GN
 
+def reduce_degree(GN, rel, maxlinks, maxdegree, bt=None):
     # now consider node degree constraint (maxdegree)
     # iterate thru nodes, remove edges as needed; start with
     # "heavy" edges connecting to other nodes exceeding maxdegree
     # replace removed edge w/ one from rel (removed edges list)
-    for n in GN.nodes_iter():
+    for n in sorted(GN.nodes()):
         if GN.degree(n) > maxdegree:
             h = []
             l = []
@@ -307,11 +439,11 @@ if __name__ == "__main__":
             for e in h:
                 if GN.degree(n) <= maxdegree:
                     break
-                remove_edge_first_pass(GN, e, rel, maxlinks, maxdegree)
+                remove_edge_first_pass(GN, e, rel, maxlinks, maxdegree, bt)
             for e in l:
                 if GN.degree(n) <= maxdegree:
                     break
-                remove_edge_first_pass(GN, e, rel, maxlinks, maxdegree) 
+                remove_edge_first_pass(GN, e, rel, maxlinks, maxdegree, bt) 
             # second pass, disconnect and reconnect graph if needed
             h = []
             l = []
@@ -319,12 +451,559 @@ if __name__ == "__main__":
             for e in h:
                 if GN.degree(n) <= maxdegree:
                     break
-                remove_edge_second_pass(GN, e, rel, maxlinks, maxdegree)
+                remove_edge_second_pass(GN, e, rel, maxlinks, maxdegree, \
+                                        bt)
             for e in l:
                 if GN.degree(n) <= maxdegree:
                     break
-                remove_edge_second_pass(GN, e, rel, maxlinks, maxdegree)   
-    
-    wc.write_net_novel(cores, GN)
-    print 'novel NoC topology written to "novel-net-config.txt" ' + \
-          'for use by Multi2Sim' 
+                remove_edge_second_pass(GN, e, rel, maxlinks, maxdegree, \
+                                        bt)
+
+def reduce_topology(G, maxlinks, maxdegree, engine='networkx', \
+                    clustersize=0, parallel=True):
+    # reduce_graph, or with a cluster size the hierarchical synthesis of
+    # hierarchy.py; parallel reduces its clusters in a process pool,
+    # which pool workers themselves can't do
+    if clustersize == 0 or G.number_of_nodes() <= clustersize:
+        return reduce_graph(G, maxlinks, maxdegree, engine)
+    import hierarchy as hy
+    return hy.reduce_hierarchical(G, maxlinks, maxdegree, clustersize, \
+                                  engine, parallel)
+
+def optimize_graph(G, GN, maxlinks, maxdegree, chains=0, \
+                   starts=('greedy',), iterations=2000, verbose=False, \
+                   **kw):
+    # search around the greedy result GN with that many annealing
+    # chains, see optimizer.py (kw go to its cost model, e.g. cycles
+    # and msgsize); returns GN unchanged if chains is 0
+    if chains == 0:
+        return GN
+    import optimizer as op
+    best, greedy, GN = op.optimize(G, GN, G.number_of_nodes(), maxlinks, \
+                                   maxdegree, chains, iterations, starts, \
+                                   **kw)
+    if verbose:
+        print('Estimated latency, greedy topology:', greedy)
+        print('Estimated latency, optimized topology:', best)
+    return GN
+
+def synthesize_topology(traffic_graph, maxlinks, maxdegree, \
+                        engine='networkx', chains=0, starts=('greedy',), \
+                        iterations=2000, clustersize=0, **kw):
+    # the novel topology for traffic_graph (switches linked by the bytes
+    # they exchange, e.g. from graph_from_report) within maxlinks and
+    # maxdegree: the greedy reduction, then optionally the annealing
+    # search of optimize_graph; clustersize as for reduce_topology
+    # traffic_graph is left unchanged and nothing else is read or
+    # written, so scripts can call this many times in one process
+    GN = reduce_topology(traffic_graph, maxlinks, maxdegree, engine, \
+                         clustersize)
+    return optimize_graph(traffic_graph, GN, maxlinks, maxdegree, chains, \
+                          starts, iterations, **kw)
+
+def synthesize_placed(rpt, cores, maxlinks, maxdegree, engine='networkx', \
+                      rounds=4, verbose=False, clustersize=0, parallel=True):
+    # the greedy topology and the L2 attachments chosen together, see
+    # placement.py: starting from the default attachments, alternate
+    # reducing the traffic graph of the current placement and placing
+    # the L2 modules on the result, until the placement settles
+    # (clustersize and parallel as for reduce_topology)
+    # returns (traffic graph, topology, l2links, directed traffic
+    # matrix) of the placement with the least hop-weighted L2 traffic
+    # the reduction can't always meet maxdegree (it keeps the links of
+    # nodes that would be cut off), so a placement is only kept if its
+    # topology meets it or the default's doesn't either
+    import placement as pl
+    import costmodel as cm
+    dem = pl.demand(rpt, cores, len(wc.default_l2links))
+    w = dem[0] + dem[1]
+    l2links = [list(s) for s in wc.default_l2links]
+    best = None
+    for r in range(rounds):
+        t = pl.traffic(dem, l2links, cores)
+        G = pl.traffic_graph(t)
+        GN = reduce_topology(G, maxlinks, maxdegree, engine, clustersize, \
+                             parallel)
+        h = cm.hop_matrix(cm.adjacency(GN.edges(), cores))
+        c = pl.cost(h, w, l2links)
+        over = max(d for n, d in GN.degree()) > maxdegree
+        if verbose:
+            print('L2 placement', l2links, 'hop-weighted L2 traffic:', c, \
+                  '(exceeds maxdegree)' if over else '')
+        if best is None or (over, c) < best[0]:
+            best = ((over, c), G, GN, l2links, t)
+        new = pl.place(h, w, l2links)
+        if new == l2links:
+            break
+        l2links = new
+    c, G, GN, l2links, t = best
+    return G, GN, l2links, t
+
+def search_options(rpt):
+    # optimize_graph arguments for the --optimize, --start and
+    # --iterations options, with the cost model scaled to the profile
+    if options['start'] == 'both':
+        starts = ('greedy', 'mesh')
+    else:
+        starts = (options['start'],)
+    return {'chains': int(options['optimize']), 'starts': starts, \
+            'iterations': int(options['iterations']), \
+            'cycles': rpt.cycles(), 'msgsize': rpt.avgmsgsize or 72.0}
+
+def novel_routes(rpt, GN, cores, l2links=None, t=None):
+    # routes for GN that balance the directed traffic of the profile
+    # rpt, see routing.py; returns the routes and the load on the
+    # busiest channel with shortest-path and with these routes
+    # also returns the load of each link (n1, n2), n1 < n2, over both
+    # its channels
+    # l2links and t are the L2 attachments and the traffic matrix
+    # for them, if the L2 modules were placed (see synthesize_placed)
+    import routing as rt
+    if t is None:
+        t = rt.directed_matrix(rpt, cores)
+    dist, nh, before, after = rt.balanced_routes(t, GN.edges(), cores)
+    routes = rt.route_table(dist, nh, cores, l2links)
+    rt.check_routes(routes)
+    load = rt.channel_loads(t, nh)
+    loads = dict(((min(u, v), max(u, v)), load[u, v] + load[v, u]) \
+                 for u, v in GN.edges())
+    return routes, before, after, loads
+
+def novel_design(G, GN, cores, rpt, routes=False, size=None, \
+                 verbose=False, l2links=None, t=None):
+    # what is written to GN's net config besides its links: the L2
+    # attachments l2links if placed, balanced routes if routes is
+    # True, and link bandwidths and buffer sizes if size is a
+    # (bandwidth budget, buffer budget) pair (see sizing.py; a budget
+    # of None is the uniform design's)
+    # returns write_net_novel's keyword arguments and a dict of the
+    # busiest channel's load and the busiest link's utilization, as
+    # computed
+    kw = {}
+    info = {}
+    loads = None
+    if l2links is not None:
+        kw['l2links'] = l2links
+    if routes:
+        kw['routes'], before, after, loads = novel_routes(rpt, GN, cores, \
+                                                          l2links, t)
+        info['maxload'] = after
+        if verbose:
+            print('Busiest channel (bytes), shortest-path routes:', before)
+            print('Busiest channel (bytes), balanced routes:', after)
+    if size is not None:
+        import sizing as sz
+        if loads is None:
+            loads = sz.graph_loads(GN)
+        try:
+            kw['bandwidths'] = sz.size_links(loads, size[0])
+            kw['buffers'] = sz.size_buffers(loads, cores, size[1], \
+                                            l2links)
+        except ValueError as e:
+            # a budget too small for the minimum sizes
+            sys.exit('--size: ' + str(e))
+        info['maxutil'] = sz.max_utilization(loads, rpt.cycles(), \
+                                             kw['bandwidths'])
+        if verbose:
+            print('Busiest link utilization, uniform links:', \
+                  sz.max_utilization(loads, rpt.cycles()))
+            print('Busiest link utilization, sized links:', info['maxutil'])
+    return kw, info
+
+def size_budgets():
+    # novel_design's size argument for the --size options
+    if not options['size']:
+        return None
+    return (int(options['bandwidth-budget']) or None, \
+            int(options['buffer-budget']) or None)
+
+def parse_range(arg):
+    # "<n>", "<lo>-<hi>" (inclusive), or a comma-separated list of
+    # these, e.g. "12-16,20"; returns the sorted values
+    vals = set()
+    for part in arg.split(','):
+        lo, dash, hi = part.partition('-')
+        if dash:
+            vals.update(range(int(lo), int(hi) + 1))
+        elif lo != '':
+            vals.add(int(lo))
+    return sorted(vals)
+
+def hop_traffic(G, GN):
+    # bytes times hops of carrying the traffic in G over topology GN
+    hops = dict(nx.all_pairs_shortest_path_length(GN))
+    ht = 0
+    for u, v, d in G.edges(data=True):
+        ht += d['weight'] * hops[u][v]
+    return ht
+
+def sweep_job(job):
+    # reduce for one constraint pair; module-level so it can be used
+    # as a multiprocessing pool worker
+    # with place, the L2 modules are placed too (synthesize_placed)
+    # and the traffic graph is that of the placement
+    # a worker can't start a pool of its own, so the clusters of a
+    # hierarchical synthesis are reduced one after another
+    G, maxlinks, maxdegree, engine, place, rpt, cores, clustersize = job
+    if place:
+        G, GN, l2links, t = synthesize_placed(rpt, cores, maxlinks, \
+                                              maxdegree, engine, \
+                                              clustersize=clustersize, \
+                                              parallel=False)
+        return maxlinks, maxdegree, G, GN, l2links, t
+    GN = reduce_topology(G, maxlinks, maxdegree, engine, clustersize, False)
+    return maxlinks, maxdegree, G, GN, None, None
+
+def sweep(G, pairs, cores, engine, search, rpt, outdir='.', routes=False, \
+          size=None, place=False, clustersize=0, log=None):
+    # reduce G for every (maxlinks, maxdegree) pair in parallel and
+    # write each topology to "novel-<maxlinks>-<maxdegree>-net-config.txt"
+    # search holds the optimize_graph arguments, routes and size are
+    # as for novel_design, place also places the L2 modules, and
+    # clustersize is as for reduce_topology
+    # with log (a reductionlog.ReductionLog of G) the pairs are reduced
+    # one after another from it instead, loosest maxlinks first so each
+    # goes on from the one before
+    # returns a summary row and a (topology, l2links) pair for each
+    # pair, l2links None if not placed
+    # the profile is only sent to the workers if they place
+    if log is not None:
+        done = {}
+        for ml, md in sorted(pairs, key=lambda p: -p[0]):
+            done[(ml, md)] = (ml, md, G, log.reduce(ml, md), None, None)
+        results = [done[p] for p in pairs]
+    else:
+        jobs = [(G, ml, md, engine, place, rpt if place else None, cores, \
+                 clustersize) for ml, md in pairs]
+        pool = multiprocessing.Pool(min(len(jobs), \
+                                        multiprocessing.cpu_count()))
+        try:
+            results = pool.map(sweep_job, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    rows = []
+    designs = []
+    for ml, md, G, GN, l2links, t in results:
+        # optimizer runs its chains in parallel itself
+        GN = optimize_graph(G, GN, ml, md, **search)
+        name = 'novel-%d-%d' % (ml, md)
+        kw, info = novel_design(G, GN, cores, rpt, routes, size, \
+                                l2links=l2links, t=t)
+        wc.write_net_novel(cores, GN, name, outdir=outdir, **kw)
+        ht = hop_traffic(G, GN)
+        total = G.size(weight='weight')
+        row = {'topology': name, 'maxlinks': ml, 'maxdegree': md, \
+               'links': GN.number_of_edges(), \
+               'degree': max(GN.degree(n) for n in GN.nodes()), \
+               'hoptraffic': ht, \
+               'avghops': float(ht) / total if total else 0.0}
+        row.update(info)
+        rows.append(row)
+        designs.append((GN, l2links))
+    return rows, designs
+
+def app_graph(rpt, cores, l2links=None):
+    # the traffic graph of one app of a workload mix, with the L2
+    # modules where they were placed if they were
+    if l2links is None:
+        return graph_from_report(rpt)
+    import placement as pl
+    dem = pl.demand(rpt, cores, len(l2links))
+    return pl.traffic_graph(pl.traffic(dem, l2links, cores))
+
+def mix_costs(mix, designs, cores):
+    # workloads.app_costs of every app of the mix (names, weights and
+    # net reports) on every (name, topology, l2links) design
+    names, weights, reports = mix
+    rows = []
+    for name, GN, l2links in designs:
+        graphs = [app_graph(r, cores, l2links) for r in reports]
+        for row in wl.app_costs(names, weights, graphs, reports, \
+                                GN.edges(), cores):
+            row['topology'] = name
+            rows.append(row)
+    return rows
+
+# columns of the sweep summary; simulated ones only with --simulate
+sweepcols = ['topology', 'maxlinks', 'maxdegree', 'links', 'degree', \
+             'hoptraffic', 'avghops', 'maxload', 'maxutil', 'cycles', \
+             'avglatency']
+
+# columns of the workload mix summary
+appcols = ['topology', 'app', 'weight', 'traffic', 'hoptraffic', \
+           'avghops', 'maxutil', 'latency']
+
+def write_summary(rows, cols, name, outdir='.'):
+    # rows as "<name>.csv" and "<name>.json"
+    cols = [c for c in cols if c in rows[0]]
+    f = open(os.path.join(outdir, name + '.csv'), 'w')
+    w = csv.writer(f)
+    w.writerow(cols)
+    for r in rows:
+        w.writerow([r[c] for c in cols])
+    f.close()
+    f = open(os.path.join(outdir, name + '.json'), 'w')
+    json.dump(rows, f, indent=1, sort_keys=True, separators=(',', ': '))
+    f.write('\n')
+    f.close()
+
+def print_table(rows, cols):
+    cols = [c for c in cols if c in rows[0]]
+    table = [cols]
+    for r in rows:
+        table.append([('%.2f' % r[c]) if isinstance(r[c], float) \
+                      else str(r[c]) for c in cols])
+    widths = [max(len(t[i]) for t in table) for i in range(len(cols))]
+    for t in table:
+        print('  '.join(t[i].rjust(widths[i]) for i in range(len(cols))))
+
+if __name__ == "__main__":
+    # update path to simulator (or just 'm2s' if it's in $PATH)
+    sim = '/home/csd305/Documents/Multicore/multi2sim-4.2/bin/m2s'
+    # number of detailed instructions simulated in each run
+    maxinst = '100000000'
+
+    # threadspercore = 1 # assumed to be 1 for this version
+
+    argv = parse_options(sys.argv, options)
+    check_args(argv)
+    cores = int(options['cores'])
+    clustersize = int(options['cluster-size'])
+    outdir = options['outdir']
+    if options['rundir'] != '':
+        # a fresh directory so concurrent runs don't share files
+        outdir = rd.make_rundir(options['rundir'], 'tool')
+        rd.cleanup(options['rundir'])
+        print('writing to "' + outdir + '"')
+
+    # a workload mix, or the one target program
+    apps = None
+    if options['manifest'] != '':
+        try:
+            apps = wl.read_manifest(options['manifest'])
+        except (IOError, ValueError) as e:
+            sys.exit('--manifest: ' + str(e))
+    else:
+        exe = str(argv[3])
+        args = ''
+        for a in argv[4:]:
+            args = args + str(a) + ' '
+        args = args.strip()
+
+    # create config files for profiling run of simulator
+    # (the apps of a mix get their own ctx configs, see profiling.py)
+    with ins.phase('write_configs'):
+        if apps is None:
+            wc.write_ctx(exe, args, outdir)
+        wc.write_cpu(cores, outdir)
+        wc.write_mem(cores, outdir)
+        # the fully-connected config has a link for every pair of
+        # switches; it is only written if it is simulated
+        profnet = options['profile-net']
+        if profnet == 'fully':
+            wc.write_net_fully(cores, outdir=outdir)
+        else:
+            getattr(wc, 'write_net_' + profnet)(cores, outdir=outdir)
+
+    # run simulator with fully-connected NoC as profiling step
+    # reuse a cached result if this exact simulation was run before
+    # or, with --profile-file, a saved profile
+    profpath = options['profile-file'] or \
+               os.path.join(outdir, 'fully-profile.dat')
+    samples = int(options['samples'])
+    reports = None
+    mix = None
+    prof = None
+    if apps is not None:
+        # every app on its own, then their traffic combined by weight
+        with ins.phase('simulate'):
+            appstats, appreports = pf.profile_apps(sim, maxinst, \
+                                                   [(e, a) for e, a, w \
+                                                    in apps], outdir)
+        weights = [w for e, a, w in apps]
+        scale = wl.mix_weights(weights, [r.cycles() for r in appreports])
+        stats = so.merge_stats(appstats, scale)
+        rpt = nr.merge_reports(appreports, scale)
+        mix = (wl.app_names(apps), weights, appreports)
+        print('Workload mix (app, weight, cycles, traffic in bytes):')
+        for name, w, r in zip(mix[0], weights, appreports):
+            print('  %s %g %d %d' % (name, w, r.cycles(), r.totaltraffic()))
+        with ins.phase('write_profile'):
+            tp.write_profile(profpath, rpt, stats)
+    elif options['profile-file'] != '' and os.path.exists(profpath) and \
+         not options['record-trace']:
+        with ins.phase('load_profile'):
+            try:
+                prof = rpt = tp.read_profile(profpath, cores)
+            except ValueError as e:
+                sys.exit('--profile-file: ' + str(e))
+            stats = rpt.stats()
+    elif samples > 0:
+        # several short windows in parallel instead of one long run
+        with ins.phase('simulate'):
+            window = int(options['window'])
+            stats, rpt, reports = pf.profile_sampled(sim, int(maxinst), \
+                                                     window, samples, cores, \
+                                                     exe, args, outdir)
+        with ins.phase('write_profile'):
+            tp.write_profile(profpath, rpt, stats)
+    else:
+        # with --record-trace, m2s's network debug output is recorded
+        # as a message trace (see nettrace.py) and then removed
+        # with --profile-net the run is on that topology, and the
+        # fully-connected report is rebuilt from the debug output
+        netdebug = None
+        if options['record-trace'] or profnet != 'fully':
+            netdebug = os.path.join(outdir, profnet + '-net-debug.txt')
+        rptfile = profnet + '-net-report.txt'
+        with ins.phase('simulate'):
+            metrics = pf.profile_run(sim, maxinst, 'cpu-config.txt', \
+                                     rptfile, exe, args, outdir, netdebug, \
+                                     profnet + '-net-config.txt')
+            stats = so.X86Stats(metrics)
+        with ins.phase('read_net_report'):
+            rpt = nr.read_net_report(os.path.join(outdir, rptfile))
+        if profnet != 'fully':
+            import traceprofile as tr
+            with ins.phase('pair_traffic'):
+                rpt = tr.profile_report(netdebug, cores, rpt)
+            print('traffic between each pair of switches summed from ' + \
+                   'the %d messages of the %s run' % (rpt.transfers, \
+                                                      profnet))
+        if options['record-trace']:
+            import nettrace as nt
+            with ins.phase('record_trace'):
+                count = nt.record_trace(netdebug, \
+                                        os.path.join(outdir, \
+                                                     'fully-trace.dat'), \
+                                        rpt.cycles())
+            print('message trace of %d messages written to ' % count + \
+                   '"fully-trace.dat"')
+        if netdebug is not None:
+            os.remove(netdebug)
+        with ins.phase('write_profile'):
+            tp.write_profile(profpath, rpt, stats)
+    inst, simtimens, cycles = stats.metrics()
+    print('Instructions:', inst)
+    print('Nanoseconds:', simtimens)
+    print('Cycles:', cycles)
+
+    with ins.phase('build_graph'):
+        G = graph_from_report(rpt)
+    transfers = rpt.transfers
+    avgmsgsize = rpt.avgmsgsize
+    avglatency = rpt.avglatency
+    totaltraffic = rpt.totaltraffic()
+    print('NoC Transfers (# Packets Sent):', transfers)
+    print('NoC Avg. Message (Packet) Size:', avgmsgsize)
+    print('NoC Average Latency (in Cycles):', avglatency)
+    print('NoC Total Traffic (bytes):', totaltraffic)
+    if reports is not None and len(reports) > 1:
+        # does each window see the same traffic as the others?
+        print('Sample agreement with the other samples ' + \
+               '(cosine similarity, rank correlation):')
+        agree = pf.agreement([graph_from_report(r) for r in reports])
+        for i in range(len(reports)):
+            print('  sample %d: %.4f %.4f' % (i, agree[i][0], agree[i][1]))
+
+    # with --reduction-log the reduction goes on from an earlier run's
+    # removal steps, kept in the log file (see reductionlog.py)
+    log = None
+    if options['reduction-log'] != '':
+        import reductionlog as rl
+        with ins.phase('read_log'):
+            log = rl.read_log(options['reduction-log'], G)
+        print('reduction log has %d of the removal steps' % len(log.counts))
+
+    # a range or list of constraints sweeps every (maxlinks, maxdegree)
+    # pair against this one profiling run
+    mll = parse_range(argv[1])
+    mdl = parse_range(argv[2])
+    if len(mll) > 1 or len(mdl) > 1:
+        pairs = [(ml, md) for ml in mll for md in mdl]
+        with ins.phase('sweep'):
+            with ins.cprofile(options['cprofile']):
+                rows, designs = sweep(G, pairs, cores, options['engine'], \
+                                      search_options(rpt), rpt, outdir, \
+                                      options['routes'], size_budgets(), \
+                                      options['place-l2'], clustersize, \
+                                      log)
+        if log is not None:
+            with ins.phase('write_log'):
+                log.save(options['reduction-log'])
+        if options['simulate']:
+            # simulate every topology of the sweep, see comparisons.py
+            import comparisons as cmp
+            with ins.phase('simulate_sweep'):
+                results = cmp.run_topologies(sim, maxinst, exe, args, \
+                                             [r['topology'] for r in rows], \
+                                             outdir)
+            for r, res in zip(rows, results):
+                r['cycles'] = res[3]
+                r['avglatency'] = res[6]
+        write_summary(rows, sweepcols, 'sweep-summary', outdir)
+        print_table(rows, sweepcols)
+        print('summary written to "sweep-summary.csv" and ' + \
+               '"sweep-summary.json"')
+        if mix is not None:
+            approws = mix_costs(mix, [(r['topology'],) + d for r, d in \
+                                      zip(rows, designs)], cores)
+            write_summary(approws, appcols, 'apps-summary', outdir)
+            print_table(approws, appcols)
+            print('predicted cost of each app written to ' + \
+                   '"apps-summary.csv" and "apps-summary.json"')
+        if prof is not None:
+            prof.close()
+        ins.write(os.path.join(outdir, 'tool-timing.json'), argv=sys.argv)
+        sys.exit(0)
+
+    maxlinks = mll[0]
+    maxdegree = mdl[0]
+
+    # synthesis, optionally under cProfile
+    # with --place-l2 the L2 attachments are chosen with the topology,
+    # which changes the traffic graph
+    l2links = None
+    t = None
+    with ins.cprofile(options['cprofile']):
+        if options['place-l2']:
+            with ins.phase('place'):
+                G, GN, l2links, t = synthesize_placed(rpt, cores, maxlinks, \
+                                                      maxdegree, \
+                                                      options['engine'], \
+                                                      verbose=True, \
+                                                      clustersize=clustersize)
+            print('L2 modules linked to switches:', l2links)
+        else:
+            with ins.phase('reduce'):
+                if log is not None:
+                    GN = log.reduce(maxlinks, maxdegree)
+                else:
+                    GN = reduce_topology(G, maxlinks, maxdegree, \
+                                         options['engine'], clustersize)
+            if log is not None:
+                with ins.phase('write_log'):
+                    log.save(options['reduction-log'])
+        with ins.phase('optimize'):
+            GN = optimize_graph(G, GN, maxlinks, maxdegree, \
+                                verbose=True, **search_options(rpt))
+
+    # routes and link and buffer sizes, if asked for
+    with ins.phase('design'):
+        kw, info = novel_design(G, GN, cores, rpt, options['routes'], \
+                                size_budgets(), True, l2links, t)
+
+    with ins.phase('write_novel'):
+        wc.write_net_novel(cores, GN, outdir=outdir, **kw)
+    print('novel NoC topology written to "novel-net-config.txt" ' + \
+           'for use by Multi2Sim')
+    if mix is not None:
+        approws = mix_costs(mix, [('novel', GN, l2links)], cores)
+        write_summary(approws, appcols, 'apps-summary', outdir)
+        print_table(approws, appcols)
+        print('predicted cost of each app written to "apps-summary.csv" ' + \
+               'and "apps-summary.json"')
+    if prof is not None:
+        prof.close()
+    ins.write(os.path.join(outdir, 'tool-timing.json'), argv=sys.argv)
@@ -0,0 +1,150 @@
+"""This module makes the profile of the fully-connected NoC without
+simulating it (tool.py --profile-net). The fully-connected profiling run
+works because every pair of switches has a link of its own, so the bytes
+on a link are the traffic between that pair; but the links grow as the
+square of the cores, and so does the simulator's work on the network.
+
+Instead the app runs on a ring, mesh or torus with m2s's network debug
+output (see nettrace.py), and the bytes and messages each end node sends
+each other end node are summed as the output is read, a few megabytes
+at a time, so even a long run's output is never held in memory. Which
+end nodes talk to which, and how much, is up to the program, so it is
+the same on any topology but for the timing.
+
+The output has a line per send and more for every other network event,
+so it is scanned in bulk with one regular expression for sends in the
+form m2s writes them; only a piece of the output with sends in any
+other form goes through the line-by-line nettrace.parse_debug.
+
+From those pairs a netreport.NetReport is built with the sections the
+fully-connected run would have written, which tool.graph_from_report,
+trafficprofile.write_profile and placement.py read as they would the
+real one:
+
+- a link section for each direction of each pair of switches, carrying
+  the messages between the end nodes on them: core i's end node is on
+  sw<i>, and an L2 module's on the switches it is linked to
+  (writeconfigs.default_l2links). A message between an L2 module and a
+  core whose switch it is linked to stays in that switch; otherwise it
+  is split evenly over the switches at either end.
+- a node section for each end node with the bytes and messages it sent
+  and received, exactly as traced.
+- the general section, with the transfers and average message size of
+  the trace, and the latency and cycles of the run on the cheap
+  topology.
+"""
+import re
+import collections
+import netreport as nr
+import nettrace as nt
+import writeconfigs as wc
+
+# a send, fields in the order m2s writes them
+sendre = re.compile(br'a="send" net="([^"]*)" msg=\S+ size=([0-9]+) ' + \
+                    br'src="n([0-9]+)" dst="n([0-9]+)"')
+
+def chunks(path, size=1 << 22):
+    # the debug output at path in pieces of whole lines
+    f = nt.open_debug(path, binary=True)
+    rest = b''
+    try:
+        while True:
+            b = f.read(size)
+            if not b:
+                break
+            b = rest + b
+            cut = b.rfind(b'\n') + 1
+            rest = b[cut:]
+            yield b[:cut]
+        if rest:
+            yield rest
+    finally:
+        f.close()
+
+def add_pair(pairs, src, dst, nbytes, msgs):
+    p = pairs.get((src, dst))
+    if p is None:
+        pairs[(src, dst)] = [nbytes, msgs]
+    else:
+        p[0] += nbytes
+        p[1] += msgs
+
+def pair_traffic(debugfile, net='net0'):
+    # {(src, dst): [bytes, messages]} summed over the sends from end
+    # node n<src> to n<dst> in the m2s debug output in debugfile
+    # sends in the usual form are counted by (net, size, src, dst);
+    # a piece with anything else that may be a send is parsed in full
+    counts = collections.Counter()
+    pairs = {}
+    for chunk in chunks(debugfile):
+        found = sendre.findall(chunk)
+        if len(found) == chunk.count(b'send'):
+            counts.update(found)
+            continue
+        lines = chunk.decode('ascii', 'replace').splitlines()
+        for cycle, src, dst, size in nt.parse_debug(lines, net):
+            add_pair(pairs, src, dst, size, 1)
+    netb = net.encode('ascii')
+    for (n, size, src, dst), m in counts.items():
+        if n == netb:
+            add_pair(pairs, int(src), int(dst), int(size) * m, m)
+    return pairs
+
+def fully_report(pairs, cores, base, l2links=None, net='net0'):
+    # the report of the fully-connected run, from end node pair traffic
+    # (pair_traffic) and the report base of the run that traced it
+    if l2links is None:
+        l2links = wc.default_l2links
+    home = dict((i, [i]) for i in range(cores))
+    for j, sws in enumerate(l2links):
+        home[cores + j] = list(sws)
+    links = {}
+    nodes = {}
+    for (s, d), (b, m) in sorted(pairs.items()):
+        for node, i in ((s, 0), (d, 2)):
+            t = nodes.setdefault(node, [0, 0, 0, 0])
+            t[i] += b
+            t[i + 1] += m
+        hs = home.get(s, [])
+        hd = home.get(d, [])
+        if not hs or not hd or set(hs) & set(hd):
+            continue
+        share = float(len(hs) * len(hd))
+        for a in hs:
+            for c in hd:
+                l = links.setdefault((a, c), [0.0, 0.0])
+                l[0] += b / share
+                l[1] += m / share
+    rpt = nr.NetReport(net)
+    prefix = 'Network.' + net + '.'
+    transfers = float(sum(m for b, m in pairs.values()))
+    total = float(sum(b for b, m in pairs.values()))
+    rpt.sections[prefix + 'General'] = \
+        {'Transfers': transfers, \
+         'AverageMessageSize': total / transfers if transfers else 0.0, \
+         'AverageLatency': base.avglatency, 'Cycles': base.cycles()}
+    # both directions of each link, in the order of the config; each
+    # switch's buffers are numbered by the switch at the other end
+    for i, j in wc.fully_edges(cores):
+        for a, c in ((i, j), (j, i)):
+            name = prefix + 'Link.link_<sw%d.out_buf_%d>_<sw%d.in_buf_%d>' \
+                   % (a, c, c, a)
+            b, m = links.get((a, c), (0.0, 0.0))
+            rpt.sections[name] = {'TransferredBytes': b, \
+                                  'TransferredMessages': m}
+            rpt.links.append(('sw%d' % a, 'sw%d' % c, name))
+    for node in range(cores + len(l2links)):
+        name = prefix + 'Node.n%d' % node
+        sb, sm, rb, rm = nodes.get(node, (0, 0, 0, 0))
+        rpt.sections[name] = {'SentBytes': float(sb), \
+                              'SentMessages': float(sm), \
+                              'ReceivedBytes': float(rb), \
+                              'ReceivedMessages': float(rm)}
+        rpt.nodes.append(('n%d' % node, name))
+    return rpt
+
+def profile_report(debugfile, cores, base, l2links=None, net='net0'):
+    # the fully-connected report from the debug output of a run on
+    # another topology, whose own report is base
+    return fully_report(pair_traffic(debugfile, net), cores, base, \
+                        l2links, net)
@@ -0,0 +1,161 @@
+"""This module stores the result of the profiling step in a compact
+binary file, so the net report does not have to be parsed again and
+other scripts can load the traffic directly. The file is one fixed
+header followed by flat little-endian arrays:
+
+    header      magic "NOCPROF1", version, switches (n), end nodes (k),
+                then the x86 stats (instructions, simulated ns, cycles)
+                and the net stats (transfers, average message size,
+                average latency, network cycles), all as doubles
+    traffic     n x n doubles, bytes sent from switch i to switch j
+    links       n x n bytes, 1 where the switch i -> j link exists,
+                padded to a multiple of 8 bytes
+    sent        k doubles, bytes sent by end node n0 .. n<k-1>
+    received    k doubles, bytes received by each end node
+
+A Profile memory-maps the file and offers the same methods as a
+netreport.NetReport, so tool.graph_from_report accepts either. With
+NumPy, matrix() returns the traffic as an array backed by the mapping
+itself, without a copy.
+"""
+import os
+import mmap
+import struct
+from array import array
+import simoutput as so
+
+magic = b'NOCPROF1'
+version = 1
+header = struct.Struct('<8s3I4x7d')
+
+def to_bytes(a):
+    if hasattr(a, 'tobytes'):
+        return a.tobytes()
+    return a.tostring()
+
+def from_bytes(typecode, b):
+    a = array(typecode)
+    if hasattr(a, 'frombytes'):
+        a.frombytes(b)
+    else:
+        a.fromstring(b)
+    return a
+
+def pad8(size):
+    return (size + 7) // 8 * 8
+
+def write_profile(path, rpt, stats):
+    # save net report rpt (a NetReport) and x86 stats (an X86Stats);
+    # written to a temporary file first so readers never see a
+    # partial profile
+    src, dst, nbytes = rpt.switch_links()
+    n = max(max(src), max(dst)) + 1 if len(src) > 0 else 0
+    traffic = array('d', [0.0]) * (n * n)
+    links = array('B', [0]) * pad8(n * n)
+    for s, d, b in zip(src, dst, nbytes):
+        traffic[s * n + d] += b
+        links[s * n + d] = 1
+    # end nodes are "n<i>"; the index is the node number
+    sent = rpt.sent()
+    received = rpt.received()
+    k = len(sent)
+    inst, simtime, cycles = stats.metrics()
+    hdr = header.pack(magic, version, n, k, inst, simtime, cycles, \
+                      rpt.transfers, rpt.avgmsgsize, rpt.avglatency, \
+                      rpt.cycles())
+    tmp = path + '.tmp'
+    f = open(tmp, 'wb')
+    f.write(hdr)
+    f.write(to_bytes(traffic))
+    f.write(to_bytes(links))
+    f.write(to_bytes(sent))
+    f.write(to_bytes(received))
+    f.close()
+    os.rename(tmp, path)
+
+class Profile(object):
+    # a profile file, memory-mapped
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = header.unpack_from(self.buf, 0)
+        if fields[0] != magic or fields[1] != version:
+            self.close()
+            raise ValueError(path + ' is not a version %d profile' % version)
+        (self.n, self.k, self.inst, self.simtime, self.x86cycles, \
+         self.transfers, self.avgmsgsize, self.avglatency, \
+         self.netcycles) = fields[2:]
+        n = self.n
+        self.traffic_off = header.size
+        self.links_off = self.traffic_off + 8 * n * n
+        self.sent_off = self.links_off + pad8(n * n)
+        self.received_off = self.sent_off + 8 * self.k
+
+    def close(self):
+        self.buf.close()
+        self.file.close()
+
+    def stats(self):
+        # the x86 stats of the profiling run, as an X86Stats
+        return so.X86Stats({'CommittedInstructions': self.inst, \
+                            'SimTime': self.simtime, \
+                            'Cycles': self.x86cycles})
+
+    def cycles(self):
+        return self.netcycles
+
+    def doubles(self, off, count):
+        return from_bytes('d', self.buf[off:off + 8 * count])
+
+    def sent(self):
+        return self.doubles(self.sent_off, self.k)
+
+    def received(self):
+        return self.doubles(self.received_off, self.k)
+
+    def totaltraffic(self):
+        # bytes sent by all end nodes, as NetReport.totaltraffic
+        return sum(self.sent())
+
+    def traffic(self, i, j):
+        # bytes sent from switch i to switch j
+        return struct.unpack_from('<d', self.buf, \
+                                  self.traffic_off + 8 * (i * self.n + j))[0]
+
+    def matrix(self):
+        # n x n traffic as a NumPy array sharing the mapped memory
+        import numpy as np
+        return np.frombuffer(self.buf, dtype='<f8', count=self.n * self.n, \
+                             offset=self.traffic_off).reshape(self.n, self.n)
+
+    def switch_links(self):
+        # same as NetReport.switch_links: each existing link direction,
+        # in the order m2s reports the fully-connected network (both
+        # directions of each link i < j, in order of i then j)
+        n = self.n
+        traffic = self.doubles(self.traffic_off, n * n)
+        links = from_bytes('B', \
+                           self.buf[self.links_off:self.links_off + n * n])
+        src = array('l')
+        dst = array('l')
+        nbytes = array('l')
+        for i in range(n):
+            for j in range(i + 1, n):
+                for s, d in ((i, j), (j, i)):
+                    if links[s * n + d]:
+                        src.append(s)
+                        dst.append(d)
+                        nbytes.append(int(traffic[s * n + d]))
+        return src, dst, nbytes
+
+def read_profile(path, cores=None):
+    # the profile at path; with cores, it must be of that many switches
+    # and their end nodes (one per core and the two L2 modules)
+    prof = Profile(path)
+    if cores is not None and (prof.n != cores or prof.k != cores + 2):
+        prof.close()
+        raise ValueError('%s is a profile of %d switches and %d end ' \
+                         % (path, prof.n, prof.k) + 'nodes, not of ' + \
+                         '%d cores (%d end nodes)' % (cores, cores + 2))
+    return prof
@@ -0,0 +1,83 @@
+"""This module handles a workload mix: several target apps, each with a
+weight, for which tool.py synthesizes one topology (--manifest).
+
+The manifest is a text file with one app per line, its weight first and
+then the program and its arguments, e.g.
+
+    2 /parsec/blackscholes 4 in_64K.txt prices.txt
+    1 /parsec/canneal 4 15000 2000 400000.nets 128
+
+Blank lines and lines starting with "#" are skipped. The weight is the
+share of the chip's time the app is expected to get.
+
+Each app is profiled on the fully-connected NoC by itself (see
+profiling.profile_apps). The runs differ in length, so their reports are
+not simply summed: each app's traffic is scaled to its traffic per cycle
+over its weight's share of a run as long as the apps' weighted average
+run. An app that runs twice as long as another with the same weight
+thus doesn't count twice as much.
+"""
+import os
+import costmodel as cm
+
+def read_manifest(path):
+    # [(exe, args, weight)] in the order of the file; raises ValueError
+    # on a line that isn't "<weight> <exe> [<args>]"
+    apps = []
+    f = open(path)
+    try:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if line == '' or line.startswith('#'):
+                continue
+            parts = line.split(None, 2)
+            try:
+                weight = float(parts[0])
+            except ValueError:
+                weight = -1.0
+            if len(parts) < 2 or weight <= 0:
+                raise ValueError('%s:%d: expected "<weight> <exe> ' \
+                                 '[<args>]" with a weight > 0' \
+                                 % (path, i + 1))
+            args = parts[2] if len(parts) > 2 else ''
+            apps.append((parts[1], args, weight))
+    finally:
+        f.close()
+    if not apps:
+        raise ValueError(path + ': no apps')
+    return apps
+
+def app_names(apps):
+    # a short name for each app: its program's name, numbered if it
+    # appears more than once
+    base = [os.path.basename(exe) for exe, args, weight in apps]
+    names = []
+    for i, b in enumerate(base):
+        if base.count(b) > 1:
+            b = '%s-%d' % (b, base[:i].count(b))
+        names.append(b)
+    return names
+
+def mix_weights(weights, cycles):
+    # the factor each app's report is scaled by before they are merged
+    # (netreport.merge_reports); the merged report then covers the
+    # weighted average of the runs' cycles
+    total = float(sum(weights))
+    share = [w / total for w in weights]
+    avg = sum(s * c for s, c in zip(share, cycles))
+    return [s * avg / c if c else 0.0 for s, c in zip(share, cycles)]
+
+def app_costs(names, weights, graphs, reports, edges, n):
+    # predicted cost of carrying each app's own traffic (graphs, from
+    # tool.graph_from_report of its report) over the given links, see
+    # costmodel.evaluate; one row per app
+    rows = []
+    for name, w, g, rpt in zip(names, weights, graphs, reports):
+        m = cm.evaluate(g, edges, n, rpt.cycles(), \
+                        msgsize=rpt.avgmsgsize or 72.0)
+        rows.append({'app': name, 'weight': w, \
+                     'traffic': g.size(weight='weight'), \
+                     'hoptraffic': m['hoptraffic'], \
+                     'avghops': m['avghops'], 'maxutil': m['maxutil'], \
+                     'latency': m['latency']})
+    return rows
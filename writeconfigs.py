@@ -1,180 +1,246 @@
 """This module writes the necessary Multi2Sim configuration files
 (corresponding to the Multi2Sim options --ctx-config, --x86-config
---mem-config, and --net-config) into the current directory.
+--mem-config, and --net-config) into the current directory, or into
+the directory given as outdir.
+
+Each file is rendered in memory and written atomically, and only if its
+content changed (see rundir.py). The standard topologies (ring, 2D mesh,
+2D torus, fully-connected) are generated for any number of cores; mesh
+and torus take a rows x cols shape, which defaults to the most nearly
+square one.
 """
+import os
 import sys
 import re
 import networkx as nx
+import rundir as rd
+
+# switches each L2 module's network node links to, by default
+# L2-0 connects to sw0 & sw1; L2-1 connects to sw1 & sw2
+default_l2links = [[0, 1], [1, 2]]
+
+def write_file(name, text, outdir='.'):
+    rd.write_if_changed(os.path.join(outdir, name), text)
 
 # context
-def write_ctx(exe, args):
-    f = open('ctx-config.txt', 'w')
-    f.write('[Context 0]\n')
-    f.write('Exe = ' + exe + '\n')
-    f.write('Args = ' + args + '\n')
-    f.close()
+def render_ctx(exe, args):
+    return '[Context 0]\nExe = ' + exe + '\nArgs = ' + args + '\n'
 
-# cpu
-def write_cpu(cores):
-    f = open('cpu-config.txt', 'w')
-    f.write('[ General ]\n')
-    f.write('Cores = ' + str(cores) + '\n')
-    f.write('Threads = 1\n')
-    f.close()
+def write_ctx(exe, args, outdir='.'):
+    write_file('ctx-config.txt', render_ctx(exe, args), outdir)
+
+# cpu; fastforward is the number of instructions run functionally
+# (not timed) before detailed simulation starts
+def render_cpu(cores, fastforward=0):
+    s = '[ General ]\nCores = ' + str(cores) + '\nThreads = 1\n'
+    if fastforward > 0:
+        s += 'FastForward = ' + str(fastforward) + '\n'
+    return s
+
+def write_cpu(cores, outdir='.'):
+    write_file('cpu-config.txt', render_cpu(cores), outdir)
 
 # memory
-def write_mem(cores):
-    f = open('mem-config.txt', 'w')
+def render_mem(cores):
+    s = []
     # cache geometries
-    f.write('[CacheGeometry geo-l1]\nSets = 128\nAssoc = 2\n' + \
-            'BlockSize = 256\nLatency = 2\nPolicy = LRU\nPorts = 2\n')
-    f.write('\n[CacheGeometry geo-l2]\nSets = 512\nAssoc = 4\n' + \
-            'BlockSize = 256\nLatency = 20\nPolicy = LRU\nPorts = 4\n')
+    s.append('[CacheGeometry geo-l1]\nSets = 128\nAssoc = 2\n' + \
+             'BlockSize = 256\nLatency = 2\nPolicy = LRU\nPorts = 2\n')
+    s.append('\n[CacheGeometry geo-l2]\nSets = 512\nAssoc = 4\n' + \
+             'BlockSize = 256\nLatency = 20\nPolicy = LRU\nPorts = 4\n')
     # L1 cache - one module per core
     for i in range(0, cores):
-        si = str(i)
-        f.write('\n[Module mod-l1-' + si + ']\n')
-        f.write('Type = Cache\nGeometry = geo-l1\nLowNetwork = net0\n')
-        f.write('LowNetworkNode = n' + si + '\n')
-        f.write('LowModules = mod-l2-0 mod-l2-1\n')
+        s.append('\n[Module mod-l1-%d]\n' % i + \
+                 'Type = Cache\nGeometry = geo-l1\nLowNetwork = net0\n' + \
+                 'LowNetworkNode = n%d\n' % i + \
+                 'LowModules = mod-l2-0 mod-l2-1\n')
     # L2 cache - two modules each handling half of address space
     # each L2 module gets its own node in the network with the cores
-    f.write('\n[Module mod-l2-0]\nType = Cache\n' + \
-            'Geometry = geo-l2\nHighNetwork = net0\n' + \
-            'HighNetworkNode = n' + str(cores) + '\n' + \
-            'LowNetwork = net-l2-mm\nLowModules = mod-mm\n' + \
-            'AddressRange = BOUNDS 0x00000000 0x7FFFFFFF\n')
-    f.write('\n[Module mod-l2-1]\nType = Cache\n' + \
-            'Geometry = geo-l2\nHighNetwork = net0\n' + \
-            'HighNetworkNode = n' + str(cores + 1) + '\n' + \
-            'LowNetwork = net-l2-mm\nLowModules = mod-mm\n' + \
-            'AddressRange = BOUNDS 0x80000000 0xFFFFFFFF\n')
+    s.append('\n[Module mod-l2-0]\nType = Cache\n' + \
+             'Geometry = geo-l2\nHighNetwork = net0\n' + \
+             'HighNetworkNode = n' + str(cores) + '\n' + \
+             'LowNetwork = net-l2-mm\nLowModules = mod-mm\n' + \
+             'AddressRange = BOUNDS 0x00000000 0x7FFFFFFF\n')
+    s.append('\n[Module mod-l2-1]\nType = Cache\n' + \
+             'Geometry = geo-l2\nHighNetwork = net0\n' + \
+             'HighNetworkNode = n' + str(cores + 1) + '\n' + \
+             'LowNetwork = net-l2-mm\nLowModules = mod-mm\n' + \
+             'AddressRange = BOUNDS 0x80000000 0xFFFFFFFF\n')
     # main memory
-    f.write('\n[Module mod-mm]\nType = MainMemory\nBlockSize = 256\n' + \
-            'Latency = 100\nHighNetwork = net-l2-mm\n')
+    s.append('\n[Module mod-mm]\nType = MainMemory\nBlockSize = 256\n' + \
+             'Latency = 100\nHighNetwork = net-l2-mm\n')
     # default L2-to-main memory network
-    f.write('\n[Network net-l2-mm]\nDefaultInputBufferSize = 1024\n' + \
-            'DefaultOutputBufferSize = 1024\nDefaultBandwidth = 256\n')
+    s.append('\n[Network net-l2-mm]\nDefaultInputBufferSize = 1024\n' + \
+             'DefaultOutputBufferSize = 1024\nDefaultBandwidth = 256\n')
     # cores and their connections to L1
     for i in range(0, cores):
-        si = str(i)
-        f.write('\n[Entry core-' + si + ']\n')
-        f.write('Arch = x86\nCore = ' + si + '\n')
-        f.write('Thread = 0\nDataModule = mod-l1-' + si + '\n')
-        f.write('InstModule = mod-l1-' + si + '\n')
-    f.close()
+        s.append('\n[Entry core-%d]\n' % i + \
+                 'Arch = x86\nCore = %d\n' % i + \
+                 'Thread = 0\nDataModule = mod-l1-%d\n' % i + \
+                 'InstModule = mod-l1-%d\n' % i)
+    return ''.join(s)
+
+def write_mem(cores, outdir='.'):
+    write_file('mem-config.txt', render_mem(cores), outdir)
+
+# network: one bidirectional link between two network nodes, with the
+# default bandwidth unless one is given
+def render_link(src, dst, bandwidth=None):
+    s = '\n[Network.net0.Link.' + src + '-' + dst + ']\n' + \
+        'Source = ' + src + '\nDest = ' + dst + '\n' + \
+        'Type = Bidirectional\n'
+    if bandwidth is not None:
+        s += 'Bandwidth = ' + str(bandwidth) + '\n'
+    return s
 
-# network: write portion of net-config that is common to all topologies
-def write_net_common(cores, f):
+# network: portion of net-config that is common to all topologies
+# buffers optionally maps switches to their own buffer size
+def render_net_common(cores, l2links=None, buffers=None):
+    if l2links is None:
+        l2links = default_l2links
+    s = []
     # default network characteristics
-    f.write('[Network.net0]\nDefaultInputBufferSize = 1024\n' + \
-            'DefaultOutputBufferSize = 1024\nDefaultBandwidth = 256\n')
+    s.append('[Network.net0]\nDefaultInputBufferSize = 1024\n' + \
+             'DefaultOutputBufferSize = 1024\nDefaultBandwidth = 256\n')
     # create node, switch, and node-switch-link for each core
     for i in range(0, cores):
         si = str(i)
-        f.write('\n[Network.net0.Node.n' + si + ']\nType = EndNode\n')
-        f.write('\n[Network.net0.Node.sw' + si + ']\nType = Switch\n')
-        f.write('\n[Network.net0.Link.sw' + si + '-n' + si + ']\n' + \
-                'Source = sw' + si + '\nDest = n' + si + '\n' + \
-                'Type = Bidirectional\n')
+        s.append('\n[Network.net0.Node.n' + si + ']\nType = EndNode\n')
+        s.append('\n[Network.net0.Node.sw' + si + ']\nType = Switch\n')
+        if buffers is not None and i in buffers:
+            s.append('InputBufferSize = ' + str(buffers[i]) + '\n' + \
+                     'OutputBufferSize = ' + str(buffers[i]) + '\n')
+        s.append(render_link('sw' + si, 'n' + si))
     # create nodes for each L2 module and links from those nodes
-    # to the switches associated with the first three cores
-    f.write('\n[Network.net0.Node.n' + str(cores + 0) + ']\n' + \
-            'Type = EndNode\n')
-    f.write('\n[Network.net0.Node.n' + str(cores + 1) + ']\n' + \
-            'Type = EndNode\n')
-    # L2-0 connects to sw0 & sw1; L2-1 connects to sw1 & sw2
-    f.write('\n[Network.net0.Link.sw0-n' + str(cores + 0) + ']\n' + \
-            'Source = sw0\nDest = n' + str(cores + 0) + '\n' + \
-            'Type = Bidirectional\n')
-    f.write('\n[Network.net0.Link.sw1-n' + str(cores + 0) + ']\n' + \
-            'Source = sw1\nDest = n' + str(cores + 0) + '\n' + \
-            'Type = Bidirectional\n')
-    f.write('\n[Network.net0.Link.sw1-n' + str(cores + 1) + ']\n' + \
-            'Source = sw1\nDest = n' + str(cores + 1) + '\n' + \
-            'Type = Bidirectional\n')
-    f.write('\n[Network.net0.Link.sw2-n' + str(cores + 1) + ']\n' + \
-            'Source = sw2\nDest = n' + str(cores + 1) + '\n' + \
-            'Type = Bidirectional\n')
-    f.write('\n; above applies to all topologies\n')
+    # to the switches given in l2links
+    for k in range(0, len(l2links)):
+        s.append('\n[Network.net0.Node.n' + str(cores + k) + ']\n' + \
+                 'Type = EndNode\n')
+    for k in range(0, len(l2links)):
+        for sw in l2links[k]:
+            s.append(render_link('sw' + str(sw), 'n' + str(cores + k)))
+    s.append('\n; above applies to all topologies\n')
+    return ''.join(s)
 
-# network: fully-connected
-def write_net_fully(cores):
-    f = open('fully-net-config.txt', 'w')
-    write_net_common(cores, f)
-    # links between switches
-    f.write('; below describes a fully-connected NoC\n')
-    for i in range(0, cores+1):
-        si = str(i)
-        for j in range(i+1, cores):
-            sj = str(j)
-            f.write('\n[Network.net0.Link.sw' + si + '-sw' + sj + ']\n' + \
-                    'Source = sw' + si + '\nDest = sw' + sj + '\n' + \
-                    'Type = Bidirectional\n')
-    f.close()
+def write_net_common(cores, f, l2links=None):
+    f.write(render_net_common(cores, l2links))
 
-# network: novel network (use graph)
-def write_net_novel(cores, graph):
-    f = open('novel-net-config.txt', 'w')
-    write_net_common(cores, f)
-    f.write('; below describes a novel topology\n')
-    for e in graph.edges_iter():
-        si = str(e[0])
-        sj = str(e[1])
-        f.write('\n[Network.net0.Link.sw' + si + '-sw' + sj + ']\n' + \
-                'Source = sw' + si + '\nDest = sw' + sj + '\n' + \
-                'Type = Bidirectional\n')
+# explicit routes, as (node, destination, next node) names; without
+# them Multi2Sim routes over shortest paths
+def render_routes(routes):
+    s = ['\n[Network.net0.Routes]\n']
+    for src, dst, nxt in routes:
+        s.append(src + '.to.' + dst + ' = ' + nxt + '\n')
+    return ''.join(s)
+
+# network: common part plus the given switch-to-switch links
+# bandwidths optionally maps links (n1, n2), n1 < n2, to their own
+# bandwidth, see sizing.py
+def render_net(cores, edges, name, l2links=None, routes=None, \
+               bandwidths=None, buffers=None):
+    s = [render_net_common(cores, l2links, buffers)]
+    s.append('; below describes a ' + name + '\n')
+    for e in edges:
+        bw = None
+        if bandwidths is not None:
+            bw = bandwidths.get((min(e), max(e)))
+        s.append(render_link('sw' + str(e[0]), 'sw' + str(e[1]), bw))
+    if routes is not None:
+        s.append(render_routes(routes))
+    return ''.join(s)
+
+# shape of a 2D mesh or torus: rows x cols, most nearly square
+def grid_shape(cores, shape=None):
+    if shape is not None:
+        rows, cols = shape
+        if rows * cols != cores:
+            raise ValueError('%dx%d shape does not have %d cores' \
+                             % (rows, cols, cores))
+        return rows, cols
+    rows = int(cores ** 0.5)
+    while cores % rows != 0:
+        rows -= 1
+    return rows, cores // rows
+
+# "<rows>x<cols>" as given on the command line, e.g. "4x8"
+def parse_shape(s):
+    rows, x, cols = s.lower().partition('x')
+    return int(rows), int(cols)
+
+# switch-to-switch links of each standard topology
+# switch i of a grid is at row i // cols, column i % cols
+def fully_edges(cores):
+    return [(i, j) for i in range(0, cores) for j in range(i+1, cores)]
+
+def ring_edges(cores):
+    el = [(i, i+1) for i in range(0, cores-1)]
+    if cores > 2:
+        el.append((cores - 1, 0))
+    return el
+
+def mesh_edges(rows, cols):
+    # each row's links, then the links down to the next row
+    el = []
+    for r in range(0, rows):
+        for c in range(0, cols-1):
+            el.append((r*cols + c, r*cols + c+1))
+        if r < rows - 1:
+            for c in range(0, cols):
+                el.append((r*cols + c, (r+1)*cols + c))
+    return el
+
+def torus_edges(rows, cols):
+    # mesh plus wraparound links for each row, then for each column;
+    # a dimension of 2 or less already has its ends linked
+    el = mesh_edges(rows, cols)
+    if cols > 2:
+        for r in range(0, rows):
+            el.append((r*cols, r*cols + cols-1))
+    if rows > 2:
+        for c in range(0, cols):
+            el.append((c, (rows-1)*cols + c))
+    return el
+
+# network: read back the switch-to-switch links of a net config
+def read_net_edges(name):
+    linkre = re.compile(r'^Source = sw([0-9]+)\s*\nDest = sw([0-9]+)\s*$', \
+                        re.M)
+    f = open(name)
+    text = f.read()
     f.close()
+    return [(int(m.group(1)), int(m.group(2))) \
+            for m in linkre.finditer(text)]
+
+# network: fully-connected
+def write_net_fully(cores, l2links=None, outdir='.'):
+    write_file('fully-net-config.txt', \
+               render_net(cores, fully_edges(cores), \
+                          'fully-connected NoC', l2links), outdir)
+
+# network: novel network (use graph), with routes and link and buffer
+# sizes if given
+def write_net_novel(cores, graph, name='novel', l2links=None, outdir='.', \
+                    routes=None, bandwidths=None, buffers=None):
+    write_file(name + '-net-config.txt', \
+               render_net(cores, graph.edges(), 'novel topology', \
+                          l2links, routes, bandwidths, buffers), outdir)
 
 # network: ring
-def write_net_ring(cores):
-    f = open('ring-net-config.txt', 'w')
-    write_net_common(cores, f)
-    f.write('; below describes a ring topology\n')
-    for i in range(0, cores-1):
-        si = str(i)
-        sj = str(i+1)
-        f.write('\n[Network.net0.Link.sw' + si + '-sw' + sj + ']\n' + \
-                'Source = sw' + si + '\nDest = sw' + sj + '\n' + \
-                'Type = Bidirectional\n')
-    si = str(cores - 1)
-    sj = str(0)
-    f.write('\n[Network.net0.Link.sw' + si + '-sw' + sj + ']\n' + \
-            'Source = sw' + si + '\nDest = sw' + sj + '\n' + \
-            'Type = Bidirectional\n')
-    f.close()
+def write_net_ring(cores, l2links=None, outdir='.'):
+    write_file('ring-net-config.txt', \
+               render_net(cores, ring_edges(cores), \
+                          'ring topology', l2links), outdir)
 
 # network: mesh
-def write_net_mesh(cores):
-    f = open('mesh-net-config.txt', 'w')
-    write_net_common(cores, f)
-    f.write('; below describes a mesh topology\n')
-    # the below is hard-coded for 9 cores
-    # future work: make this work for arbitrary # of cores
-    el = [(0,1), (1,2), (0,3), (1,4), (2,5), (3,4), (4,5), (3,6), \
-          (4,7), (5,8), (6,7), (7,8)]
-    for e in el:
-        si = str(e[0])
-        sj = str(e[1])
-        f.write('\n[Network.net0.Link.sw' + si + '-sw' + sj + ']\n' + \
-                'Source = sw' + si + '\nDest = sw' + sj + '\n' + \
-                'Type = Bidirectional\n')
-    f.close()
+def write_net_mesh(cores, shape=None, l2links=None, outdir='.'):
+    rows, cols = grid_shape(cores, shape)
+    write_file('mesh-net-config.txt', \
+               render_net(cores, mesh_edges(rows, cols), \
+                          'mesh topology', l2links), outdir)
 
 # network: torus
-def write_net_torus(cores):
-    f = open('torus-net-config.txt', 'w')
-    write_net_common(cores, f)
-    f.write('; below describes a torus topology\n')
-    # the below is hard-coded for 9 cores
-    # future work: make this work for arbitrary # of cores
-    el = [(0,1), (1,2), (0,3), (1,4), (2,5), (3,4), (4,5), (3,6), \
-          (4,7), (5,8), (6,7), (7,8), \
-          (0,2), (3,5), (6,8), (0,6), (1,7), (2,8)]
-    for e in el:
-        si = str(e[0])
-        sj = str(e[1])
-        f.write('\n[Network.net0.Link.sw' + si + '-sw' + sj + ']\n' + \
-                'Source = sw' + si + '\nDest = sw' + sj + '\n' + \
-                'Type = Bidirectional\n')
-    f.close()
+def write_net_torus(cores, shape=None, l2links=None, outdir='.'):
+    rows, cols = grid_shape(cores, shape)
+    write_file('torus-net-config.txt', \
+               render_net(cores, torus_edges(rows, cols), \
+                          'torus topology', l2links), outdir)